@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+import json
 import re
 from dataclasses import dataclass
 from datetime import datetime
+from pathlib import Path
 
+from .analysis import WORD, OnsetWindow, TurnAnalysis, fold_case, session_index
+from .matching import PhraseMatcher
 from .models import IntentResult, RuleEngineResult, TriageSession, UrgencyLevel
 
 
@@ -23,47 +27,94 @@ class RedFlagEngine:
         "collapsed_statement": ("she collapsed", "he collapsed", "collapsed"),
     }
 
-    def detect(self, message: str, session: TriageSession) -> list[str]:
-        msg = message.lower()
-        hits: list[str] = []
+    def __init__(self, whole_words: bool = False) -> None:
+        # Compiled once: detection cost no longer grows with the size of the vocabulary.
+        self._phrase_flags: dict[str, list[str]] = {}
         for key, phrases in self.RED_FLAG_RULES.items():
-            if any(phrase in msg for phrase in phrases):
-                hits.append(key)
+            for phrase in phrases:
+                self._phrase_flags.setdefault(phrase.lower(), []).append(key)
+        self._matcher = PhraseMatcher(self._phrase_flags, whole_words=whole_words)
+
+    def detect(self, message: str | TurnAnalysis, session: TriageSession) -> list[str]:
+        msg = TurnAnalysis.of(message).normalized
+        hits: list[str] = []
+        for phrase in self._matcher.find(msg):
+            hits.extend(self._phrase_flags[phrase])
         # infant fever safety check with demographics/symptom combination
         if session.demographics.age is not None and session.demographics.age < 1 and "fever" in msg:
             hits.append("high_fever_in_infant")
         return sorted(set(hits))
 
 
+@dataclass(frozen=True)
+class IntentDefinition:
+    intent: str
+    confidence: float
+
+
 class IntentClassificationAgent:
-    GREETING_PATTERNS = re.compile(r"^\s*(hi|hello|hey|good\s+(morning|afternoon|evening))\b", re.IGNORECASE)
-    APPOINTMENT_PATTERNS = re.compile(r"\b(book|schedule|appointment|follow[- ]?up)\b", re.IGNORECASE)
-    ADMIN_PATTERNS = re.compile(r"\b(billing|insurance|hours|location|records)\b", re.IGNORECASE)
-    MEDICAL_PATTERNS = re.compile(
-        r"\b(pain|fever|cough|rash|vomit|nausea|headache|dizzy|bleeding|pregnan|symptom|breath)\b",
-        re.IGNORECASE,
-    )
-    TIME_PATTERNS = re.compile(r"\b(time|date|today)\b", re.IGNORECASE)
-    SERVICES_PATTERNS = re.compile(r"\b(service|services|offer|help with|what can you do)\b", re.IGNORECASE)
-    ROBOTIC_PATTERNS = re.compile(r"\b(robotic|bot|human|too scripted)\b", re.IGNORECASE)
-
-    def classify(self, message: str) -> IntentResult:
-        text = message.strip()
-        if self.GREETING_PATTERNS.search(text):
-            return IntentResult(intent="greeting", confidence=0.98)
-        if self.TIME_PATTERNS.search(text):
-            return IntentResult(intent="time_question", confidence=0.9)
-        if self.SERVICES_PATTERNS.search(text):
-            return IntentResult(intent="services_question", confidence=0.9)
-        if self.ROBOTIC_PATTERNS.search(text):
-            return IntentResult(intent="style_feedback", confidence=0.89)
-        if self.MEDICAL_PATTERNS.search(text):
-            return IntentResult(intent="medical_symptom", confidence=0.88)
-        if self.APPOINTMENT_PATTERNS.search(text):
-            return IntentResult(intent="appointment_request", confidence=0.85)
-        if self.ADMIN_PATTERNS.search(text):
-            return IntentResult(intent="admin_question", confidence=0.84)
-        return IntentResult(intent="unclear", confidence=0.4)
+    """Priority-ordered intent vocabularies, matched on whole words.
+
+    Each message is tokenized once and plain-word vocabularies are resolved with set
+    lookups. Multi-word or regex patterns are folded into one alternation per priority
+    cutoff, which only runs when such a pattern could still outrank the token match.
+    """
+
+    DEFAULT_CONFIG_PATH = Path(__file__).resolve().parent / "config" / "intents.json"
+
+    def __init__(self, config: dict | None = None) -> None:
+        if config is None:
+            config = json.loads(self.DEFAULT_CONFIG_PATH.read_text())
+        # Intents are listed in priority order; the first one whose vocabulary occurs wins.
+        self._intents: list[IntentDefinition] = []
+        self._vocabularies: list[tuple[int, frozenset[str]]] = []
+        self._leading_words: dict[str, int] = {}
+        phrases: list[tuple[int, str]] = []
+        for position, entry in enumerate(config["intents"]):
+            self._intents.append(IntentDefinition(entry["intent"], float(entry["confidence"])))
+            anchored = bool(entry.get("anchored"))
+            words = [fold_case(pattern) for pattern in entry["patterns"] if WORD.fullmatch(pattern)]
+            others = [pattern for pattern in entry["patterns"] if not WORD.fullmatch(pattern)]
+            if anchored:
+                for word in words:
+                    self._leading_words.setdefault(word, position)
+            elif words:
+                self._vocabularies.append((position, frozenset(words)))
+            if others:
+                prefix = r"^\s*" if anchored else r"\b"
+                phrases.append((position, rf"(?P<i{position}>{prefix}(?:{'|'.join(others)})\b)"))
+        fallback = config.get("fallback", {"intent": "unclear", "confidence": 0.4})
+        self._fallback = IntentDefinition(fallback["intent"], float(fallback["confidence"]))
+        # _phrase_patterns[n] covers the phrases that outrank intent n, as a plain alternation
+        # to find the leftmost hit and a zero-width twin to see every overlapping hit after it.
+        self._phrase_patterns: list[tuple[re.Pattern[str], re.Pattern[str]] | None] = []
+        for cutoff in range(len(self._intents) + 1):
+            eligible = "|".join(alternative for position, alternative in phrases if position < cutoff)
+            self._phrase_patterns.append(
+                (re.compile(eligible, re.IGNORECASE), re.compile(f"(?={eligible})", re.IGNORECASE))
+                if eligible
+                else None
+            )
+
+    def classify(self, message: str | TurnAnalysis) -> IntentResult:
+        turn = TurnAnalysis.of(message)
+        best = len(self._intents)
+        if turn.leading_token is not None:
+            best = self._leading_words.get(turn.leading_token, best)
+        for position, vocabulary in self._vocabularies:
+            if position >= best:
+                break
+            if not vocabulary.isdisjoint(turn.tokens):
+                best = position
+                break
+        phrases = self._phrase_patterns[best]
+        if phrases is not None:
+            first = phrases[0].search(turn.text)
+            if first is not None:
+                for match in phrases[1].finditer(turn.text, first.start()):
+                    best = min(best, int(match.lastgroup[1:]))
+        definition = self._intents[best] if best < len(self._intents) else self._fallback
+        return IntentResult(intent=definition.intent, confidence=definition.confidence)
 
 
 class FrontDeskAgent:
@@ -119,17 +170,17 @@ class TriageAgent:
         IntakeQuestion("allergies", "Any known allergies? (optional)"),
     ]
 
-    def update_from_user(self, session: TriageSession, message: str) -> None:
+    def update_from_user(self, session: TriageSession, message: str | TurnAnalysis) -> None:
         pending = self.next_pending_question(session)
         if not pending:
             return
-        value = message.strip()
+        turn = TurnAnalysis.of(message)
+        value = turn.text
         field = pending.field
         if field == "age":
-            digits = re.findall(r"\d+", value)
-            if digits:
-                parsed_age = int(digits[0])
-                if "month" in value.lower() and parsed_age < 12:
+            if turn.numbers:
+                parsed_age = turn.numbers[0]
+                if "month" in turn.normalized and parsed_age < 12:
                     parsed_age = 0
                 session.demographics.age = parsed_age
                 session.intake_progress[field] = True
@@ -147,9 +198,8 @@ class TriageAgent:
             session.onset_time = value
             session.intake_progress[field] = True
         elif field == "severity":
-            digits = re.findall(r"\d+", value)
-            if digits:
-                session.severity = min(10, max(1, int(digits[0])))
+            if turn.numbers:
+                session.severity = min(10, max(1, turn.numbers[0]))
                 session.intake_progress[field] = True
         else:
             cleaned = [x.strip() for x in re.split(r",|;| and ", value) if x.strip()]
@@ -167,50 +217,94 @@ class TriageAgent:
         return None
 
 
+@dataclass(frozen=True)
+class CompiledRule:
+    position: int
+    rule_id: str
+    urgency: UrgencyLevel
+    phrases_any: frozenset[str]
+    phrases_all: frozenset[str]
+    min_age: int | None = None
+    max_duration_days: int | None = None
+    severity_min: int | None = None
+
+
 class ClinicalRulesEngine:
-    def __init__(self, config: dict) -> None:
+    def __init__(self, config: dict, version: str | None = None) -> None:
         self.config = config
+        self.version = version
+        self.rules = [self._compile(position, rule) for position, rule in enumerate(config.get("rules", []))]
+        # Inverted index: a rule is only a candidate once one of its key phrases is present.
+        self._phrase_index: dict[str, list[CompiledRule]] = {}
+        self._unindexed: list[CompiledRule] = []
+        for rule in self.rules:
+            keys = rule.phrases_any or rule.phrases_all
+            if not keys:
+                self._unindexed.append(rule)
+            for phrase in keys:
+                self._phrase_index.setdefault(phrase, []).append(rule)
+        self._matcher = PhraseMatcher(self._phrase_index)
+
+    @staticmethod
+    def _compile(position: int, rule: dict) -> CompiledRule:
+        return CompiledRule(
+            position=position,
+            rule_id=rule["id"],
+            urgency=UrgencyLevel(rule["urgency"]),
+            phrases_any=frozenset(p.lower() for p in rule.get("phrases_any", [])),
+            phrases_all=frozenset(p.lower() for p in rule.get("phrases_all", [])),
+            min_age=rule.get("min_age"),
+            max_duration_days=rule.get("max_duration_days"),
+            severity_min=rule.get("severity_min"),
+        )
 
     def evaluate(self, session: TriageSession) -> RuleEngineResult:
-        text_blob = " ".join([session.chief_complaint, *session.symptoms, *session.associated_symptoms]).lower()
+        index = session_index(session)
+        found = index.phrases(self._matcher)
+        candidates = {rule.position: rule for rule in self._unindexed}
+        for phrase in found:
+            candidates.update((rule.position, rule) for rule in self._phrase_index[phrase])
+        onset = index.onset(session.onset_time)
+
         triggered: list[str] = []
         final_urgency = UrgencyLevel.ROUTINE
         confidence = 0.65
 
-        for rule in self.config.get("rules", []):
-            if self._rule_matches(rule, session, text_blob):
-                triggered.append(rule["id"])
-                urgency = UrgencyLevel(rule["urgency"])
-                if urgency == UrgencyLevel.EMERGENCY:
-                    final_urgency = urgency
+        # Candidates are visited in config order so the first EMERGENCY still short-circuits.
+        for _, rule in sorted(candidates.items()):
+            if self._rule_matches(rule, session, found, onset):
+                triggered.append(rule.rule_id)
+                if rule.urgency == UrgencyLevel.EMERGENCY:
+                    final_urgency = rule.urgency
                     confidence = max(confidence, 0.98)
                     break
-                if urgency == UrgencyLevel.URGENT and final_urgency != UrgencyLevel.EMERGENCY:
-                    final_urgency = urgency
+                if rule.urgency == UrgencyLevel.URGENT and final_urgency != UrgencyLevel.EMERGENCY:
+                    final_urgency = rule.urgency
                     confidence = max(confidence, 0.86)
 
-        return RuleEngineResult(urgency_level=final_urgency.value, triggered_rules=triggered, confidence=confidence)
+        return RuleEngineResult(
+            urgency_level=final_urgency.value,
+            triggered_rules=triggered,
+            confidence=confidence,
+            rule_pack_version=self.version,
+        )
 
     @staticmethod
-    def _rule_matches(rule: dict, session: TriageSession, text_blob: str) -> bool:
-        phrases = rule.get("phrases_any", [])
-        if phrases and not any(p.lower() in text_blob for p in phrases):
+    def _rule_matches(
+        rule: CompiledRule, session: TriageSession, found: frozenset[str], onset: OnsetWindow | None
+    ) -> bool:
+        if rule.phrases_any and rule.phrases_any.isdisjoint(found):
             return False
-        phrases_all = rule.get("phrases_all", [])
-        if phrases_all and not all(p.lower() in text_blob for p in phrases_all):
+        if rule.phrases_all and not rule.phrases_all <= found:
             return False
-        min_age = rule.get("min_age")
-        if min_age is not None and (session.demographics.age is None or session.demographics.age < min_age):
+        if rule.min_age is not None and (session.demographics.age is None or session.demographics.age < rule.min_age):
             return False
-        max_duration_days = rule.get("max_duration_days")
-        if max_duration_days is not None and session.onset_time:
-            if "day" not in session.onset_time.lower():
+        if rule.max_duration_days is not None and onset is not None:
+            if not onset.in_days:
                 return False
-            digits = re.findall(r"\d+", session.onset_time)
-            if digits and int(digits[0]) > max_duration_days:
+            if onset.value is not None and onset.value > rule.max_duration_days:
                 return False
-        severity_min = rule.get("severity_min")
-        if severity_min is not None and (session.severity is None or session.severity < severity_min):
+        if rule.severity_min is not None and (session.severity is None or session.severity < rule.severity_min):
             return False
         return True
 
@@ -223,7 +317,8 @@ class RiskScoringAgent:
             base += session.severity / 15
         if session.demographics.age and session.demographics.age >= 65:
             base += 0.15
-        if any("pregnan" in s.lower() for s in [session.chief_complaint, *session.associated_symptoms]):
+        index = session_index(session)
+        if any("pregnan" in text for text in [index.complaint, *index.associated]):
             base += 0.1
         risk = min(0.99, round(base, 3))
         confidence = 0.72
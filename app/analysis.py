@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from .matching import PhraseMatcher
+
+if TYPE_CHECKING:
+    from .models import TriageSession
+
+WORD = re.compile(r"\w+")
+NUMBER = re.compile(r"\d+")
+# Characters re.IGNORECASE treats as equal to a letter that str.lower() does not map them
+# to: "İ" lowercases to "i" plus a combining dot, and sre's extra equivalence classes
+# (dotless i, long s, Greek and Cyrillic variant forms) fold to one representative.
+IGNORECASE_FOLD = str.maketrans(
+    "\u0130\u0131\u017f\u00b5\u0345\u1fbe\u1fd3\u1fe3\u03d0"
+    "\u03f5\u03d1\u03f0\u03d6\u03f1\u03c2\u03d5\u1c80\u1c81"
+    "\u1c82\u1c83\u1c84\u1c85\u1c86\u1c87\u1c88\u1e9b\ufb05",
+    "iis\u03bc\u03b9\u03b9\u0390\u03b0\u03b2"
+    "\u03b5\u03b8\u03ba\u03c0\u03c1\u03c3\u03c6\u0432\u0434"
+    "\u043e\u0441\u0442\u0442\u044a\u0463\ua64b\u1e61\ufb06",
+)
+
+
+def fold_case(text: str) -> str:
+    """Lowercase ``text`` the way ``re.IGNORECASE`` compares characters."""
+    if text.isascii():
+        return text.lower()
+    # Again after lower(), which turns a word-final sigma into "ς".
+    return text.translate(IGNORECASE_FOLD).lower().translate(IGNORECASE_FOLD)
+
+
+@dataclass(frozen=True)
+class TurnAnalysis:
+    """One user message, normalized once and shared by every agent that reads the turn."""
+
+    text: str
+    normalized: str
+    tokens: frozenset[str]
+    leading_token: str | None
+    numbers: tuple[int, ...]
+
+    @classmethod
+    def of(cls, message: str | TurnAnalysis) -> TurnAnalysis:
+        if isinstance(message, TurnAnalysis):
+            return message
+        text = message.strip()
+        # Tokens come from the original text, so word boundaries are the ones the vocabulary
+        # regexes see, and are folded as those regexes compare them.
+        words = WORD.findall(text)
+        return cls(
+            text=text,
+            normalized=text.lower(),
+            tokens=frozenset(fold_case(word) for word in words),
+            leading_token=fold_case(words[0]) if words and text.startswith(words[0]) else None,
+            numbers=tuple(int(digits) for digits in NUMBER.findall(text)),
+        )
+
+
+@dataclass(frozen=True)
+class OnsetWindow:
+    in_days: bool
+    value: int | None
+
+    @classmethod
+    def parse(cls, onset_time: str | None) -> OnsetWindow | None:
+        if not onset_time:
+            return None
+        digits = NUMBER.findall(onset_time)
+        return cls(in_days="day" in onset_time.lower(), value=int(digits[0]) if digits else None)
+
+
+class SessionTextIndex:
+    """Lowercased clinical text of one session, extended as intake answers arrive.
+
+    Each access compares the session's complaint and symptom lists with what was indexed
+    before, so only new answers are lowercased. Edits made directly on the session are
+    still picked up. Phrase matches and the parsed onset are cached until their source
+    text changes.
+    """
+
+    def __init__(self) -> None:
+        self.complaint = ""
+        self.symptoms: list[str] = []
+        self.associated: list[str] = []
+        self._complaint_source = ""
+        self._symptom_sources: list[str] = []
+        self._associated_sources: list[str] = []
+        self._text: str | None = ""
+        self._found: tuple[PhraseMatcher, str, frozenset[str]] | None = None
+        self._onset: tuple[str | None, OnsetWindow | None] = (None, None)
+
+    def sync(self, session: TriageSession) -> SessionTextIndex:
+        if session.chief_complaint != self._complaint_source:
+            self._complaint_source = session.chief_complaint
+            self.complaint = session.chief_complaint.lower()
+            self._text = None
+        if self._sync_list(session.symptoms, self._symptom_sources, self.symptoms):
+            self._text = None
+        if self._sync_list(session.associated_symptoms, self._associated_sources, self.associated):
+            self._text = None
+        return self
+
+    @staticmethod
+    def _sync_list(source: list[str], indexed: list[str], lowered: list[str]) -> bool:
+        common = 0
+        limit = min(len(source), len(indexed))
+        while common < limit and source[common] == indexed[common]:
+            common += 1
+        if common == len(source) == len(indexed):
+            return False
+        del indexed[common:], lowered[common:]
+        indexed.extend(source[common:])
+        lowered.extend(item.lower() for item in source[common:])
+        return True
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = " ".join([self.complaint, *self.symptoms, *self.associated])
+        return self._text
+
+    def phrases(self, matcher: PhraseMatcher) -> frozenset[str]:
+        text = self.text
+        if self._found is None or self._found[0] is not matcher or self._found[1] is not text:
+            self._found = (matcher, text, frozenset(matcher.find(text)))
+        return self._found[2]
+
+    def onset(self, onset_time: str | None) -> OnsetWindow | None:
+        if self._onset[0] != onset_time:
+            self._onset = (onset_time, OnsetWindow.parse(onset_time))
+        return self._onset[1]
+
+
+def session_index(session: TriageSession) -> SessionTextIndex:
+    """The session's text index, created on first use; it is not persisted with the session."""
+    index = session._text_index
+    if index is None:
+        index = session._text_index = SessionTextIndex()
+    return index.sync(session)
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from datetime import datetime
+from queue import SimpleQueue
+from threading import Lock, Thread
+from typing import Any, TypeVar
+
+from .models import ChatMessage, ChatResponse, HandoffTicket, TicketStatus, TriageSession
+from .storage import SQLiteStore
+
+T = TypeVar("T")
+
+
+def _resolve(future: asyncio.Future, result: Any, error: BaseException | None) -> None:
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class AsyncSQLiteStore:
+    """Asyncio facade over :class:`SQLiteStore`.
+
+    Writes are queued to one dedicated writer thread, which matches SQLite's single-writer
+    model and keeps writes in submission order. Reads, including Fernet decryption, run on
+    the loop's default executor. The event loop itself never touches sqlite3 or crypto.
+    """
+
+    def __init__(self, store: SQLiteStore) -> None:
+        self.store = store
+        self._jobs: SimpleQueue[tuple[asyncio.AbstractEventLoop, asyncio.Future, Callable[..., Any], tuple] | None] = (
+            SimpleQueue()
+        )
+        self._writer_lock = Lock()
+        self._writer: Thread | None = None
+        self._ensure_writer()
+
+    def _ensure_writer(self) -> None:
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = Thread(target=self._run_writer, name="celine-sqlite-writer", daemon=True)
+                self._writer.start()
+
+    def _run_writer(self) -> None:
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            loop, future, func, args = job
+            try:
+                result, error = func(*args), None
+            except BaseException as exc:  # delivered to the awaiting coroutine
+                result, error = None, exc
+            try:
+                loop.call_soon_threadsafe(_resolve, future, result, error)
+            except RuntimeError:
+                # The submitting loop is gone; the write itself has still been applied.
+                continue
+
+    async def _write(self, func: Callable[..., T], *args: Any) -> T:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._ensure_writer()
+        self._jobs.put((loop, future, func, args))
+        return await future
+
+    @staticmethod
+    async def _read(func: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def close(self) -> None:
+        """Stop the writer after the writes already queued; a later write restarts it."""
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._jobs.put(None)
+            writer.join(timeout=5)
+
+    async def run_write(self, func: Callable[..., T], *args: Any) -> T:
+        """Run a compound write (such as a whole turn in one ``batch``) on the writer thread."""
+        return await self._write(func, *args)
+
+    def forget_session(self, conversation_id: str) -> None:
+        # Only touches the in-memory cache, so it is safe to call on the loop.
+        self.store.forget_session(conversation_id)
+
+    async def get_or_create_session(self, conversation_id: str, patient_id: str) -> TriageSession:
+        session = await self._read(self.store.get_session, conversation_id)
+        if session is None:
+            session = await self._write(self.store.create_session, conversation_id, patient_id)
+        return session
+
+    async def save_session(self, session: TriageSession) -> None:
+        await self._write(self.store.save_session, session)
+
+    async def add_message(self, conversation_id: str, role: str, content: str, timestamp: datetime) -> ChatMessage:
+        return await self._write(self.store.add_message, conversation_id, role, content, timestamp)
+
+    async def get_idempotent_response(
+        self, conversation_id: str, idempotency_key: str, message: str | None = None
+    ) -> ChatResponse | None:
+        return await self._read(self.store.get_idempotent_response, conversation_id, idempotency_key, message)
+
+    async def save_idempotent_response(
+        self, conversation_id: str, idempotency_key: str, response: ChatResponse, message: str | None = None
+    ) -> None:
+        await self._write(self.store.save_idempotent_response, conversation_id, idempotency_key, response, message)
+
+    async def add_handoff_ticket(self, ticket: HandoffTicket) -> None:
+        await self._write(self.store.add_handoff_ticket, ticket)
+
+    async def get_messages(self, conversation_id: str, limit: int = 50) -> list[ChatMessage]:
+        return await self._read(self.store.get_messages, conversation_id, limit)
+
+    async def get_messages_after(self, conversation_id: str, after_id: int, limit: int = 500) -> list[ChatMessage]:
+        return await self._read(self.store.get_messages_after, conversation_id, after_id, limit)
+
+    async def get_messages_before(self, conversation_id: str, before_id: int, limit: int = 50) -> list[ChatMessage]:
+        return await self._read(self.store.get_messages_before, conversation_id, before_id, limit)
+
+    async def last_message_id(self, conversation_id: str) -> int:
+        return await self._read(self.store.last_message_id, conversation_id)
+
+    async def get_session_snapshot(self, conversation_id: str, include_audit: bool = False) -> dict[str, Any] | None:
+        return await self._read(self.store.get_session_snapshot, conversation_id, include_audit)
+
+    async def get_audit_events(self, conversation_id: str) -> list[dict[str, Any]]:
+        return await self._read(self.store.get_audit_events, conversation_id)
+
+    async def get_audit_page(self, conversation_id: str, after_seq: int = -1, limit: int = 100) -> list[dict[str, Any]]:
+        return await self._read(self.store.get_audit_page, conversation_id, after_seq, limit)
+
+    async def list_handoff_tickets(
+        self, limit: int = 200, status: TicketStatus = TicketStatus.OPEN, after: tuple[int, str, str] | None = None
+    ) -> list[HandoffTicket]:
+        return await self._read(self.store.list_handoff_tickets, limit, status, after)
+
+    async def count_handoff_tickets(self, status: TicketStatus = TicketStatus.OPEN) -> int:
+        return await self._read(self.store.count_handoff_tickets, status)
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from threading import Event, Thread
+
+from .events import BroadcastBackend, Deliver
+from .models import ChatMessage
+from .storage import ConnectionPool
+
+
+class SQLiteBroadcastBackend(BroadcastBackend):
+    """Message delivery across worker processes that share one database file.
+
+    The ``messages`` table already is an ordered log every worker can read, so each
+    process tails it from a background thread and fans new rows out to its own
+    subscribers. A local ``publish`` only wakes the tailer: messages from this process
+    and from the others then arrive in one id order, at most ``poll_interval`` after
+    they were committed elsewhere.
+    """
+
+    def __init__(self, db_path: str, poll_interval: float = 0.2, batch_size: int = 500) -> None:
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._wake = Event()
+        self._stop = Event()
+        self._thread: Thread | None = None
+
+    def start(self, deliver: Deliver) -> None:
+        super().start(deliver)
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._pool = ConnectionPool(self.db_path)
+        # Earlier messages are history: subscribers read them as their backlog.
+        self._after = self._last_id()
+        self._thread = Thread(target=self._run, name="celine-broadcast", daemon=True)
+        self._thread.start()
+
+    def publish(self, conversation_id: str, message: ChatMessage) -> None:
+        self._wake.set()
+
+    def _last_id(self) -> int:
+        try:
+            with self._pool.read() as conn:
+                row = conn.execute("SELECT MAX(id) AS last_id FROM messages").fetchone()
+        except sqlite3.OperationalError:
+            # Fresh database: the store creates the table right after the bus.
+            return 0
+        return int(row["last_id"] or 0)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                self._poll()
+            except sqlite3.OperationalError:
+                continue
+
+    def _poll(self) -> int:
+        """Deliver every message committed since the last poll; returns how many."""
+        delivered = 0
+        while True:
+            with self._pool.read() as conn:
+                rows = conn.execute(
+                    """
+                    SELECT id, conversation_id, role, content, timestamp
+                    FROM messages
+                    WHERE id > ?
+                    ORDER BY id ASC
+                    LIMIT ?
+                    """,
+                    (self._after, self.batch_size),
+                ).fetchall()
+            for row in rows:
+                message = ChatMessage(
+                    id=row["id"],
+                    role=row["role"],
+                    content=row["content"],
+                    timestamp=datetime.fromisoformat(row["timestamp"]),
+                )
+                self._deliver(row["conversation_id"], message)
+                self._after = row["id"]
+            delivered += len(rows)
+            if len(rows) < self.batch_size:
+                return delivered
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._pool.close()
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from threading import Event, Lock, Thread
+
+from .models import TriageSession, TriageState
+
+
+class SessionCache:
+    """Bounded LRU of live sessions with write-behind persistence.
+
+    Saved sessions are only marked dirty; a background flusher writes them out every
+    ``flush_interval`` seconds, so several turns of a hot conversation coalesce into one
+    write. Sessions entering a safety-critical state are written through immediately.
+    """
+
+    WRITE_THROUGH_STATES = frozenset({TriageState.ESCALATED, TriageState.CLOSED})
+
+    def __init__(
+        self,
+        persist: Callable[[TriageSession], None],
+        capacity: int = 1024,
+        flush_interval: float = 2.0,
+    ) -> None:
+        self._persist = persist
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self._entries: OrderedDict[str, TriageSession] = OrderedDict()
+        self._dirty: set[str] = set()
+        self._lock = Lock()
+        self._stop = Event()
+        self._flusher: Thread | None = None
+        if flush_interval > 0:
+            self._flusher = Thread(target=self._run_flusher, name="celine-session-flusher", daemon=True)
+            self._flusher.start()
+
+    def get(
+        self, conversation_id: str, copy: Callable[[TriageSession], TriageSession] | None = None
+    ) -> TriageSession | None:
+        """The cached session, or ``copy`` of it taken under the lock, where no flush can trim it."""
+        with self._lock:
+            session = self._entries.get(conversation_id)
+            if session is None:
+                return None
+            self._entries.move_to_end(conversation_id)
+            return copy(session) if copy is not None else session
+
+    def put(self, session: TriageSession, dirty: bool = True) -> None:
+        with self._lock:
+            current = self._entries.get(session.session_id)
+            if current is not None and current is not session:
+                # The copy may have been taken before a flush of the entry it replaces.
+                session._version = max(session._version, current._version)
+            self._entries[session.session_id] = session
+            self._entries.move_to_end(session.session_id)
+            if dirty:
+                self._dirty.add(session.session_id)
+            else:
+                self._dirty.discard(session.session_id)
+            while len(self._entries) > self.capacity:
+                evicted_id, evicted = self._entries.popitem(last=False)
+                if evicted_id in self._dirty:
+                    # Persist under the lock so a concurrent miss cannot read the stale row.
+                    self._dirty.discard(evicted_id)
+                    self._persist(evicted)
+        if dirty and session.state in self.WRITE_THROUGH_STATES:
+            self.flush([session.session_id])
+
+    def discard(self, conversation_id: str) -> None:
+        """Forget a session without writing it, e.g. a copy that lost a concurrent update."""
+        with self._lock:
+            self._entries.pop(conversation_id, None)
+            self._dirty.discard(conversation_id)
+
+    def is_dirty(self, conversation_id: str) -> bool:
+        with self._lock:
+            return conversation_id in self._dirty
+
+    def flush(self, conversation_ids: Iterable[str] | None = None) -> int:
+        with self._lock:
+            pending = list(self._dirty if conversation_ids is None else self._dirty.intersection(conversation_ids))
+        written = 0
+        for conversation_id in pending:
+            # Persist under the lock, as on eviction, so a concurrent put() sees the version
+            # this write bumps. A failed write leaves the entry dirty.
+            with self._lock:
+                if conversation_id not in self._dirty:
+                    continue
+                self._persist(self._entries[conversation_id])
+                self._dirty.discard(conversation_id)
+            written += 1
+        return written
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+    def _run_flusher(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                # Entries stay dirty and are retried on the next tick or at shutdown.
+                continue
@@ -0,0 +1,63 @@
+"""Plaintext formats for encrypted payloads (sessions, audit events, replayed responses).
+
+Every payload written by a codec starts with a two-byte header: ``MAGIC`` and a format
+version, followed by a flags byte. Payloads stored before codecs existed are bare JSON
+documents, which can never start with ``MAGIC``, so both are read transparently. Reads
+dispatch on the format version through ``CODECS``, so a store keeps reading every format
+it ever wrote after it switches to a newer one.
+"""
+
+from __future__ import annotations
+
+import json
+import zlib
+from collections.abc import Mapping
+from typing import Any
+
+MAGIC = 0xC5
+FLAG_ZLIB = 0x01
+
+
+class PayloadCodec:
+    """Format 1: compact JSON, zlib-compressed when that actually makes it smaller."""
+
+    version = 1
+
+    def __init__(self, compress: bool = True, level: int = 6, min_size: int = 256) -> None:
+        self.compress = compress
+        self.level = level
+        self.min_size = min_size
+
+    def encode(self, payload: dict[str, Any]) -> bytes:
+        body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str).encode()
+        flags = 0
+        if self.compress and len(body) >= self.min_size:
+            packed = zlib.compress(body, self.level)
+            if len(packed) < len(body):
+                body, flags = packed, flags | FLAG_ZLIB
+        return bytes((MAGIC, self.version, flags)) + body
+
+    def decode(self, data: bytes) -> dict[str, Any]:
+        """Decode a payload carrying this codec's header."""
+        body = data[3:]
+        if data[2] & FLAG_ZLIB:
+            body = zlib.decompress(body)
+        return json.loads(body)
+
+
+# Format version -> the codec that reads it.
+CODECS: dict[int, PayloadCodec] = {PayloadCodec.version: PayloadCodec()}
+
+
+def register_codec(codec: PayloadCodec) -> None:
+    """Make payloads in ``codec``'s format readable by every store."""
+    CODECS[codec.version] = codec
+
+
+def decode_payload(data: bytes, codecs: Mapping[int, PayloadCodec] = CODECS) -> dict[str, Any]:
+    if not data or data[0] != MAGIC:
+        return json.loads(data)
+    codec = codecs.get(data[1])
+    if codec is None:
+        raise ValueError(f"unsupported payload format version {data[1]}")
+    return codec.decode(data)
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from collections.abc import AsyncIterator, Awaitable, Callable
+from threading import Lock
+from typing import Any
+
+from .models import ChatMessage
+
+Deliver = Callable[[str, ChatMessage], None]
+
+
+class Subscription:
+    def __init__(self, conversation_id: str, loop: asyncio.AbstractEventLoop, max_pending: int) -> None:
+        self.conversation_id = conversation_id
+        self.loop = loop
+        self.queue: asyncio.Queue[ChatMessage] = asyncio.Queue(maxsize=max_pending)
+        self.overflowed = False
+
+    def _deliver(self, message: ChatMessage) -> None:
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Slow consumer: end its stream so the client resumes from Last-Event-ID.
+            self.overflowed = True
+
+
+class BroadcastBackend:
+    """Carries published messages to every process that may hold subscribers.
+
+    The bus hands its local fan-out to ``start``; the backend calls it for each message,
+    whichever worker process stored it. This default serves a single process and delivers
+    straight away.
+    """
+
+    def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    def publish(self, conversation_id: str, message: ChatMessage) -> None:
+        self._deliver(conversation_id, message)
+
+    def close(self) -> None:
+        pass
+
+
+class MessageBus:
+    """Fan-out of stored chat messages to live subscribers in this process.
+
+    ``publish`` may be called from any thread (sync handlers run on the threadpool);
+    delivery is marshalled onto each subscriber's event loop. Messages stored by other
+    worker processes arrive through the ``backend`` (see ``app.broadcast``).
+    """
+
+    def __init__(self, max_pending: int = 256, backend: BroadcastBackend | None = None) -> None:
+        self.max_pending = max_pending
+        self._subscribers: dict[str, set[Subscription]] = {}
+        self._lock = Lock()
+        self.backend = backend or BroadcastBackend()
+        self.backend.start(self._deliver)
+
+    def subscribe(self, conversation_id: str) -> Subscription:
+        subscription = Subscription(conversation_id, asyncio.get_running_loop(), self.max_pending)
+        with self._lock:
+            self._subscribers.setdefault(conversation_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.conversation_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.conversation_id]
+
+    def publish(self, conversation_id: str, message: ChatMessage) -> None:
+        self.backend.publish(conversation_id, message)
+
+    def _deliver(self, conversation_id: str, message: ChatMessage) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(conversation_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._deliver, message)
+            except RuntimeError:
+                # The subscriber's loop has shut down; it will be unsubscribed by its stream.
+                continue
+
+    def close(self) -> None:
+        self.backend.close()
+
+
+def format_sse(message: ChatMessage) -> str:
+    return f"id: {message.id}\nevent: message\ndata: {json.dumps(message.model_dump(mode='json'))}\n\n"
+
+
+async def stream_conversation(
+    bus: MessageBus,
+    conversation_id: str,
+    backlog: Callable[[], Awaitable[list[ChatMessage]]],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    keepalive: float = 15.0,
+) -> AsyncIterator[str]:
+    """Server-Sent Events for one conversation: the stored backlog, then live messages."""
+    # Subscribe before reading the backlog so nothing written in between is missed.
+    subscription = bus.subscribe(conversation_id)
+    try:
+        yield "retry: 3000\n\n"
+        last_id = 0
+        for message in await backlog():
+            last_id = max(last_id, message.id or 0)
+            yield format_sse(message)
+        while not subscription.overflowed:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+                continue
+            if (message.id or 0) <= last_id:
+                continue
+            last_id = message.id or last_id
+            yield format_sse(message)
+    finally:
+        bus.unsubscribe(subscription)
+
+
+def message_event(message: ChatMessage) -> dict[str, Any]:
+    return {"type": "message", "message": message.model_dump(mode="json")}
+
+
+async def push_conversation(
+    websocket: Any,
+    bus: MessageBus,
+    conversation_id: str,
+    backlog: Callable[[], Awaitable[list[ChatMessage]]],
+    keepalive: float = 15.0,
+) -> None:
+    """WebSocket feed for one accepted socket: the stored backlog, then live messages.
+
+    A consumer that falls behind is closed with 1013 and reconnects with ``after_id``.
+    Anything the client sends is ignored; its disconnect ends the feed.
+    """
+    subscription = bus.subscribe(conversation_id)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(websocket))
+    try:
+        last_id = 0
+        for message in await backlog():
+            last_id = max(last_id, message.id or 0)
+            await websocket.send_json(message_event(message))
+        while not subscription.overflowed:
+            receive = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait({receive, disconnected}, timeout=keepalive, return_when=asyncio.FIRST_COMPLETED)
+            if receive not in done:
+                receive.cancel()
+                if disconnected in done:
+                    return
+                continue
+            message = receive.result()
+            if (message.id or 0) <= last_id:
+                continue
+            last_id = message.id or last_id
+            await websocket.send_json(message_event(message))
+        await websocket.close(code=1013)
+    finally:
+        disconnected.cancel()
+        bus.unsubscribe(subscription)
+
+
+async def _wait_for_disconnect(websocket: Any) -> None:
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
@@ -0,0 +1,216 @@
+"""Stream sessions, messages and audit trails out of the store as NDJSON.
+
+Usage::
+
+    python -m app.export --db data/celine.db --since 2024-01-01 --urgency EMERGENCY --workers 4 > export.ndjson
+
+Tables are walked one after another in keyset pages, and encrypted payloads are decrypted
+page by page (in a process pool with ``--workers``), so memory stays flat however many rows
+are exported. Every record carries a ``resume`` token: pass the last one received to
+continue an interrupted export right after that record. The final line is an ``end``
+record, so a truncated export is easy to recognise.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import binascii
+import json
+import sys
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any
+
+from .models import UrgencyLevel
+from .storage import PayloadCipher, SQLiteStore
+
+TABLES = ("sessions", "messages", "audit_events")
+
+
+class ExportError(ValueError):
+    """An export request that cannot be served, such as a malformed resume token."""
+
+
+@dataclass(frozen=True)
+class ExportFilter:
+    """Which rows to export. Times bound each row's own timestamp; ``until`` is exclusive."""
+
+    since: datetime | None = None
+    until: datetime | None = None
+    urgency: tuple[str, ...] = ()
+    tables: tuple[str, ...] = TABLES
+
+    def __post_init__(self) -> None:
+        unknown = set(self.tables) - set(TABLES)
+        if unknown:
+            raise ExportError(f"unknown export tables: {', '.join(sorted(unknown))}")
+
+
+def encode_resume(table: str, key: str | int) -> str:
+    return base64.urlsafe_b64encode(f"{table}:{key}".encode()).decode().rstrip("=")
+
+
+def decode_resume(token: str) -> tuple[str, str | int]:
+    try:
+        table, _, key = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode().partition(":")
+    except (binascii.Error, UnicodeDecodeError) as exc:
+        raise ExportError("invalid resume token") from exc
+    if table == "sessions" and key:
+        return table, key
+    if table in TABLES and key.isdigit():
+        return table, int(key)
+    raise ExportError("invalid resume token")
+
+
+def _bound(moment: datetime | None) -> str | None:
+    # Stored times are UTC ISO text, which orders correctly as plain strings.
+    if moment is None:
+        return None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.isoformat()
+
+
+def _decode_page(cipher: PayloadCipher, table: str, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Turn raw rows into export records; runs in a worker process when a pool is used."""
+    records = []
+    for row in rows:
+        if table == "sessions":
+            session = cipher.decrypt(row.pop("payload"))
+            session.pop("audit_log", None)
+            record = {"type": "session", **row, "session": session}
+            key = row["conversation_id"]
+        elif table == "audit_events":
+            event = cipher.decrypt(row.pop("payload"))
+            record = {"type": "audit_event", **row, "event": event}
+            key = row["id"]
+        else:
+            record = {"type": "message", **row}
+            key = row["id"]
+        record["resume"] = encode_resume(table, key)
+        records.append(record)
+    return records
+
+
+def _raw_pages(
+    store: SQLiteStore, table: str, after: str | int, filters: ExportFilter, batch_size: int
+) -> Iterator[list[dict[str, Any]]]:
+    key = store.EXPORT_TABLES[table][0]
+    since, until = _bound(filters.since), _bound(filters.until)
+    while True:
+        rows = store.export_page(table, after, batch_size, since, until, filters.urgency)
+        if not rows:
+            return
+        after = rows[-1][key]
+        yield rows
+
+
+def _decoded_pages(
+    pages: Iterable[list[dict[str, Any]]], cipher: PayloadCipher, table: str, pool: Executor | None, window: int
+) -> Iterator[list[dict[str, Any]]]:
+    # Messages are stored in the clear, so only encrypted tables are worth shipping to workers.
+    if pool is None or table == "messages":
+        for rows in pages:
+            yield _decode_page(cipher, table, rows)
+        return
+    pending: deque[Future[list[dict[str, Any]]]] = deque()
+    for rows in pages:
+        pending.append(pool.submit(_decode_page, cipher, table, rows))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def iter_export_pages(
+    store: SQLiteStore,
+    filters: ExportFilter = ExportFilter(),
+    resume: str | None = None,
+    workers: int = 0,
+    batch_size: int = 500,
+    window: int = 8,
+) -> Iterator[list[dict[str, Any]]]:
+    """Export records page by page, in table order and key order within a table.
+
+    ``workers=0`` decrypts in-process; otherwise a process pool decrypts with at most
+    ``window`` pages in flight. A bad resume token is rejected here, before any row is read.
+    """
+    position = decode_resume(resume) if resume else None
+    if position is not None and position[0] not in filters.tables:
+        raise ExportError(f"resume token points into {position[0]}, which is not being exported")
+    return _export_pages(store, filters, position, workers, batch_size, window)
+
+
+def _export_pages(
+    store: SQLiteStore,
+    filters: ExportFilter,
+    position: tuple[str, str | int] | None,
+    workers: int,
+    batch_size: int,
+    window: int,
+) -> Iterator[list[dict[str, Any]]]:
+    store.flush_sessions()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    try:
+        for table in sorted(filters.tables, key=TABLES.index):
+            if position is not None and TABLES.index(table) < TABLES.index(position[0]):
+                continue
+            after = position[1] if position is not None and position[0] == table else ("" if table == "sessions" else 0)
+            pages = _raw_pages(store, table, after, filters, batch_size)
+            yield from _decoded_pages(pages, store.cipher, table, pool, window)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def iter_export(store: SQLiteStore, filters: ExportFilter = ExportFilter(), **options: Any) -> Iterator[dict[str, Any]]:
+    for page in iter_export_pages(store, filters, **options):
+        yield from page
+
+
+def export_ndjson(store: SQLiteStore, filters: ExportFilter = ExportFilter(), **options: Any) -> Iterator[bytes]:
+    """NDJSON chunks, one per page, followed by the ``end`` record."""
+    return _ndjson(iter_export_pages(store, filters, **options))
+
+
+def _ndjson(pages: Iterable[list[dict[str, Any]]]) -> Iterator[bytes]:
+    total = 0
+    for page in pages:
+        total += len(page)
+        yield "".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in page).encode()
+    yield (json.dumps({"type": "end", "records": total}) + "\n").encode()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Export sessions, messages and audit trails as NDJSON.")
+    parser.add_argument("--db", default="data/celine.db", help="source database")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="only rows at or after this UTC time")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="only rows before this UTC time")
+    parser.add_argument(
+        "--urgency", action="append", default=[], choices=[level.value for level in UrgencyLevel],
+        help="only conversations at this urgency (repeatable)",
+    )
+    parser.add_argument("--table", action="append", default=[], choices=TABLES, help="tables to export (repeatable)")
+    parser.add_argument("--resume", help="resume token of the last record received")
+    parser.add_argument("--workers", type=int, default=0, help="decryption worker processes (0 = in-process)")
+    parser.add_argument("--batch-size", type=int, default=500, help="rows per page")
+    args = parser.parse_args(argv)
+
+    store = SQLiteStore(db_path=args.db)
+    filters = ExportFilter(args.since, args.until, tuple(args.urgency), tuple(args.table) or TABLES)
+    try:
+        for chunk in export_ndjson(store, filters, resume=args.resume, workers=args.workers, batch_size=args.batch_size):
+            sys.stdout.buffer.write(chunk)
+    except ExportError as exc:
+        parser.error(str(exc))
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
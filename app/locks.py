@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections.abc import AsyncIterator, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from threading import Lock
+from typing import TYPE_CHECKING
+from uuid import uuid4
+
+if TYPE_CHECKING:
+    from .storage import SQLiteStore
+
+
+class LeaseTimeout(TimeoutError):
+    """Another worker process kept a conversation's lease for longer than we were willing to wait."""
+
+
+# Threads that block on contended locks for coroutines. Kept apart from the loop's default
+# executor, which the lock holder needs for its own reads: waiters can never starve it.
+_LOCK_WAITERS = ThreadPoolExecutor(max_workers=32, thread_name_prefix="celine-lock-wait")
+
+
+class KeyedLocks:
+    """One mutex per key, created on demand and dropped once nobody holds or waits on it.
+
+    Turns of the same conversation are serialized while different conversations never
+    contend with each other. Sync and async callers share the same table, so a thread
+    and a coroutine working on one conversation also exclude each other.
+    """
+
+    def __init__(self) -> None:
+        self._guard = Lock()
+        self._locks: dict[str, list] = {}
+
+    def _checkout(self, key: str) -> Lock:
+        with self._guard:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [Lock(), 0]
+            entry[1] += 1
+            return entry[0]
+
+    def _checkin(self, key: str) -> None:
+        with self._guard:
+            entry = self._locks[key]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def __len__(self) -> int:
+        with self._guard:
+            return len(self._locks)
+
+    @contextmanager
+    def hold(self, key: str) -> Iterator[None]:
+        lock = self._checkout(key)
+        try:
+            with lock:
+                yield
+        finally:
+            self._checkin(key)
+
+    @asynccontextmanager
+    async def hold_async(self, key: str) -> AsyncIterator[None]:
+        lock = self._checkout(key)
+        if not lock.acquire(blocking=False):
+            # Contended: wait on a lock-wait thread so the event loop keeps running.
+            waiter = asyncio.get_running_loop().run_in_executor(_LOCK_WAITERS, lock.acquire)
+            try:
+                await asyncio.shield(waiter)
+            except asyncio.CancelledError:
+                waiter.add_done_callback(lambda _: self._release(key, lock))
+                raise
+        try:
+            yield
+        finally:
+            self._release(key, lock)
+
+    def _release(self, key: str, lock: Lock) -> None:
+        lock.release()
+        self._checkin(key)
+
+
+class LeaseLocks(KeyedLocks):
+    """KeyedLocks that also exclude other worker processes sharing the same database.
+
+    Threads and coroutines of this process first queue on the in-process lock, so only
+    one of them at a time competes for the conversation's lease row. A lease expires
+    after ``ttl`` seconds, so a crashed worker cannot block its conversations for long;
+    a turn that outlives its lease is caught by the optimistic session version check.
+    """
+
+    def __init__(self, store: SQLiteStore, ttl: float = 30.0, timeout: float = 10.0, poll_interval: float = 0.005) -> None:
+        super().__init__()
+        self.store = store
+        self.ttl = ttl
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.owner = f"{os.getpid()}-{uuid4().hex}"
+
+    def _acquire_lease(self, key: str) -> None:
+        deadline = time.monotonic() + self.timeout
+        delay = self.poll_interval
+        while not self.store.acquire_lease(key, self.owner, self.ttl):
+            if time.monotonic() >= deadline:
+                raise LeaseTimeout(f"conversation {key} is held by another worker")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    @contextmanager
+    def hold(self, key: str) -> Iterator[None]:
+        with super().hold(key):
+            self._acquire_lease(key)
+            try:
+                yield
+            finally:
+                self.store.release_lease(key, self.owner)
+
+    @asynccontextmanager
+    async def hold_async(self, key: str) -> AsyncIterator[None]:
+        loop = asyncio.get_running_loop()
+        async with super().hold_async(key):
+            await self._acquire_lease_async(loop, key)
+            try:
+                yield
+            finally:
+                await loop.run_in_executor(None, self.store.release_lease, key, self.owner)
+
+    async def _acquire_lease_async(self, loop: asyncio.AbstractEventLoop, key: str) -> None:
+        # Only each single acquire_lease statement runs on the executor; the waits between
+        # attempts happen on the loop, so a waiting turn never parks an executor thread.
+        deadline = time.monotonic() + self.timeout
+        delay = self.poll_interval
+        while True:
+            attempt = loop.run_in_executor(None, self.store.acquire_lease, key, self.owner, self.ttl)
+            try:
+                acquired = await asyncio.shield(attempt)
+            except asyncio.CancelledError:
+                # The lease may still be granted after we gave up; hand it straight back.
+                attempt.add_done_callback(lambda done: self._release_abandoned(key, done))
+                raise
+            if acquired:
+                return
+            if time.monotonic() >= deadline:
+                raise LeaseTimeout(f"conversation {key} is held by another worker")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    def _release_abandoned(self, key: str, attempt: asyncio.Future) -> None:
+        if not attempt.cancelled() and attempt.exception() is None and attempt.result():
+            self.store.release_lease(key, self.owner)
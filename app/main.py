@@ -1,28 +1,78 @@
+import base64
+import binascii
 import os
+import re
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 
-from fastapi import FastAPI, Form, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import FastAPI, Form, Header, HTTPException, Query, Request, Response, WebSocket
+from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
-from .models import ChatRequest, HandoffTicket
-from .orchestrator import DeterministicOrchestrator
-from .storage import SQLiteStore
+from .async_storage import AsyncSQLiteStore
+from .broadcast import SQLiteBroadcastBackend
+from .events import MessageBus, push_conversation, stream_conversation
+from .export import TABLES, ExportError, ExportFilter, export_ndjson
+from .locks import LeaseLocks
+from .metrics import REGISTRY
+from .models import BatchChatError, BatchChatRequest, BatchChatResponse, ChatRequest, TicketStatus, UrgencyLevel
+from .orchestrator import AsyncDeterministicOrchestrator, DeterministicOrchestrator
+from .rulepacks import RulePackManager
+from .storage import IdempotencyKeyReusedError, SQLiteStore
+from .tickets import queue_key
 
-app = FastAPI(title="Celine Hospital Triage System")
+db_path = os.getenv("CELINE_DB_PATH", "data/celine.db")
+# Several uvicorn worker processes share one database file: sessions are coordinated
+# through lease rows and version checks instead of in-process state alone.
+multiprocess = int(os.getenv("WEB_CONCURRENCY", "1")) > 1
+# "sqlite" lets every worker process push messages stored by the others.
+broadcast_backend = os.getenv("CELINE_BROADCAST_BACKEND", "sqlite" if multiprocess else "memory")
+message_bus = MessageBus(backend=SQLiteBroadcastBackend(db_path) if broadcast_backend == "sqlite" else None)
+store = SQLiteStore(
+    db_path=db_path,
+    session_cache_size=int(os.getenv("CELINE_SESSION_CACHE_SIZE", "1024")),
+    session_flush_interval=float(os.getenv("CELINE_SESSION_FLUSH_INTERVAL", "2.0")),
+    message_bus=message_bus,
+    shared=multiprocess,
+)
+rule_packs = RulePackManager(
+    os.getenv("CELINE_RULES_PATH", "app/config/clinical_rules.json"),
+    poll_interval=float(os.getenv("CELINE_RULES_RELOAD_INTERVAL", "5.0")),
+)
+orchestrator = DeterministicOrchestrator(
+    store=store, rule_packs=rule_packs, locks=LeaseLocks(store) if multiprocess else None
+)
+async_store = AsyncSQLiteStore(store)
+async_orchestrator = AsyncDeterministicOrchestrator(orchestrator, async_store)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    yield
+    # Drain queued writes, then persist sessions still pending in the write-behind cache.
+    rule_packs.close()
+    orchestrator.close()
+    async_store.close()
+    message_bus.close()
+    store.close()
+
+
+app = FastAPI(title="Celine Hospital Triage System", lifespan=lifespan)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
-store = SQLiteStore(db_path=os.getenv("CELINE_DB_PATH", "data/celine.db"))
-orchestrator = DeterministicOrchestrator(store=store)
-
 
 @app.get("/health")
 def healthcheck():
     return {"ok": True, "service": app.title, "safe_mode": "deterministic"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/", response_class=HTMLResponse)
 def home(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
@@ -42,54 +92,228 @@ def terms_of_service(request: Request):
 
 @app.get("/admin", response_class=HTMLResponse)
 def admin(request: Request, conversation_id: str | None = None):
-    selected_messages = store.get_messages(conversation_id) if conversation_id else []
-    selected_session = store.get_session_snapshot(conversation_id) if conversation_id else None
-    selected_audit = store.get_audit_events(conversation_id) if conversation_id else []
+    # Only the page shell: tickets, messages and the audit trail are fetched page by page
+    # from the /admin/api endpoints by static/admin.js.
     return templates.TemplateResponse(
         "admin.html",
         {
             "request": request,
-            "tickets": store.list_handoff_tickets(),
             "current_model": "Not used (deterministic controller)",
             "selected_conversation_id": conversation_id,
-            "selected_messages": selected_messages,
-            "selected_session": selected_session,
-            "selected_audit": selected_audit,
-            "prompt_entries": [],
         },
     )
 
 
+@app.get("/admin/api/tickets")
+async def admin_tickets(
+    status: TicketStatus = TicketStatus.OPEN, limit: int = Query(default=50, ge=1, le=500), cursor: str | None = None
+):
+    after = decode_ticket_cursor(cursor) if cursor else None
+    tickets = await async_store.list_handoff_tickets(limit, status, after)
+    return {
+        "tickets": tickets,
+        "count": await async_store.count_handoff_tickets(status),
+        "next_cursor": encode_ticket_cursor(queue_key(tickets[-1])) if len(tickets) == limit else None,
+    }
+
+
+@app.get("/admin/api/conversations/{conversation_id}/session")
+async def admin_session(conversation_id: str):
+    snapshot = await async_store.get_session_snapshot(conversation_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Unknown conversation")
+    return {"session": snapshot}
+
+
+@app.get("/admin/api/conversations/{conversation_id}/messages")
+async def admin_messages(
+    conversation_id: str, limit: int = Query(default=50, ge=1, le=500), cursor: str | None = None
+):
+    """Newest page first; ``next_cursor`` walks back towards the start of the conversation."""
+    if cursor is None:
+        messages = await async_store.get_messages(conversation_id, limit)
+    else:
+        messages = await async_store.get_messages_before(conversation_id, decode_history_cursor(cursor), limit)
+    older = encode_history_cursor(messages[0].id) if len(messages) == limit else None
+    return {"messages": messages, "next_cursor": older}
+
+
+@app.get("/admin/api/conversations/{conversation_id}/audit")
+async def admin_audit(
+    conversation_id: str, limit: int = Query(default=100, ge=1, le=1000), cursor: str | None = None
+):
+    after_seq = int(decode_cursor(cursor, "a", "audit")) if cursor else -1
+    events = await async_store.get_audit_page(conversation_id, after_seq, limit)
+    return {
+        "events": events,
+        "next_cursor": encode_cursor("a", str(events[-1]["seq"])) if len(events) == limit else None,
+    }
+
+
+@app.get("/admin/export")
+def export_records(
+    since: datetime | None = None,
+    until: datetime | None = None,
+    urgency: list[UrgencyLevel] = Query(default=[]),
+    table: list[str] = Query(default=[]),
+    resume: str | None = None,
+):
+    # Streamed page by page from keyset reads; bulk exports belong to `python -m app.export`,
+    # which can also decrypt in worker processes.
+    try:
+        filters = ExportFilter(since, until, tuple(level.value for level in urgency), tuple(table) or TABLES)
+        chunks = export_ndjson(store, filters, resume=resume)
+    except ExportError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return StreamingResponse(chunks, media_type="application/x-ndjson")
+
+
 @app.post("/chat")
-def chat(chat_request: ChatRequest):
-    result = orchestrator.process(chat_request.conversation_id, chat_request.patient_id, chat_request.message)
-    if result.handoff_ticket:
-        store.add_handoff_ticket(HandoffTicket(**result.handoff_ticket, created_at=datetime.now(timezone.utc)))
+async def chat(chat_request: ChatRequest, idempotency_key: str | None = Header(default=None, max_length=200)):
+    # Retried requests with a known key get the stored response without re-running the turn;
+    # any handoff ticket was committed with the original turn.
+    try:
+        result = await async_orchestrator.process(
+            chat_request.conversation_id,
+            chat_request.patient_id,
+            chat_request.message,
+            idempotency_key=chat_request.idempotency_key or idempotency_key,
+        )
+    except IdempotencyKeyReusedError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
     return result.response
 
 
+@app.post("/chat/batch", response_model=BatchChatResponse)
+def chat_batch(batch_request: BatchChatRequest):
+    # Conversations fail independently; the turns that did commit are always returned.
+    outcome = orchestrator.process_many(batch_request.turns)
+    errors = []
+    for failure in outcome.failures.values():
+        client_error = isinstance(failure.error, IdempotencyKeyReusedError)
+        detail = str(failure.error) if client_error else "Turn could not be processed; retry it"
+        errors.append(BatchChatError(conversation_id=failure.conversation_id, detail=detail, failed_turns=failure.positions))
+    return BatchChatResponse(results=[result.response if result else None for result in outcome.results], errors=errors)
+
+
 @app.post("/admin/resolve")
 def resolve_ticket(ticket_id: str = Form(...)):
     remaining = store.resolve_handoff_ticket(ticket_id=ticket_id)
     return {"ok": True, "remaining": remaining}
 
 
+@app.get("/admin/rules")
+def rule_pack_status():
+    pack = rule_packs.current
+    return {"version": pack.version, "loaded_at": pack.loaded_at, "last_error": rule_packs.last_error}
+
+
+@app.post("/admin/rules/reload")
+def reload_rule_pack():
+    reloaded = rule_packs.reload(force=True)
+    return {"reloaded": reloaded, **rule_pack_status()}
+
+
 @app.post("/admin/reply")
-def admin_reply(conversation_id: str = Form(...), message: str = Form(...)):
+def admin_reply(request: Request, conversation_id: str = Form(...), message: str = Form(...)):
     cleaned = message.strip()
-    if cleaned:
-        store.add_message(conversation_id, "human", cleaned, datetime.now(timezone.utc))
+    stored = store.add_message(conversation_id, "human", cleaned, datetime.now(timezone.utc)) if cleaned else None
+    # The dashboard posts with fetch and shows the reply when it comes back over its socket.
+    if "application/json" in request.headers.get("accept", ""):
+        return {"ok": stored is not None, "message": stored}
     return RedirectResponse(url=f"/admin?conversation_id={conversation_id}", status_code=303)
 
 
+def encode_cursor(kind: str, value: str) -> str:
+    return base64.urlsafe_b64encode(f"{kind}:{value}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, kind: str, name: str, pattern: str = r"\d+") -> str:
+    try:
+        found, _, value = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().partition(":")
+        if found == kind and re.fullmatch(pattern, value):
+            return value
+    except (binascii.Error, UnicodeDecodeError):
+        pass
+    raise HTTPException(status_code=400, detail=f"Invalid {name} cursor")
+
+
+def encode_history_cursor(message_id: int) -> str:
+    return encode_cursor("m", str(message_id))
+
+
+def decode_history_cursor(cursor: str) -> int:
+    return int(decode_cursor(cursor, "m", "history"))
+
+
+def encode_ticket_cursor(key: tuple[int, str, str]) -> str:
+    return encode_cursor("t", "|".join(str(part) for part in key))
+
+
+def decode_ticket_cursor(cursor: str) -> tuple[int, str, str]:
+    priority, created_at, ticket_id = decode_cursor(cursor, "t", "ticket", r"\d+\|[^|]+\|.+").split("|", 2)
+    return int(priority), created_at, ticket_id
+
+
 @app.get("/chat/history/{conversation_id}")
-def chat_history(conversation_id: str):
-    messages = store.get_messages(conversation_id)
-    return {"conversation_id": conversation_id, "messages": messages}
+async def chat_history(
+    conversation_id: str,
+    request: Request,
+    response: Response,
+    after_id: int | None = None,
+    cursor: str | None = None,
+):
+    if cursor is not None:
+        after_id = decode_history_cursor(cursor)
+    # The newest message id identifies the conversation version, so unchanged polls
+    # are answered from one index lookup without loading any rows.
+    last_id = await async_store.last_message_id(conversation_id)
+    etag = f'W/"{conversation_id}:{last_id}"'
+    if etag in {tag.strip() for tag in request.headers.get("if-none-match", "").split(",")}:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    if after_id is None:
+        messages = await async_store.get_messages(conversation_id)
+    else:
+        messages = await async_store.get_messages_after(conversation_id, after_id)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    next_id = messages[-1].id if messages else (after_id if after_id is not None else last_id)
+    return {"conversation_id": conversation_id, "messages": messages, "cursor": encode_history_cursor(next_id)}
+
+
+@app.get("/chat/stream/{conversation_id}")
+async def chat_stream(conversation_id: str, request: Request, after_id: int | None = None):
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        after_id = int(last_event_id)
+
+    async def backlog():
+        if after_id is None:
+            return await async_store.get_messages(conversation_id)
+        return await async_store.get_messages_after(conversation_id, after_id)
+
+    return StreamingResponse(
+        stream_conversation(message_bus, conversation_id, backlog, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/chat/ws/{conversation_id}")
+async def chat_socket(websocket: WebSocket, conversation_id: str, after_id: int | None = None):
+    await websocket.accept()
+
+    async def backlog():
+        if after_id is None:
+            return await async_store.get_messages(conversation_id)
+        return await async_store.get_messages_after(conversation_id, after_id)
+
+    await push_conversation(websocket, message_bus, conversation_id, backlog)
 
 
 @app.get("/session/{conversation_id}")
-def session_snapshot(conversation_id: str):
-    snapshot = store.get_session_snapshot(conversation_id)
-    audit = store.get_audit_events(conversation_id)
+async def session_snapshot(conversation_id: str):
+    snapshot = await async_store.get_session_snapshot(conversation_id)
+    audit = await async_store.get_audit_events(conversation_id)
     return {"session": snapshot, "audit_log": audit}
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterable, Iterator
+
+
+class PhraseMatcher:
+    """Aho-Corasick automaton that finds every phrase occurrence in one pass over the text.
+
+    Matching is case-sensitive; callers lowercase both phrases and text. With
+    ``whole_words=True`` a hit only counts when it is not glued to a neighbouring word
+    character, so "stroke" no longer fires inside "strokes".
+    """
+
+    def __init__(self, phrases: Iterable[str], whole_words: bool = False) -> None:
+        self.whole_words = whole_words
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[tuple[str, ...]] = [()]
+        for phrase in phrases:
+            if phrase:
+                self._insert(phrase)
+        self._build_failure_links()
+
+    def _insert(self, phrase: str) -> None:
+        state = 0
+        for char in phrase:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        if phrase not in self._output[state]:
+            self._output[state] += (phrase,)
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+    def iter_matches(self, text: str) -> Iterator[tuple[int, str]]:
+        """Yield ``(start, phrase)`` for every occurrence, including overlapping ones."""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for phrase in output[state]:
+                start = index - len(phrase) + 1
+                if self.whole_words and not self._on_word_boundary(text, start, index + 1):
+                    continue
+                yield start, phrase
+
+    def find(self, text: str) -> set[str]:
+        return {phrase for _, phrase in self.iter_matches(text)}
+
+    @staticmethod
+    def _on_word_boundary(text: str, start: int, end: int) -> bool:
+        before = text[start - 1] if start > 0 else " "
+        after = text[end] if end < len(text) else " "
+        return not (before.isalnum() or before == "_") and not (after.isalnum() or after == "_")
@@ -0,0 +1,214 @@
+"""Low-overhead Prometheus-style metrics.
+
+Every thread writes to its own shard, so recording a sample takes no lock and never
+contends with other request threads; ``render`` sums the shards when ``/metrics`` is
+scraped. A scrape may observe a shard mid-update, which is acceptable for monitoring.
+When a thread exits, its shard is folded into retired totals, so short-lived threads do
+not make the shard list, or scrapes, grow over the life of the process.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class _ShardHolder:
+    """Owns one thread's shard; it is dropped with the thread's locals when the thread exits."""
+
+    __slots__ = ("samples", "__weakref__")
+
+    def __init__(self) -> None:
+        self.samples: dict[tuple[str, ...], Any] = {}
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._local = threading.local()
+        self._shards: dict[int, dict[tuple[str, ...], Any]] = {}
+        self._retired: dict[tuple[str, ...], Any] = {}
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> dict[tuple[str, ...], Any]:
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            holder = self._local.holder = _ShardHolder()
+            with self._shards_lock:
+                self._shards[id(holder)] = holder.samples
+            weakref.finalize(holder, self._retire, id(holder))
+        return holder.samples
+
+    def _retire(self, key: int) -> None:
+        with self._shards_lock:
+            self._merge(self._retired, self._shards.pop(key))
+
+    def _totals(self) -> dict[tuple[str, ...], Any]:
+        """Retired totals plus every live shard, summed per label set."""
+        totals: dict[tuple[str, ...], Any] = {}
+        with self._shards_lock:
+            self._merge(totals, self._retired)
+            shards = list(self._shards.values())
+        for shard in shards:
+            self._merge(totals, shard)
+        return totals
+
+    def _merge(self, totals: dict[tuple[str, ...], Any], shard: dict[tuple[str, ...], Any]) -> None:
+        raise NotImplementedError
+
+    def _labels(self, values: tuple[str, ...], extra: tuple[str, str] | None = None) -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values)]
+        if extra is not None:
+            pairs.append(f'{extra[0]}="{extra[1]}"')
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._totals().get(labels, 0.0)
+
+    def _merge(self, totals: dict[tuple[str, ...], float], shard: dict[tuple[str, ...], float]) -> None:
+        for labels, value in list(shard.items()):
+            totals[labels] = totals.get(labels, 0.0) + value
+
+    def _samples(self) -> list[str]:
+        totals = self._totals()
+        return [f"{self.name}{self._labels(labels)} {_number(value)}" for labels, value in sorted(totals.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value: float, *labels: str) -> None:
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # Non-cumulative bucket counts, then sum and count.
+            state = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def timed(self, *labels: str) -> Callable[[F], F]:
+        def decorate(func: F) -> F:
+            @wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - started, *labels)
+
+            return wrapper  # type: ignore[return-value]
+
+        return decorate
+
+    def count(self, *labels: str) -> int:
+        state = self._totals().get(labels)
+        return int(state[-1]) if state else 0
+
+    def _merge(self, totals: dict[tuple[str, ...], list[float]], shard: dict[tuple[str, ...], list[float]]) -> None:
+        for labels, state in list(shard.items()):
+            total = totals.setdefault(labels, [0] * len(state))
+            for index, value in enumerate(list(state)):
+                total[index] += value
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for labels, state in sorted(self._totals().items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), state):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                lines.append(f"{self.name}_bucket{self._labels(labels, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {_number(state[-2])}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {int(state[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: list[_Metric] = []
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Histogram:
+        metric = Histogram(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+REGISTRY = MetricsRegistry()
+
+PIPELINE_STAGE_SECONDS = REGISTRY.histogram(
+    "celine_pipeline_stage_seconds", "Time spent in each orchestrator pipeline stage.", ("stage",)
+)
+STORE_QUERY_SECONDS = REGISTRY.histogram(
+    "celine_store_query_seconds", "Time spent in SQLiteStore operations.", ("operation",)
+)
+CRYPTO_SECONDS = REGISTRY.histogram("celine_crypto_seconds", "Time spent encrypting or decrypting payloads.", ("operation",))
+STATE_TRANSITIONS = REGISTRY.counter(
+    "celine_state_transitions_total", "Triage state machine transitions.", ("from_state", "to_state")
+)
+URGENCY_OUTCOMES = REGISTRY.counter("celine_urgency_outcomes_total", "Urgency levels assigned to sessions.", ("urgency",))
+HANDOFF_TICKETS = REGISTRY.counter("celine_handoff_tickets_total", "Handoff tickets raised, by reason.", ("reason",))
+RULE_PACK_RELOADS = REGISTRY.counter(
+    "celine_rule_pack_reloads_total", "Clinical rule pack reload attempts, by outcome.", ("outcome",)
+)
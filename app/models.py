@@ -4,7 +4,7 @@ from datetime import datetime, timezone
 from enum import Enum
 from typing import Any
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 
 class TriageState(str, Enum):
@@ -23,7 +23,13 @@ class UrgencyLevel(str, Enum):
     ROUTINE = "ROUTINE"
 
 
+class TicketStatus(str, Enum):
+    OPEN = "open"
+    RESOLVED = "resolved"
+
+
 class ChatMessage(BaseModel):
+    id: int | None = None
     role: str
     content: str
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -33,6 +39,11 @@ class ChatRequest(BaseModel):
     conversation_id: str
     message: str
     patient_id: str | None = None
+    idempotency_key: str | None = Field(default=None, max_length=200)
+
+
+class BatchChatRequest(BaseModel):
+    turns: list[ChatRequest] = Field(min_length=1, max_length=10000)
 
 
 class AuditEvent(BaseModel):
@@ -40,6 +51,7 @@ class AuditEvent(BaseModel):
     agent: str
     action: str
     details: dict[str, Any] = Field(default_factory=dict)
+    rule_pack_version: str | None = None
 
 
 class Demographics(BaseModel):
@@ -81,8 +93,16 @@ class TriageSession(BaseModel):
     recommended_action: str = ""
     triggered_rules: list[str] = Field(default_factory=list)
     confidence: float = 0.0
+    # Only the events not yet written to the store's audit stream, which holds the full trail;
+    # this list is never part of the stored session payload.
     audit_log: list[AuditEvent] = Field(default_factory=list)
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # Stream sequence number of audit_log[0].
+    _audit_offset: int = PrivateAttr(default=0)
+    # Stored version this copy was loaded at (0: not stored yet); see SQLiteStore._write_session.
+    _version: int = PrivateAttr(default=0)
+    # Derived SessionTextIndex (see app/analysis.py); rebuilt on demand, never serialized.
+    _text_index: Any = PrivateAttr(default=None)
 
 
 class IntentResult(BaseModel):
@@ -94,6 +114,7 @@ class RuleEngineResult(BaseModel):
     urgency_level: str
     triggered_rules: list[str] = Field(default_factory=list)
     confidence: float
+    rule_pack_version: str | None = None
 
 
 class ChatResponse(BaseModel):
@@ -106,9 +127,27 @@ class ChatResponse(BaseModel):
     disclaimer: str = "This is a triage support tool and not a medical diagnosis."
 
 
+class BatchChatError(BaseModel):
+    conversation_id: str
+    detail: str
+    # Positions in the request of this conversation's turns that were not persisted.
+    failed_turns: list[int]
+
+
+class BatchChatResponse(BaseModel):
+    # Request order; null for the turns listed in ``errors``.
+    results: list[ChatResponse | None]
+    errors: list[BatchChatError] = Field(default_factory=list)
+
+
 class HandoffTicket(BaseModel):
     ticket_id: str
     conversation_id: str
     reason: str
     user_message: str
+    urgency: str = ""
+    # Queue order, lowest first; see app/tickets.py.
+    priority: int = 3
+    status: TicketStatus = TicketStatus.OPEN
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    resolved_at: datetime | None = None
@@ -2,7 +2,8 @@ from __future__ import annotations
 
 import json
 import re
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
 from uuid import uuid4
@@ -16,19 +17,53 @@ from .agents import (
     RiskScoringAgent,
     TriageAgent,
 )
-from .models import AuditEvent, ChatResponse, TriageSession, TriageState, UrgencyLevel
-from .storage import SQLiteStore
+from .analysis import TurnAnalysis
+from .async_storage import AsyncSQLiteStore
+from .locks import KeyedLocks
+from .metrics import HANDOFF_TICKETS, PIPELINE_STAGE_SECONDS, STATE_TRANSITIONS, URGENCY_OUTCOMES
+from .models import AuditEvent, ChatRequest, ChatResponse, HandoffTicket, TriageSession, TriageState, UrgencyLevel
+from .rulepacks import RulePackManager
+from .storage import IdempotencyKeyReusedError, SessionConflictError, SQLiteStore
+from .tickets import ticket_priority
 
 
 @dataclass
 class OrchestrationResult:
     response: ChatResponse
     handoff_ticket: dict | None
-    session: TriageSession
+    # None when the response was replayed for a repeated idempotency key.
+    session: TriageSession | None
+    replayed: bool = False
+
+
+@dataclass
+class BatchFailure:
+    conversation_id: str
+    error: Exception
+    # Input positions of this conversation's turns that were not persisted.
+    positions: list[int]
+
+
+@dataclass
+class BatchOutcome:
+    # Input order; None for the turns of a failed conversation that were not persisted.
+    results: list[OrchestrationResult | None]
+    failures: dict[str, BatchFailure]
+
+
+@dataclass
+class TurnReply:
+    message: str
+    requires_handoff: bool
+    handoff_reason: str | None
+    # The audit events the turn recorded; outcome metrics are counted from them after commit.
+    events: list[AuditEvent] = field(default_factory=list)
 
 
 class DeterministicOrchestrator:
     MIN_INTENT_CONFIDENCE = 0.55
+    # Attempts at a turn whose session was changed underneath it by another worker.
+    CONFLICT_ATTEMPTS = 3
     IDENTITY_PATTERNS = re.compile(
         r"\b(who\s+are\s+you|what('s|\s+is)\s+your\s+name|ur\s+name|your\s+name)\b", re.IGNORECASE
     )
@@ -36,23 +71,210 @@ class DeterministicOrchestrator:
         "I am Celine, the hospital triage assistant. I can help with symptom triage or route front-desk requests."
     )
 
-    def __init__(self, store: SQLiteStore, rules_path: str = "app/config/clinical_rules.json") -> None:
+    def __init__(
+        self,
+        store: SQLiteStore,
+        rules_path: str = "app/config/clinical_rules.json",
+        locks: KeyedLocks | None = None,
+        intents_path: str = "app/config/intents.json",
+        rule_packs: RulePackManager | None = None,
+        batch_workers: int = 8,
+    ) -> None:
         self.store = store
-        self.intent_agent = IntentClassificationAgent()
+        # Long-lived: process_many runs conversations of every batch on the same threads.
+        self._batch_pool = ThreadPoolExecutor(max_workers=batch_workers, thread_name_prefix="celine-batch")
+        # Not ``locks or ...``: KeyedLocks define __len__, so an idle table is falsy.
+        self.locks = locks if locks is not None else KeyedLocks()
+        self.intent_agent = IntentClassificationAgent(json.loads(Path(intents_path).read_text()))
         self.front_desk = FrontDeskAgent()
         self.triage_agent = TriageAgent()
         self.red_flag_engine = RedFlagEngine()
-        rules = json.loads(Path(rules_path).read_text())
-        self.rules_engine = ClinicalRulesEngine(rules)
+        self.rule_packs = rule_packs or RulePackManager(rules_path)
         self.risk_agent = RiskScoringAgent()
         self.escalation_agent = EscalationAgent()
 
-    def process(self, conversation_id: str, patient_id: str | None, user_message: str) -> OrchestrationResult:
-        session = self.store.get_or_create_session(conversation_id=conversation_id, patient_id=patient_id or conversation_id)
-        self.store.add_message(conversation_id, "user", user_message, datetime.now(timezone.utc))
+    @property
+    def rules_engine(self) -> ClinicalRulesEngine:
+        return self.rule_packs.current.engine
+
+    def process(
+        self,
+        conversation_id: str,
+        patient_id: str | None,
+        user_message: str,
+        idempotency_key: str | None = None,
+    ) -> OrchestrationResult:
+        # Turns of one conversation are linearized; other conversations proceed in parallel.
+        with self.locks.hold(conversation_id):
+            attempt = 1
+            while True:
+                try:
+                    return self._process_locked(conversation_id, patient_id, user_message, idempotency_key)
+                except SessionConflictError:
+                    # Nothing of the turn was committed: reload the session and run it again.
+                    self.store.forget_session(conversation_id)
+                    if attempt == self.CONFLICT_ATTEMPTS:
+                        raise
+                    attempt += 1
+
+    def _process_locked(
+        self,
+        conversation_id: str,
+        patient_id: str | None,
+        user_message: str,
+        idempotency_key: str | None,
+        session: TriageSession | None = None,
+    ) -> OrchestrationResult:
+        if idempotency_key:
+            stored = self.store.get_idempotent_response(conversation_id, idempotency_key, user_message)
+            if stored is not None:
+                return OrchestrationResult(response=stored, handoff_ticket=None, session=None, replayed=True)
+        if session is None:
+            session = self.store.get_or_create_session(
+                conversation_id=conversation_id, patient_id=patient_id or conversation_id
+            )
+        received_at = datetime.now(timezone.utc)
+        reply = self.run_turn(session, user_message)
+        return self.persist_turn(conversation_id, session, user_message, received_at, reply, idempotency_key)
+
+    def persist_turn(
+        self,
+        conversation_id: str,
+        session: TriageSession,
+        user_message: str,
+        received_at: datetime,
+        reply: TurnReply,
+        idempotency_key: str | None,
+    ) -> OrchestrationResult:
+        """Store the turn's messages, session, handoff ticket and idempotent response in one transaction.
+
+        A replayed response never re-issues its ticket, so the ticket commits with the turn
+        or not at all. A ``SessionConflictError`` from the session write rolls all of it back.
+        """
+        result = self.build_result(conversation_id, session, reply)
+        with PIPELINE_STAGE_SECONDS.time("finalize_persistence"), self.store.batch():
+            self.store.add_message(conversation_id, "user", user_message, received_at)
+            self.store.save_session(session)
+            self.store.add_message(conversation_id, "assistant", reply.message, datetime.now(timezone.utc))
+            if result.handoff_ticket:
+                self.store.add_handoff_ticket(HandoffTicket(**result.handoff_ticket, created_at=datetime.now(timezone.utc)))
+            if idempotency_key:
+                self.store.save_idempotent_response(conversation_id, idempotency_key, result.response, user_message)
+            # Inside process_many this batch joins the caller's, so count only once that commits.
+            self.store.after_commit(lambda: self.record_outcomes(reply, result.handoff_ticket))
+        return result
+
+    @staticmethod
+    def record_outcomes(reply: TurnReply, handoff_ticket: dict | None) -> None:
+        """Count a committed turn's transitions, urgency decisions and handoff ticket."""
+        for event in reply.events:
+            if event.action == "state_transition":
+                STATE_TRANSITIONS.inc(event.details["from"], event.details["to"])
+                if event.details["reason"] == "red_flag_override":
+                    URGENCY_OUTCOMES.inc(UrgencyLevel.EMERGENCY.value)
+            elif event.action == "urgency_classified":
+                URGENCY_OUTCOMES.inc(event.details["urgency_level"])
+        if handoff_ticket:
+            HANDOFF_TICKETS.inc(handoff_ticket["reason"])
+
+    def process_many(self, turns: list[ChatRequest], commit_every: int = 200) -> BatchOutcome:
+        """Process many turns: in order within a conversation, conversations in parallel.
+
+        Each conversation's writes, handoff tickets included, are committed in bulk
+        transactions of up to ``commit_every`` turns. A conversation that fails stops at
+        its failed transaction without affecting the others; see :class:`BatchOutcome`.
+        """
+        grouped: dict[str, list[tuple[int, ChatRequest]]] = {}
+        for position, turn in enumerate(turns):
+            grouped.setdefault(turn.conversation_id, []).append((position, turn))
+
+        outcome = BatchOutcome(results=[None] * len(turns), failures={})
+        for processed, failure in self._batch_pool.map(
+            lambda group: self._process_conversation(group, commit_every), grouped.values()
+        ):
+            for position, result in processed:
+                outcome.results[position] = result
+            if failure is not None:
+                outcome.failures[failure.conversation_id] = failure
+        return outcome
+
+    def _process_conversation(
+        self, group: list[tuple[int, ChatRequest]], commit_every: int
+    ) -> tuple[list[tuple[int, OrchestrationResult]], BatchFailure | None]:
+        conversation_id = group[0][1].conversation_id
+        processed: list[tuple[int, OrchestrationResult]] = []
+        # Idempotency keys answered by committed transactions of this group.
+        replies: dict[str, tuple[str, ChatResponse]] = {}
+        with self.locks.hold(conversation_id):
+            for start in range(0, len(group), commit_every):
+                chunk = group[start : start + commit_every]
+                attempt = 1
+                while True:
+                    try:
+                        committed = self._process_chunk(conversation_id, chunk, replies)
+                        break
+                    except SessionConflictError as exc:
+                        self.store.forget_session(conversation_id)
+                        if attempt == self.CONFLICT_ATTEMPTS:
+                            return processed, BatchFailure(conversation_id, exc, [position for position, _ in group[start:]])
+                        attempt += 1
+                    except Exception as exc:
+                        # Later turns build on this one, so the rest of the conversation stops here.
+                        return processed, BatchFailure(conversation_id, exc, [position for position, _ in group[start:]])
+                processed.extend(committed)
+        return processed, None
+
+    def _process_chunk(
+        self, conversation_id: str, chunk: list[tuple[int, ChatRequest]], replies: dict[str, tuple[str, ChatResponse]]
+    ) -> list[tuple[int, OrchestrationResult]]:
+        """Run ``chunk`` in one transaction; ``replies`` only learns its keys once it commits."""
+        processed: list[tuple[int, OrchestrationResult]] = []
+        # Deferred writes are invisible to reads, so the session and the idempotency keys
+        # seen so far are carried in memory across the chunk. It starts from the committed
+        # session, not the copy the previous chunk handed to the cache.
+        session: TriageSession | None = None
+        pending = dict(replies)
+        with self.store.batch():
+            for position, turn in chunk:
+                if turn.idempotency_key in pending:
+                    message, response = pending[turn.idempotency_key]
+                    if message != turn.message:
+                        raise IdempotencyKeyReusedError(conversation_id, turn.idempotency_key)
+                    result = OrchestrationResult(response=response, handoff_ticket=None, session=None, replayed=True)
+                else:
+                    result = self._process_locked(
+                        conversation_id, turn.patient_id, turn.message, turn.idempotency_key, session
+                    )
+                    session = result.session or session
+                    if turn.idempotency_key:
+                        pending[turn.idempotency_key] = (turn.message, result.response)
+                processed.append((position, result))
+        replies.update(pending)
+        return processed
+
+    def close(self) -> None:
+        self._batch_pool.shutdown(wait=True)
+
+    def run_turn(self, session: TriageSession, user_message: str) -> TurnReply:
+        """Advance the state machine for one user message. Pure in-memory: no storage access.
+
+        The whole turn runs against the rule pack that was live when it started, and every
+        audit event it records carries that pack's version.
+        """
+        pack = self.rule_packs.current
+        first_event = len(session.audit_log)
+        reply = self._advance(session, user_message, pack.engine)
+        reply.events = session.audit_log[first_event:]
+        for event in reply.events:
+            event.rule_pack_version = pack.version
+        return reply
+
+    def _advance(self, session: TriageSession, user_message: str, rules_engine: ClinicalRulesEngine) -> TurnReply:
         self._log(session, "orchestrator", "message_received", {"message": user_message, "state": session.state.value})
+        turn = TurnAnalysis.of(user_message)
 
-        red_flags = self.red_flag_engine.detect(user_message, session)
+        with PIPELINE_STAGE_SECONDS.time("red_flag_detection"):
+            red_flags = self.red_flag_engine.detect(turn, session)
         if red_flags:
             session.red_flags_detected.extend([flag for flag in red_flags if flag not in session.red_flags_detected])
             self._transition(session, TriageState.EMERGENCY, "red_flag_override", {"red_flags": red_flags})
@@ -61,24 +283,25 @@ class DeterministicOrchestrator:
             message, requires_handoff, reason = self.escalation_agent.handoff_message(UrgencyLevel.EMERGENCY.value)
             self._transition(session, TriageState.ESCALATED, "emergency_handoff", {"reason": reason})
             self._transition(session, TriageState.CLOSED, "session_closed_after_emergency", {})
-            return self._finalize(conversation_id, session, message, requires_handoff, reason)
+            return TurnReply(message, requires_handoff, reason)
 
         if session.state == TriageState.IDLE:
-            if self._is_identity_question(user_message):
+            if self._is_identity_question(turn):
                 self._transition(session, TriageState.GREETING, "identity_route", {})
-                return self._finalize(conversation_id, session, self.IDENTITY_REPLY, False, None)
+                return TurnReply(self.IDENTITY_REPLY, False, None)
 
-            intent = self.intent_agent.classify(user_message)
+            with PIPELINE_STAGE_SECONDS.time("intent_classification"):
+                intent = self.intent_agent.classify(turn)
             self._log(session, "intent_classifier", "classified", intent.model_dump())
             if intent.confidence < self.MIN_INTENT_CONFIDENCE:
                 self._transition(session, TriageState.ESCALATED, "low_classifier_confidence", {"confidence": intent.confidence})
                 msg = "I need a human clinician to review this safely before proceeding."
-                return self._finalize(conversation_id, session, msg, True, "Low intent confidence")
+                return TurnReply(msg, True, "Low intent confidence")
 
             if intent.intent == "greeting":
                 self._transition(session, TriageState.GREETING, "greeting_route", {})
                 msg = self.front_desk.respond("greeting")
-                return self._finalize(conversation_id, session, msg, False, None)
+                return TurnReply(msg, False, None)
             if intent.intent in {
                 "appointment_request",
                 "admin_question",
@@ -88,45 +311,47 @@ class DeterministicOrchestrator:
             }:
                 self._transition(session, TriageState.GREETING, "front_desk_route", {"intent": intent.intent})
                 msg = self.front_desk.respond(intent.intent)
-                return self._finalize(conversation_id, session, msg, False, None)
+                return TurnReply(msg, False, None)
             if intent.intent == "medical_symptom":
                 self._transition(session, TriageState.INTAKE, "medical_route", {})
             else:
                 msg = "Could you clarify if you need symptom triage, appointment help, or another front-desk service?"
-                return self._finalize(conversation_id, session, msg, False, None)
+                return TurnReply(msg, False, None)
 
         if session.state in {TriageState.GREETING, TriageState.IDLE}:
-            if self._is_identity_question(user_message):
-                return self._finalize(conversation_id, session, self.IDENTITY_REPLY, False, None)
+            if self._is_identity_question(turn):
+                return TurnReply(self.IDENTITY_REPLY, False, None)
 
-            intent = self.intent_agent.classify(user_message)
+            with PIPELINE_STAGE_SECONDS.time("intent_classification"):
+                intent = self.intent_agent.classify(turn)
             if intent.intent == "medical_symptom":
                 self._transition(session, TriageState.INTAKE, "symptom_detected_post_greeting", {})
             else:
                 msg = self.front_desk.respond(intent.intent)
-                return self._finalize(conversation_id, session, msg, False, None)
+                return TurnReply(msg, False, None)
 
         if session.state in {TriageState.INTAKE, TriageState.TRIAGE}:
-            self.triage_agent.update_from_user(session, user_message)
+            with PIPELINE_STAGE_SECONDS.time("intake_update"):
+                self.triage_agent.update_from_user(session, turn)
             self._transition(session, TriageState.TRIAGE, "triage_progress", {"progress": session.intake_progress})
             next_question = self.triage_agent.next_pending_question(session)
             if next_question:
-                return self._finalize(conversation_id, session, next_question.question, False, None)
+                return TurnReply(next_question.question, False, None)
 
-            rules = self.rules_engine.evaluate(session)
+            with PIPELINE_STAGE_SECONDS.time("rules_evaluation"):
+                rules = rules_engine.evaluate(session)
             session.urgency_level = rules.urgency_level
             session.triggered_rules = rules.triggered_rules
             session.confidence = rules.confidence
-            risk_score, risk_confidence = self.risk_agent.score(session)
+            with PIPELINE_STAGE_SECONDS.time("risk_scoring"):
+                risk_score, risk_confidence = self.risk_agent.score(session)
             session.risk_score = risk_score
             self._log(session, "rules_engine", "urgency_classified", rules.model_dump())
             self._log(session, "risk_scoring_agent", "supplemental_risk", {"risk_score": risk_score, "confidence": risk_confidence})
 
             if risk_score >= 0.85 and session.urgency_level != UrgencyLevel.EMERGENCY.value:
                 self._transition(session, TriageState.ESCALATED, "risk_uncertain_escalation", {"risk_score": risk_score})
-                return self._finalize(
-                    conversation_id,
-                    session,
+                return TurnReply(
                     "Your case needs human clinician review now for safety.",
                     True,
                     "High risk score uncertainty",
@@ -136,15 +361,15 @@ class DeterministicOrchestrator:
             if requires_handoff:
                 self._transition(session, TriageState.ESCALATED, "urgency_handoff", {"urgency": session.urgency_level})
             self._transition(session, TriageState.CLOSED, "triage_completed", {"urgency": session.urgency_level})
-            return self._finalize(conversation_id, session, msg, requires_handoff, reason)
+            return TurnReply(msg, requires_handoff, reason)
 
         fallback = "Seek immediate medical care. Call emergency services or go to nearest emergency department."
         self._transition(session, TriageState.EMERGENCY, "failsafe_default", {})
         self._transition(session, TriageState.CLOSED, "failsafe_closed", {})
-        return self._finalize(conversation_id, session, fallback, True, "Failsafe default")
+        return TurnReply(fallback, True, "Failsafe default")
 
-    def _is_identity_question(self, message: str) -> bool:
-        return bool(self.IDENTITY_PATTERNS.search(message.strip()))
+    def _is_identity_question(self, turn: TurnAnalysis) -> bool:
+        return bool(self.IDENTITY_PATTERNS.search(turn.text))
 
     def _transition(self, session: TriageSession, new_state: TriageState, reason: str, details: dict) -> None:
         old_state = session.state
@@ -161,33 +386,74 @@ class DeterministicOrchestrator:
         session.audit_log.append(AuditEvent(agent=agent, action=action, details=details))
         session.timestamp = datetime.now(timezone.utc)
 
-    def _finalize(
-        self,
-        conversation_id: str,
-        session: TriageSession,
-        assistant_message: str,
-        requires_handoff: bool,
-        handoff_reason: str | None,
-    ) -> OrchestrationResult:
-        self.store.save_session(session)
-        self.store.add_message(conversation_id, "assistant", assistant_message, datetime.now(timezone.utc))
-
+    @staticmethod
+    def build_result(conversation_id: str, session: TriageSession, reply: TurnReply) -> OrchestrationResult:
         response = ChatResponse(
             conversation_id=conversation_id,
-            response=assistant_message,
+            response=reply.message,
             state=session.state,
-            requires_handoff=requires_handoff,
-            handoff_reason=handoff_reason,
+            requires_handoff=reply.requires_handoff,
+            handoff_reason=reply.handoff_reason,
             urgency_level=session.urgency_level,
         )
 
         ticket = None
-        if requires_handoff:
+        if reply.requires_handoff:
+            reason = reply.handoff_reason or "Clinical escalation"
             ticket = {
                 "ticket_id": str(uuid4()),
                 "conversation_id": conversation_id,
-                "reason": handoff_reason or "Clinical escalation",
+                "reason": reason,
                 "user_message": session.chief_complaint or "See session log",
+                "urgency": session.urgency_level,
+                "priority": ticket_priority(session.urgency_level, reason),
             }
 
         return OrchestrationResult(response=response, handoff_ticket=ticket, session=session)
+
+
+class AsyncDeterministicOrchestrator:
+    """Async front for :class:`DeterministicOrchestrator` that awaits storage instead of blocking.
+
+    The state machine itself is shared and runs inline: it is pure CPU work with no I/O.
+    """
+
+    def __init__(self, orchestrator: DeterministicOrchestrator, store: AsyncSQLiteStore) -> None:
+        self.orchestrator = orchestrator
+        self.store = store
+
+    async def process(
+        self,
+        conversation_id: str,
+        patient_id: str | None,
+        user_message: str,
+        idempotency_key: str | None = None,
+    ) -> OrchestrationResult:
+        async with self.orchestrator.locks.hold_async(conversation_id):
+            attempt = 1
+            while True:
+                if idempotency_key:
+                    stored = await self.store.get_idempotent_response(conversation_id, idempotency_key, user_message)
+                    if stored is not None:
+                        return OrchestrationResult(response=stored, handoff_ticket=None, session=None, replayed=True)
+                session = await self.store.get_or_create_session(
+                    conversation_id=conversation_id, patient_id=patient_id or conversation_id
+                )
+                received_at = datetime.now(timezone.utc)
+                reply = self.orchestrator.run_turn(session, user_message)
+                try:
+                    # One job on the writer thread, committed as a single transaction.
+                    return await self.store.run_write(
+                        self.orchestrator.persist_turn,
+                        conversation_id,
+                        session,
+                        user_message,
+                        received_at,
+                        reply,
+                        idempotency_key,
+                    )
+                except SessionConflictError:
+                    self.store.forget_session(conversation_id)
+                    if attempt == self.orchestrator.CONFLICT_ATTEMPTS:
+                        raise
+                    attempt += 1
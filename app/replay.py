@@ -0,0 +1,158 @@
+"""Re-triage stored conversations with a candidate rule pack and report what would change.
+
+Usage::
+
+    python -m app.replay --db data/celine.db --rules candidate_rules.json --workers 4
+
+Results are written to stdout as NDJSON, one line per conversation, as they complete.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import secrets
+import sys
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from .orchestrator import DeterministicOrchestrator
+from .storage import SQLiteStore
+
+
+@dataclass(frozen=True)
+class ConversationOutcome:
+    state: str
+    urgency_level: str
+    handoff: bool
+
+
+@dataclass(frozen=True)
+class RecordedConversation:
+    conversation_id: str
+    patient_id: str
+    messages: list[str]
+    outcome: ConversationOutcome
+
+
+@dataclass(frozen=True)
+class ReplayResult:
+    conversation_id: str
+    turns: int
+    original: ConversationOutcome
+    candidate: ConversationOutcome
+
+    @property
+    def changed(self) -> bool:
+        return self.original != self.candidate
+
+    def to_dict(self) -> dict[str, Any]:
+        return {**asdict(self), "changed": self.changed}
+
+
+def outcome_from(session: dict[str, Any], audit_events: list[dict[str, Any]]) -> ConversationOutcome:
+    handoff = any(
+        event.get("action") == "state_transition"
+        and (event["details"].get("to") == "ESCALATED" or event["details"].get("reason") == "failsafe_default")
+        for event in audit_events
+    )
+    return ConversationOutcome(state=session["state"], urgency_level=session["urgency_level"], handoff=handoff)
+
+
+def iter_recorded_conversations(store: SQLiteStore) -> Iterator[RecordedConversation]:
+    """Stream stored conversations with the user messages the orchestrator actually received."""
+    for conversation_id in store.iter_conversation_ids():
+        session = store.get_session_snapshot(conversation_id)
+        if session is None:
+            continue
+        audit_events = store.get_audit_events(conversation_id)
+        messages = [
+            event["details"]["message"] for event in audit_events if event.get("action") == "message_received"
+        ]
+        if not messages:
+            messages = [
+                message.content
+                for message in store.get_messages(conversation_id, limit=-1)
+                if message.role == "user"
+            ]
+        if messages:
+            yield RecordedConversation(
+                conversation_id=conversation_id,
+                patient_id=session["patient_id"],
+                messages=messages,
+                outcome=outcome_from(session, audit_events),
+            )
+
+
+_worker_orchestrator: DeterministicOrchestrator | None = None
+
+
+def _init_worker(rules_path: str) -> None:
+    global _worker_orchestrator
+    if _worker_orchestrator is not None:
+        _worker_orchestrator.close()
+        _worker_orchestrator.store.close()
+    # Replayed patient data never touches disk: the scratch store is an in-memory database,
+    # private to the one thread that replays in this process, under a throwaway key.
+    store = SQLiteStore(db_path=":memory:", encryption_key=secrets.token_urlsafe(32))
+    _worker_orchestrator = DeterministicOrchestrator(store, rules_path=rules_path)
+
+
+def _replay(recorded: RecordedConversation) -> ReplayResult:
+    orchestrator = _worker_orchestrator
+    for message in recorded.messages:
+        orchestrator.process(recorded.conversation_id, recorded.patient_id, message)
+    store = orchestrator.store
+    candidate = outcome_from(
+        store.get_session_snapshot(recorded.conversation_id), store.get_audit_events(recorded.conversation_id)
+    )
+    return ReplayResult(recorded.conversation_id, len(recorded.messages), recorded.outcome, candidate)
+
+
+def replay_conversations(
+    conversations: Iterable[RecordedConversation], rules_path: str, workers: int = 0, window: int = 64
+) -> Iterator[ReplayResult]:
+    """Replay conversations against ``rules_path``, yielding results in input order.
+
+    ``workers=0`` replays in-process; otherwise a process pool is used with at most
+    ``window`` conversations in flight, so memory stays flat for arbitrarily long histories.
+    """
+    if workers <= 0:
+        _init_worker(rules_path)
+        yield from map(_replay, conversations)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rules_path,)) as pool:
+        pending: deque[Future[ReplayResult]] = deque()
+        for recorded in conversations:
+            pending.append(pool.submit(_replay, recorded))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay stored conversations against a candidate rule pack.")
+    parser.add_argument("--db", default="data/celine.db", help="source database")
+    parser.add_argument("--rules", required=True, help="candidate clinical_rules.json")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (0 = in-process)")
+    parser.add_argument("--only-changed", action="store_true", help="only print conversations whose outcome changed")
+    args = parser.parse_args(argv)
+
+    store = SQLiteStore(db_path=args.db)
+    total = changed = 0
+    for result in replay_conversations(iter_recorded_conversations(store), args.rules, workers=args.workers):
+        total += 1
+        changed += result.changed
+        if result.changed or not args.only_changed:
+            sys.stdout.write(json.dumps(result.to_dict()) + "\n")
+    sys.stderr.write(f"replayed {total} conversations, {changed} changed\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from threading import Event, Lock, Thread
+
+from .agents import ClinicalRulesEngine
+from .metrics import RULE_PACK_RELOADS
+from .models import UrgencyLevel
+
+
+class RulePackError(ValueError):
+    """A rule pack that cannot be parsed or compiled; the active pack stays in place."""
+
+
+@dataclass(frozen=True)
+class RulePack:
+    version: str
+    digest: str
+    engine: ClinicalRulesEngine
+    loaded_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+RULE_PHRASE_FIELDS = ("phrases_any", "phrases_all")
+RULE_THRESHOLD_FIELDS = ("min_age", "max_duration_days", "severity_min")
+RULE_FIELDS = frozenset({"id", "urgency", *RULE_PHRASE_FIELDS, *RULE_THRESHOLD_FIELDS})
+
+
+def validate_rules(rules: list) -> None:
+    """Check every rule's shape before it is compiled.
+
+    Compilation alone accepts a string ``phrases_any`` (one phrase per character) or a string
+    threshold (a ``TypeError`` on every later turn), and a misspelt condition key would
+    leave a rule that always matches.
+    """
+    seen: set[str] = set()
+    for position, rule in enumerate(rules):
+        if not isinstance(rule, dict):
+            raise RulePackError(f"rule {position} must be an object")
+        rule_id = rule.get("id")
+        if not isinstance(rule_id, str) or not rule_id:
+            raise RulePackError(f"rule {position} needs a non-empty string 'id'")
+        if rule_id in seen:
+            raise RulePackError(f"rule {rule_id!r} is defined twice")
+        seen.add(rule_id)
+        unknown = sorted(set(rule) - RULE_FIELDS)
+        if unknown:
+            raise RulePackError(f"rule {rule_id!r} has unknown fields: {', '.join(unknown)}")
+        if rule.get("urgency") not in {level.value for level in UrgencyLevel}:
+            raise RulePackError(f"rule {rule_id!r} has unknown urgency {rule.get('urgency')!r}")
+        for name in RULE_PHRASE_FIELDS:
+            phrases = rule.get(name, [])
+            if not isinstance(phrases, list) or not all(isinstance(phrase, str) and phrase.strip() for phrase in phrases):
+                raise RulePackError(f"rule {rule_id!r}: {name!r} must be a list of non-empty strings")
+        for name in RULE_THRESHOLD_FIELDS:
+            threshold = rule.get(name)
+            if threshold is not None and (isinstance(threshold, bool) or not isinstance(threshold, (int, float))):
+                raise RulePackError(f"rule {rule_id!r}: {name!r} must be a number")
+
+
+def compile_rule_pack(source: str) -> RulePack:
+    """Parse and compile a rules document. The version is its ``version`` key or a content hash."""
+    try:
+        config = json.loads(source)
+    except json.JSONDecodeError as exc:
+        raise RulePackError(f"rule pack is not valid JSON: {exc}") from exc
+    if not isinstance(config, dict) or not isinstance(config.get("rules"), list):
+        raise RulePackError("rule pack must be an object with a 'rules' list")
+    validate_rules(config["rules"])
+    digest = hashlib.sha256(source.encode()).hexdigest()
+    version = str(config.get("version") or f"sha256:{digest[:12]}")
+    try:
+        engine = ClinicalRulesEngine(config, version=version)
+    except (KeyError, TypeError, ValueError) as exc:
+        raise RulePackError(f"rule pack failed to compile: {exc!r}") from exc
+    return RulePack(version=version, digest=digest, engine=engine)
+
+
+class RulePackManager:
+    """Serves the active compiled rule pack and swaps in edits to the rules file without a restart.
+
+    A new pack is read, validated and compiled on the watcher thread (or by an explicit
+    ``reload``) and published with a single reference assignment, so a turn in flight keeps
+    the pack it started with and never sees a half-built one. A pack that fails to compile
+    is rejected and the previous version keeps serving.
+    """
+
+    def __init__(self, path: str | Path, poll_interval: float = 0.0) -> None:
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+        self.last_error: str | None = None
+        self._reload_lock = Lock()
+        self._signature = self._stat()
+        self._pack = compile_rule_pack(self.path.read_text())
+        self._stop = Event()
+        self._watcher: Thread | None = None
+        if poll_interval > 0:
+            self._watcher = Thread(target=self._watch, name="celine-rule-packs", daemon=True)
+            self._watcher.start()
+
+    @property
+    def current(self) -> RulePack:
+        return self._pack
+
+    def _stat(self) -> tuple[int, int] | None:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self, force: bool = False) -> bool:
+        """Load the rules file if it changed since the last look; True when a new version went live."""
+        with self._reload_lock:
+            signature = self._stat()
+            if signature is None or (signature == self._signature and not force):
+                return False
+            self._signature = signature
+            try:
+                pack = compile_rule_pack(self.path.read_text())
+            except (OSError, RulePackError) as exc:
+                self.last_error = str(exc)
+                RULE_PACK_RELOADS.inc("rejected")
+                return False
+            self.last_error = None
+            if pack.digest == self._pack.digest:
+                return False
+            self._pack = pack
+            RULE_PACK_RELOADS.inc("applied")
+            return True
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            self.reload()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
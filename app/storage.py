@@ -2,100 +2,520 @@ from __future__ import annotations
 
 import base64
 import hashlib
+import hmac
 import json
 import os
 import sqlite3
+import threading
+import time
+import weakref
+from collections import ChainMap
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 from threading import Lock
 from typing import Any
 
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
 
-from .models import ChatMessage, HandoffTicket, TriageSession
+from .cache import SessionCache
+from .codec import CODECS, PayloadCodec, decode_payload
+from .events import MessageBus
+from .metrics import CRYPTO_SECONDS, STORE_QUERY_SECONDS
+from .models import ChatMessage, ChatResponse, HandoffTicket, TicketStatus, TriageSession
+from .tickets import PRIORITY_ROUTINE, REASON_PRIORITIES
+
+# A deferred write: runs inside a write transaction and may return post-commit work.
+WriteOp = Callable[[sqlite3.Connection], Callable[[], None] | None]
+
+
+class SessionConflictError(RuntimeError):
+    """The stored session changed since it was loaded; reload it and redo the turn."""
+
+    def __init__(self, conversation_id: str) -> None:
+        super().__init__(f"session {conversation_id} was updated concurrently")
+        self.conversation_id = conversation_id
+
+
+class IdempotencyKeyReusedError(ValueError):
+    """An idempotency key already answered a different message of the conversation."""
+
+    def __init__(self, conversation_id: str, idempotency_key: str) -> None:
+        super().__init__(f"idempotency key {idempotency_key!r} was already used for a different message")
+        self.conversation_id = conversation_id
+        self.idempotency_key = idempotency_key
+
+
+class ConnectionPool:
+    """Long-lived per-thread SQLite connections for one database file.
+
+    Connections run in WAL mode so readers never wait on the writer. Reads use the calling
+    thread's connection directly; writes are serialized through ``write_lock`` because
+    SQLite only admits one writer at a time anyway. Write transactions start with
+    ``BEGIN IMMEDIATE`` so that, with several processes on one file, a writer waits for
+    the lock up front (``busy_timeout``) instead of failing when it upgrades a read.
+    """
+
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA cache_size=-16000",
+        "PRAGMA mmap_size=268435456",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA busy_timeout=5000",
+    )
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self.write_lock = Lock()
+        self._local = threading.local()
+        self._registry_lock = Lock()
+        self._connections: dict[int, tuple[weakref.ref[threading.Thread], sqlite3.Connection]] = {}
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5.0)
+            conn.row_factory = sqlite3.Row
+            for pragma in self.PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            self._register(conn)
+        return conn
+
+    def _register(self, conn: sqlite3.Connection) -> None:
+        with self._registry_lock:
+            # Close connections left behind by threads that have since exited.
+            for ident, (thread_ref, stale) in list(self._connections.items()):
+                thread = thread_ref()
+                if thread is None or not thread.is_alive():
+                    stale.close()
+                    del self._connections[ident]
+            current = threading.current_thread()
+            self._connections[current.ident] = (weakref.ref(current), conn)
+
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        yield self.connection()
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        conn = self.connection()
+        with self.write_lock, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+
+    def close(self) -> None:
+        with self._registry_lock:
+            for _, conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+            self._local = threading.local()
+
+
+class PayloadCipher:
+    """Fernet encryption of codec-encoded payloads, stored as raw token bytes.
+
+    Holds no connection or lock, so it pickles: worker processes (see ``app.export``) can
+    decrypt rows that the parent process read.
+    """
+
+    def __init__(self, key: bytes, codec: PayloadCodec) -> None:
+        self._fernet = Fernet(key)
+        self.codec = codec
+        # Writes use ``codec``; reads accept its format and every registered one.
+        self.codecs = ChainMap({codec.version: codec}, CODECS)
+
+    def encrypt(self, payload: dict[str, Any]) -> bytes:
+        # Stored as the raw Fernet token (a BLOB), a quarter smaller than its base64 text.
+        return base64.urlsafe_b64decode(self._fernet.encrypt(self.codec.encode(payload)))
+
+    def decrypt(self, token: str | bytes) -> dict[str, Any]:
+        # Rows written before the codec hold base64 text tokens around plain JSON.
+        raw = token.encode() if isinstance(token, str) else base64.urlsafe_b64encode(token)
+        return decode_payload(self._fernet.decrypt(raw), self.codecs)
 
 
 class SQLiteStore:
-    def __init__(self, db_path: str = "celine.db", encryption_key: str | None = None) -> None:
+    def __init__(
+        self,
+        db_path: str = "celine.db",
+        encryption_key: str | None = None,
+        session_cache_size: int = 0,
+        session_flush_interval: float = 2.0,
+        message_bus: MessageBus | None = None,
+        idempotency_capacity: int = 10000,
+        payload_codec: PayloadCodec | None = None,
+        shared: bool = False,
+    ) -> None:
+        # shared: other processes write to the same file, so cached sessions are written
+        # through and checked against the stored version before reuse.
         self.db_path = db_path
-        self._lock = Lock()
-        self._fernet = Fernet(self._derive_key(encryption_key or os.getenv("CELINE_ENCRYPTION_KEY", "dev-key")))
+        self.shared = shared
+        self.idempotency_capacity = idempotency_capacity
+        self.payload_codec = payload_codec or PayloadCodec()
+        self.message_bus = message_bus or MessageBus()
+        key = self._derive_key(encryption_key or os.getenv("CELINE_ENCRYPTION_KEY", "dev-key"))
+        self.cipher = PayloadCipher(key, self.payload_codec)
+        # Keyed, so the stored fingerprints of patient messages cannot be matched by guessing.
+        self._digest_key = hashlib.sha256(b"idempotency:" + key).digest()
         Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._pool = ConnectionPool(self.db_path)
+        self._batch_local = threading.local()
         self._initialize()
+        self._session_cache = (
+            SessionCache(
+                self._persist_cached_session,
+                capacity=session_cache_size,
+                flush_interval=0.0 if shared else session_flush_interval,
+            )
+            if session_cache_size > 0
+            else None
+        )
 
     @staticmethod
     def _derive_key(seed: str) -> bytes:
         digest = hashlib.sha256(seed.encode()).digest()
         return base64.urlsafe_b64encode(digest)
 
-    def _connect(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        conn.row_factory = sqlite3.Row
-        return conn
+    def close(self) -> None:
+        if self._session_cache is not None:
+            self._session_cache.close()
+        self._pool.close()
+
+    def flush_sessions(self) -> int:
+        """Write out sessions still pending in the write-behind cache."""
+        if self._session_cache is None:
+            return 0
+        return self._session_cache.flush()
 
     def _initialize(self) -> None:
-        with self._connect() as conn:
+        """Bring the database up to the latest schema version.
+
+        Each migration runs in its own ``BEGIN IMMEDIATE`` transaction and is recorded in
+        ``schema_migrations``, so upgrades are applied once, survive concurrent startups and
+        leave readers (WAL) unblocked while they run.
+        """
+        with self._pool.write() as conn:
             conn.execute(
                 """
-                CREATE TABLE IF NOT EXISTS messages (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    conversation_id TEXT NOT NULL,
-                    role TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    timestamp TEXT NOT NULL
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TEXT NOT NULL
                 )
                 """
             )
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS handoff_tickets (
-                    ticket_id TEXT PRIMARY KEY,
-                    conversation_id TEXT NOT NULL,
-                    reason TEXT NOT NULL,
-                    user_message TEXT NOT NULL,
-                    created_at TEXT NOT NULL
+        for version, migration in enumerate(self._migrations(), start=1):
+            with self._pool.write() as conn:
+                if conn.execute("SELECT 1 FROM schema_migrations WHERE version = ?", (version,)).fetchone():
+                    continue
+                migration(conn)
+                conn.execute(
+                    "INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)",
+                    (version, migration.__name__.lstrip("_"), datetime.utcnow().isoformat()),
                 )
-                """
+
+    def _migrations(self) -> list[Callable[[sqlite3.Connection], None]]:
+        # Append only: a migration's position is its schema version.
+        return [
+            self._migrate_base_schema,
+            self._migrate_audit_sequence,
+            self._migrate_lookup_indexes,
+            self._migrate_idempotent_responses,
+            self._migrate_ticket_queue,
+            self._migrate_session_urgency,
+            self._migrate_session_versions,
+            self._migrate_idempotent_request_digests,
+        ]
+
+    def schema_version(self) -> int:
+        with self._pool.read() as conn:
+            row = conn.execute("SELECT MAX(version) AS version FROM schema_migrations").fetchone()
+        return int(row["version"] or 0)
+
+    @staticmethod
+    def _migrate_base_schema(conn: sqlite3.Connection) -> None:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                conversation_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp TEXT NOT NULL
             )
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS sessions (
-                    conversation_id TEXT PRIMARY KEY,
-                    payload TEXT NOT NULL,
-                    created_at TEXT NOT NULL,
-                    updated_at TEXT NOT NULL
-                )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS handoff_tickets (
+                ticket_id TEXT PRIMARY KEY,
+                conversation_id TEXT NOT NULL,
+                reason TEXT NOT NULL,
+                user_message TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                conversation_id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS audit_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                conversation_id TEXT NOT NULL,
+                event_time TEXT NOT NULL,
+                payload TEXT NOT NULL
+            )
+            """
+        )
+
+    def _migrate_audit_sequence(self, conn: sqlite3.Connection) -> None:
+        """Number audit events and drop the duplicates written by the old save path.
+
+        Older versions re-inserted the whole audit log on every save, so each event may be
+        stored many times. Keep the first copy of every event, number the survivors in
+        insertion order and record the resulting high-water mark on the session row.
+        """
+        session_columns = {row["name"] for row in conn.execute("PRAGMA table_info(sessions)")}
+        if "audit_seq" not in session_columns:
+            conn.execute("ALTER TABLE sessions ADD COLUMN audit_seq INTEGER NOT NULL DEFAULT 0")
+        audit_columns = {row["name"] for row in conn.execute("PRAGMA table_info(audit_events)")}
+        if "seq" not in audit_columns:
+            conn.execute("ALTER TABLE audit_events ADD COLUMN seq INTEGER")
+
+        # Walk the table one conversation at a time, a page at a time, so only the current
+        # conversation's markers are held in memory. The rowid index keeps each page a seek.
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_events_migration ON audit_events (conversation_id)")
+        conversation_id, last_id = "", 0
+        seen: set[str] = set()
+        seq = 0
+        while True:
+            rows = conn.execute(
                 """
+                SELECT id, conversation_id, payload FROM audit_events
+                WHERE (conversation_id, id) > (?, ?)
+                ORDER BY conversation_id, id LIMIT 500
+                """,
+                (conversation_id, last_id),
+            ).fetchall()
+            if not rows:
+                break
+            duplicates: list[tuple[int]] = []
+            numbered: list[tuple[int, int]] = []
+            totals: list[tuple[int, str]] = []
+            for row in rows:
+                if row["conversation_id"] != conversation_id:
+                    if seq:
+                        totals.append((seq, conversation_id))
+                    conversation_id, seen, seq = row["conversation_id"], set(), 0
+                try:
+                    marker = json.dumps(self.decrypt(row["payload"]), sort_keys=True)
+                except InvalidToken:
+                    marker = row["payload"]
+                if marker in seen:
+                    duplicates.append((row["id"],))
+                    continue
+                seen.add(marker)
+                numbered.append((seq, row["id"]))
+                seq += 1
+            last_id = rows[-1]["id"]
+            conn.executemany("DELETE FROM audit_events WHERE id = ?", duplicates)
+            conn.executemany("UPDATE audit_events SET seq = ? WHERE id = ?", numbered)
+            conn.executemany("UPDATE sessions SET audit_seq = ? WHERE conversation_id = ?", totals)
+        if seq:
+            conn.execute("UPDATE sessions SET audit_seq = ? WHERE conversation_id = ?", (seq, conversation_id))
+        conn.execute("DROP INDEX idx_audit_events_migration")
+        conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_audit_events_conversation_seq ON audit_events (conversation_id, seq)"
+        )
+
+    @staticmethod
+    def _migrate_lookup_indexes(conn: sqlite3.Connection) -> None:
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_conversation_id ON messages (conversation_id, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_handoff_tickets_created_at ON handoff_tickets (created_at)")
+        conn.execute("ANALYZE")
+
+    @staticmethod
+    def _migrate_idempotent_responses(conn: sqlite3.Connection) -> None:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS idempotent_responses (
+                conversation_id TEXT NOT NULL,
+                idempotency_key TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (conversation_id, idempotency_key)
+            )
+            """
+        )
+
+    @staticmethod
+    def _migrate_ticket_queue(conn: sqlite3.Connection) -> None:
+        """Turn handoff tickets into a priority queue with soft resolution and kept counts."""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(handoff_tickets)")}
+        for name, definition in (
+            ("urgency", "TEXT NOT NULL DEFAULT ''"),
+            ("priority", f"INTEGER NOT NULL DEFAULT {PRIORITY_ROUTINE}"),
+            ("status", f"TEXT NOT NULL DEFAULT '{TicketStatus.OPEN.value}'"),
+            ("resolved_at", "TEXT"),
+        ):
+            if name not in columns:
+                conn.execute(f"ALTER TABLE handoff_tickets ADD COLUMN {name} {definition}")
+        # Older tickets carry no urgency; their reason is the best available signal.
+        conn.executemany(
+            "UPDATE handoff_tickets SET priority = ? WHERE reason = ?",
+            [(priority, reason) for reason, priority in REASON_PRIORITIES.items()],
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_handoff_tickets_queue ON handoff_tickets (status, priority, created_at)"
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ticket_counts (
+                status TEXT PRIMARY KEY,
+                total INTEGER NOT NULL
             )
+            """
+        )
+        for status in TicketStatus:
             conn.execute(
                 """
-                CREATE TABLE IF NOT EXISTS audit_events (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    conversation_id TEXT NOT NULL,
-                    event_time TEXT NOT NULL,
-                    payload TEXT NOT NULL
-                )
-                """
+                INSERT OR REPLACE INTO ticket_counts (status, total)
+                SELECT ?, COUNT(*) FROM handoff_tickets WHERE status = ?
+                """,
+                (status.value, status.value),
+            )
+
+    def _migrate_session_urgency(self, conn: sqlite3.Connection) -> None:
+        """Copy each session's urgency out of its encrypted payload so exports can filter on it."""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(sessions)")}
+        if "urgency_level" not in columns:
+            conn.execute("ALTER TABLE sessions ADD COLUMN urgency_level TEXT NOT NULL DEFAULT ''")
+        after = ""
+        while True:
+            rows = conn.execute(
+                "SELECT conversation_id, payload FROM sessions WHERE conversation_id > ? ORDER BY conversation_id LIMIT 500",
+                (after,),
+            ).fetchall()
+            if not rows:
+                break
+            updates = []
+            for row in rows:
+                try:
+                    updates.append((self.decrypt(row["payload"]).get("urgency_level") or "", row["conversation_id"]))
+                except InvalidToken:
+                    continue
+            conn.executemany("UPDATE sessions SET urgency_level = ? WHERE conversation_id = ?", updates)
+            after = rows[-1]["conversation_id"]
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_urgency ON sessions (urgency_level, conversation_id)")
+
+    @staticmethod
+    def _migrate_session_versions(conn: sqlite3.Connection) -> None:
+        """Version sessions for optimistic writes and add per-conversation lease rows."""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(sessions)")}
+        if "version" not in columns:
+            # Every stored session starts at 1; 0 means "not stored yet".
+            conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS conversation_leases (
+                conversation_id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
             )
+            """
+        )
 
-    def encrypt(self, payload: dict[str, Any]) -> str:
-        return self._fernet.encrypt(json.dumps(payload, default=str).encode()).decode()
+    @staticmethod
+    def _migrate_idempotent_request_digests(conn: sqlite3.Connection) -> None:
+        """Fingerprint the message each idempotent response answered; older rows stay unchecked."""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(idempotent_responses)")}
+        if "request_digest" not in columns:
+            conn.execute("ALTER TABLE idempotent_responses ADD COLUMN request_digest TEXT")
 
-    def decrypt(self, token: str) -> dict[str, Any]:
-        return json.loads(self._fernet.decrypt(token.encode()).decode())
+    @CRYPTO_SECONDS.timed("encrypt")
+    def encrypt(self, payload: dict[str, Any]) -> bytes:
+        return self.cipher.encrypt(payload)
 
-    def add_message(self, conversation_id: str, role: str, content: str, timestamp: datetime) -> None:
-        with self._lock, self._connect() as conn:
-            conn.execute(
+    @CRYPTO_SECONDS.timed("decrypt")
+    def decrypt(self, token: str | bytes) -> dict[str, Any]:
+        return self.cipher.decrypt(token)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Defer this thread's writes and commit them together in one transaction on exit.
+
+        Reads inside the block do not see the deferred writes, so callers keep any state they
+        need (such as the session being advanced) in memory. Post-commit work such as
+        publishing messages runs only after the transaction commits. Nested blocks join the
+        outer one.
+        """
+        if getattr(self._batch_local, "ops", None) is not None:
+            yield
+            return
+        self._batch_local.ops = []
+        try:
+            yield
+            ops = self._batch_local.ops
+        finally:
+            self._batch_local.ops = None
+        if ops:
+            with self._pool.write() as conn:
+                callbacks = [op(conn) for op in ops]
+            for callback in callbacks:
+                if callback is not None:
+                    callback()
+
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        """Run ``callback`` once this thread's pending writes have committed (now, outside a batch)."""
+        if getattr(self._batch_local, "ops", None) is not None:
+            self._batch_local.ops.append(lambda conn: callback)
+            return
+        callback()
+
+    def _write(self, op: WriteOp, join_batch: bool = True) -> None:
+        ops = getattr(self._batch_local, "ops", None) if join_batch else None
+        if ops is not None:
+            ops.append(op)
+            return
+        with self._pool.write() as conn:
+            callback = op(conn)
+        if callback is not None:
+            callback()
+
+    @STORE_QUERY_SECONDS.timed("add_message")
+    def add_message(self, conversation_id: str, role: str, content: str, timestamp: datetime) -> ChatMessage:
+        # Inside a batch the id is only known, and the message only published, after commit.
+        message = ChatMessage(role=role, content=content, timestamp=timestamp)
+
+        def insert(conn: sqlite3.Connection) -> Callable[[], None]:
+            cursor = conn.execute(
                 "INSERT INTO messages (conversation_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
                 (conversation_id, role, content, timestamp.isoformat()),
             )
+            message.id = cursor.lastrowid
+            return lambda: self.message_bus.publish(conversation_id, message)
+
+        self._write(insert)
+        return message
 
+    @STORE_QUERY_SECONDS.timed("get_messages")
     def get_messages(self, conversation_id: str, limit: int = 50) -> list[ChatMessage]:
-        with self._lock, self._connect() as conn:
+        with self._pool.read() as conn:
             rows = conn.execute(
                 """
-                SELECT role, content, timestamp
+                SELECT id, role, content, timestamp
                 FROM messages
                 WHERE conversation_id = ?
                 ORDER BY id DESC
@@ -103,89 +523,477 @@ class SQLiteStore:
                 """,
                 (conversation_id, limit),
             ).fetchall()
-        return [
-            ChatMessage(role=row["role"], content=row["content"], timestamp=datetime.fromisoformat(row["timestamp"]))
-            for row in reversed(rows)
-        ]
+        return [self._row_to_message(row) for row in reversed(rows)]
+
+    @STORE_QUERY_SECONDS.timed("get_messages_after")
+    def get_messages_after(self, conversation_id: str, after_id: int, limit: int = 500) -> list[ChatMessage]:
+        with self._pool.read() as conn:
+            rows = conn.execute(
+                """
+                SELECT id, role, content, timestamp
+                FROM messages
+                WHERE conversation_id = ? AND id > ?
+                ORDER BY id ASC
+                LIMIT ?
+                """,
+                (conversation_id, after_id, limit),
+            ).fetchall()
+        return [self._row_to_message(row) for row in rows]
+
+    @STORE_QUERY_SECONDS.timed("get_messages_before")
+    def get_messages_before(self, conversation_id: str, before_id: int, limit: int = 50) -> list[ChatMessage]:
+        """The ``limit`` messages preceding ``before_id``, oldest first: one page further back."""
+        with self._pool.read() as conn:
+            rows = conn.execute(
+                """
+                SELECT id, role, content, timestamp
+                FROM messages
+                WHERE conversation_id = ? AND id < ?
+                ORDER BY id DESC
+                LIMIT ?
+                """,
+                (conversation_id, before_id, limit),
+            ).fetchall()
+        return [self._row_to_message(row) for row in reversed(rows)]
+
+    @STORE_QUERY_SECONDS.timed("last_message_id")
+    def last_message_id(self, conversation_id: str) -> int:
+        with self._pool.read() as conn:
+            row = conn.execute(
+                "SELECT MAX(id) AS last_id FROM messages WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()
+        return int(row["last_id"] or 0)
+
+    @staticmethod
+    def _row_to_message(row: sqlite3.Row) -> ChatMessage:
+        return ChatMessage(
+            id=row["id"], role=row["role"], content=row["content"], timestamp=datetime.fromisoformat(row["timestamp"])
+        )
 
     def get_or_create_session(self, conversation_id: str, patient_id: str) -> TriageSession:
-        with self._lock, self._connect() as conn:
-            row = conn.execute("SELECT payload FROM sessions WHERE conversation_id = ?", (conversation_id,)).fetchone()
-            if row:
-                payload = self.decrypt(row["payload"])
-                return TriageSession.model_validate(payload)
+        """The session to run a turn against.
+
+        With a session cache the caller gets its own working copy: the cached session only
+        changes once ``save_session`` commits, so a turn that fails midway leaves it untouched.
+        """
+        session = self.get_session(conversation_id)
+        return session if session is not None else self.create_session(conversation_id, patient_id)
+
+    @STORE_QUERY_SECONDS.timed("get_session")
+    def get_session(self, conversation_id: str) -> TriageSession | None:
+        cached = self._cached_session(conversation_id, copy=self._working_copy)
+        if cached is not None:
+            return cached
 
+        with self._pool.read() as conn:
+            row = conn.execute(
+                "SELECT payload, audit_seq, version FROM sessions WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()
+        if row:
+            session = self._load_session(self.decrypt(row["payload"]), row["audit_seq"], row["version"])
+            if self._session_cache is not None:
+                self._session_cache.put(session, dirty=False)
+                return self._working_copy(session)
+            return session
+        return None
+
+    @STORE_QUERY_SECONDS.timed("create_session")
+    def create_session(self, conversation_id: str, patient_id: str) -> TriageSession:
+        """Store a new session; a write, so async callers run it on the writer thread."""
         session = TriageSession(session_id=conversation_id, patient_id=patient_id)
-        self.save_session(session)
-        return session
+        try:
+            self.save_session(session)
+        except SessionConflictError:
+            # Another worker created it first; carry on from the stored one.
+            return self.get_or_create_session(conversation_id, patient_id)
+        return self._working_copy(session) if self._session_cache is not None else session
 
+    @staticmethod
+    def _working_copy(session: TriageSession) -> TriageSession:
+        # The derived text index moves to the copy instead of being deep-copied: it holds a
+        # reference to the shared phrase matcher, and only the turn's copy is analysed.
+        index, session._text_index = session._text_index, None
+        copy = session.model_copy(deep=True)
+        copy._text_index = index
+        return copy
+
+    def _cached_session(
+        self, conversation_id: str, copy: Callable[[TriageSession], TriageSession] | None = None
+    ) -> TriageSession | None:
+        if self._session_cache is None:
+            return None
+        cached = self._session_cache.get(conversation_id, copy)
+        if cached is None or not self.shared:
+            return cached
+        # Another process may have advanced the session: reuse the copy only while its
+        # version is still the stored one, which costs a primary-key lookup, not a decrypt.
+        with self._pool.read() as conn:
+            row = conn.execute("SELECT version FROM sessions WHERE conversation_id = ?", (conversation_id,)).fetchone()
+        if row is not None and row["version"] == cached._version:
+            return cached
+        self._session_cache.discard(conversation_id)
+        return None
+
+    def forget_session(self, conversation_id: str) -> None:
+        """Drop any cached copy, e.g. after a ``SessionConflictError``; the next read reloads it."""
+        if self._session_cache is not None:
+            self._session_cache.discard(conversation_id)
+
+    @STORE_QUERY_SECONDS.timed("save_session")
     def save_session(self, session: TriageSession) -> None:
-        payload = self.encrypt(session.model_dump(mode="json"))
+        # Inside a batch the cache only takes the session once the batch commits.
+        cache = self._session_cache
+        if cache is not None and not self.shared and session.state not in cache.WRITE_THROUGH_STATES:
+            self.after_commit(lambda: cache.put(session))
+            return
+        end = session._audit_offset + len(session.audit_log)
+        self._write_session(session)
+        if cache is not None:
+
+            def cache_written() -> None:
+                self._trim_audit_log(session, end)
+                cache.put(session, dirty=False)
+
+            self.after_commit(cache_written)
+
+    @staticmethod
+    def _load_session(payload: dict[str, Any], audit_seq: int, version: int) -> TriageSession:
+        # Payloads written before the audit stream was split out still embed the whole log;
+        # everything below audit_seq is already in the stream, so only a tail is kept.
+        embedded = payload.pop("audit_log", None) or []
+        session = TriageSession.model_validate({**payload, "audit_log": embedded[audit_seq:]})
+        session._audit_offset = audit_seq
+        session._version = version
+        return session
+
+    def _persist_cached_session(self, session: TriageSession) -> None:
+        """Write out a cache flush or eviction in its own transaction.
+
+        Evictions happen on whichever thread misses the cache, possibly inside a batch for
+        another conversation; joining that batch would lose this write if it were discarded.
+        """
+        end = session._audit_offset + len(session.audit_log)
+        self._write_session(session, join_batch=False)
+        self._trim_audit_log(session, end)
+
+    @staticmethod
+    def _trim_audit_log(session: TriageSession, end: int) -> None:
+        """Drop the events below stream position ``end``, now stored, from a cached session.
+
+        Otherwise a hot session keeps every event since it was loaded and each turn's working
+        copy copies them all.
+        """
+        stored = end - session._audit_offset
+        if stored > 0:
+            del session.audit_log[:stored]
+            session._audit_offset = end
+
+    @STORE_QUERY_SECONDS.timed("write_session")
+    def _write_session(self, session: TriageSession, join_batch: bool = True) -> None:
+        payload = self.encrypt(session.model_dump(mode="json", exclude={"audit_log"}))
         now = datetime.utcnow().isoformat()
+        offset = session._audit_offset
+        end = offset + len(session.audit_log)
 
-        with self._lock, self._connect() as conn:
-            conn.execute(
-                """
-                INSERT INTO sessions (conversation_id, payload, created_at, updated_at)
-                VALUES (?, ?, ?, ?)
-                ON CONFLICT(conversation_id) DO UPDATE SET payload=excluded.payload, updated_at=excluded.updated_at
-                """,
-                (session.session_id, payload, now, now),
-            )
-            for event in session.audit_log:
-                conn.execute(
-                    "INSERT INTO audit_events (conversation_id, event_time, payload) VALUES (?, ?, ?)",
-                    (
-                        session.session_id,
-                        datetime.utcnow().isoformat(),
-                        self.encrypt(event.model_dump(mode="json")),
-                    ),
+        def upsert(conn: sqlite3.Connection) -> None:
+            # Optimistic write: it only applies on top of the version this copy was loaded
+            # at (read here, since earlier writes of the same batch bump it).
+            expected = session._version
+            # audit_seq is the per-session high-water mark: only events past it are new.
+            row = conn.execute("SELECT audit_seq FROM sessions WHERE conversation_id = ?", (session.session_id,)).fetchone()
+            persisted = row["audit_seq"] if row else 0
+            start = max(persisted, offset)
+            if expected == 0:
+                cursor = conn.execute(
+                    """
+                    INSERT INTO sessions (conversation_id, payload, created_at, updated_at, audit_seq, urgency_level, version)
+                    VALUES (?, ?, ?, ?, ?, ?, 1)
+                    ON CONFLICT(conversation_id) DO NOTHING
+                    """,
+                    (session.session_id, payload, now, now, end, session.urgency_level),
+                )
+            else:
+                cursor = conn.execute(
+                    """
+                    UPDATE sessions
+                    SET payload = ?, updated_at = ?, audit_seq = ?, urgency_level = ?, version = version + 1
+                    WHERE conversation_id = ? AND version = ?
+                    """,
+                    (payload, now, max(persisted, end), session.urgency_level, session.session_id, expected),
                 )
+            if cursor.rowcount != 1:
+                raise SessionConflictError(session.session_id)
+            session._version = expected + 1
+            conn.executemany(
+                "INSERT INTO audit_events (conversation_id, seq, event_time, payload) VALUES (?, ?, ?, ?)",
+                [
+                    (session.session_id, seq, event.timestamp.isoformat(), self.encrypt(event.model_dump(mode="json")))
+                    for seq, event in enumerate(session.audit_log[start - offset : end - offset], start=start)
+                ],
+            )
+
+        self._write(upsert, join_batch)
+
+    def iter_conversation_ids(self, batch_size: int = 500) -> Iterator[str]:
+        """All conversation ids with a stored session, in id order, fetched page by page."""
+        self.flush_sessions()
+        after = ""
+        while True:
+            with self._pool.read() as conn:
+                rows = conn.execute(
+                    "SELECT conversation_id FROM sessions WHERE conversation_id > ? ORDER BY conversation_id LIMIT ?",
+                    (after, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row["conversation_id"]
+            after = rows[-1]["conversation_id"]
 
-    def get_session_snapshot(self, conversation_id: str) -> dict[str, Any] | None:
-        with self._lock, self._connect() as conn:
-            row = conn.execute("SELECT payload FROM sessions WHERE conversation_id = ?", (conversation_id,)).fetchone()
+    @STORE_QUERY_SECONDS.timed("get_session_snapshot")
+    def get_session_snapshot(self, conversation_id: str, include_audit: bool = False) -> dict[str, Any] | None:
+        """The stored session; the audit trail is read from its own stream only when asked for."""
+        snapshot = None
+        cached = self._cached_session(conversation_id)
+        if cached is not None:
+            snapshot = cached.model_dump(mode="json", exclude={"audit_log"})
+        if snapshot is None:
+            with self._pool.read() as conn:
+                row = conn.execute("SELECT payload FROM sessions WHERE conversation_id = ?", (conversation_id,)).fetchone()
             if not row:
                 return None
-            return self.decrypt(row["payload"])
+            snapshot = self.decrypt(row["payload"])
+            snapshot.pop("audit_log", None)
+        if include_audit:
+            snapshot["audit_log"] = self.get_audit_events(conversation_id)
+        return snapshot
 
+    @STORE_QUERY_SECONDS.timed("get_audit_events")
     def get_audit_events(self, conversation_id: str) -> list[dict[str, Any]]:
-        with self._lock, self._connect() as conn:
+        if self._session_cache is not None and self._session_cache.is_dirty(conversation_id):
+            self._session_cache.flush([conversation_id])
+        with self._pool.read() as conn:
             rows = conn.execute(
-                "SELECT payload FROM audit_events WHERE conversation_id = ? ORDER BY id ASC", (conversation_id,)
+                "SELECT payload FROM audit_events WHERE conversation_id = ? ORDER BY seq ASC", (conversation_id,)
             ).fetchall()
         return [self.decrypt(row["payload"]) for row in rows]
 
-    def add_handoff_ticket(self, ticket: HandoffTicket) -> None:
-        with self._lock, self._connect() as conn:
-            conn.execute(
+    @STORE_QUERY_SECONDS.timed("get_audit_page")
+    def get_audit_page(self, conversation_id: str, after_seq: int = -1, limit: int = 100) -> list[dict[str, Any]]:
+        """Audit events past ``after_seq`` in stream order, each with its ``seq``; decrypts one page only."""
+        if self._session_cache is not None and self._session_cache.is_dirty(conversation_id):
+            self._session_cache.flush([conversation_id])
+        with self._pool.read() as conn:
+            rows = conn.execute(
+                """
+                SELECT seq, payload FROM audit_events
+                WHERE conversation_id = ? AND seq > ?
+                ORDER BY seq ASC
+                LIMIT ?
+                """,
+                (conversation_id, after_seq, limit),
+            ).fetchall()
+        return [{**self.decrypt(row["payload"]), "seq": row["seq"]} for row in rows]
+
+    # Exportable table -> (keyset column, row time column, selected columns).
+    EXPORT_TABLES = {
+        "sessions": ("conversation_id", "updated_at", "conversation_id, urgency_level, created_at, updated_at, payload"),
+        "messages": ("id", "timestamp", "id, conversation_id, role, content, timestamp"),
+        "audit_events": ("id", "event_time", "id, conversation_id, seq, event_time, payload"),
+    }
+
+    @STORE_QUERY_SECONDS.timed("export_page")
+    def export_page(
+        self,
+        table: str,
+        after: str | int,
+        limit: int = 500,
+        since: str | None = None,
+        until: str | None = None,
+        urgency: tuple[str, ...] = (),
+    ) -> list[dict[str, Any]]:
+        """One keyset page of raw ``table`` rows past ``after``; encrypted payloads stay encrypted.
+
+        ``since``/``until`` bound the row's own time column (UTC ISO text, ``until`` exclusive)
+        and ``urgency`` keeps rows whose session currently has one of those urgency levels.
+        Each page is its own short read, so a long export never pins a WAL snapshot.
+        """
+        key, time_column, columns = self.EXPORT_TABLES[table]
+        clauses, params = [f"{key} > ?"], [after]
+        if since is not None:
+            clauses.append(f"{time_column} >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append(f"{time_column} < ?")
+            params.append(until)
+        if urgency:
+            marks = ", ".join("?" * len(urgency))
+            if table == "sessions":
+                clauses.append(f"urgency_level IN ({marks})")
+            else:
+                clauses.append(f"conversation_id IN (SELECT conversation_id FROM sessions WHERE urgency_level IN ({marks}))")
+            params.extend(urgency)
+        with self._pool.read() as conn:
+            rows = conn.execute(
+                f"SELECT {columns} FROM {table} WHERE {' AND '.join(clauses)} ORDER BY {key} ASC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    @STORE_QUERY_SECONDS.timed("acquire_lease")
+    def acquire_lease(self, conversation_id: str, owner: str, ttl: float) -> bool:
+        """Take the conversation's lease for ``ttl`` seconds unless another owner holds a live one."""
+        now = time.time()
+        with self._pool.write() as conn:
+            cursor = conn.execute(
+                """
+                INSERT INTO conversation_leases (conversation_id, owner, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(conversation_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE conversation_leases.owner = excluded.owner OR conversation_leases.expires_at <= ?
+                """,
+                (conversation_id, owner, now + ttl, now),
+            )
+            return cursor.rowcount == 1
+
+    @STORE_QUERY_SECONDS.timed("release_lease")
+    def release_lease(self, conversation_id: str, owner: str) -> None:
+        with self._pool.write() as conn:
+            conn.execute("DELETE FROM conversation_leases WHERE conversation_id = ? AND owner = ?", (conversation_id, owner))
+
+    def request_digest(self, message: str) -> str:
+        return hmac.new(self._digest_key, message.encode(), hashlib.sha256).hexdigest()
+
+    @STORE_QUERY_SECONDS.timed("get_idempotent_response")
+    def get_idempotent_response(
+        self, conversation_id: str, idempotency_key: str, message: str | None = None
+    ) -> ChatResponse | None:
+        """The stored response for the key; raises ``IdempotencyKeyReusedError`` if it answered another ``message``."""
+        with self._pool.read() as conn:
+            row = conn.execute(
+                """
+                SELECT response, request_digest FROM idempotent_responses
+                WHERE conversation_id = ? AND idempotency_key = ?
+                """,
+                (conversation_id, idempotency_key),
+            ).fetchone()
+        if not row:
+            return None
+        if message is not None and row["request_digest"] is not None:
+            if not hmac.compare_digest(row["request_digest"], self.request_digest(message)):
+                raise IdempotencyKeyReusedError(conversation_id, idempotency_key)
+        return ChatResponse.model_validate(self.decrypt(row["response"]))
+
+    @STORE_QUERY_SECONDS.timed("save_idempotent_response")
+    def save_idempotent_response(
+        self, conversation_id: str, idempotency_key: str, response: ChatResponse, message: str | None = None
+    ) -> None:
+        payload = self.encrypt(response.model_dump(mode="json"))
+        digest = self.request_digest(message) if message is not None else None
+
+        def insert(conn: sqlite3.Connection) -> None:
+            cursor = conn.execute(
                 """
-                INSERT OR REPLACE INTO handoff_tickets
-                (ticket_id, conversation_id, reason, user_message, created_at)
+                INSERT OR IGNORE INTO idempotent_responses
+                (conversation_id, idempotency_key, response, created_at, request_digest)
                 VALUES (?, ?, ?, ?, ?)
                 """,
-                (ticket.ticket_id, ticket.conversation_id, ticket.reason, ticket.user_message, ticket.created_at.isoformat()),
+                (conversation_id, idempotency_key, payload, datetime.utcnow().isoformat(), digest),
             )
+            if cursor.rowcount == 1:
+                # Bounded: keep only the most recent ``idempotency_capacity`` responses.
+                conn.execute(
+                    "DELETE FROM idempotent_responses WHERE rowid <= ?",
+                    (cursor.lastrowid - self.idempotency_capacity,),
+                )
+
+        self._write(insert)
+
+    @STORE_QUERY_SECONDS.timed("add_handoff_ticket")
+    def add_handoff_ticket(self, ticket: HandoffTicket) -> None:
+        def insert(conn: sqlite3.Connection) -> None:
+            cursor = conn.execute(
+                """
+                INSERT INTO handoff_tickets
+                (ticket_id, conversation_id, reason, user_message, urgency, priority, status, created_at, resolved_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(ticket_id) DO NOTHING
+                """,
+                (
+                    ticket.ticket_id,
+                    ticket.conversation_id,
+                    ticket.reason,
+                    ticket.user_message,
+                    ticket.urgency,
+                    ticket.priority,
+                    ticket.status.value,
+                    ticket.created_at.isoformat(),
+                    ticket.resolved_at.isoformat() if ticket.resolved_at else None,
+                ),
+            )
+            if cursor.rowcount == 1:
+                self._adjust_ticket_count(conn, ticket.status, 1)
+
+        self._write(insert)
+
+    @staticmethod
+    def _adjust_ticket_count(conn: sqlite3.Connection, status: TicketStatus, delta: int) -> None:
+        # Kept in the same transaction as the ticket change, so it never drifts from the table.
+        conn.execute("UPDATE ticket_counts SET total = total + ? WHERE status = ?", (delta, status.value))
 
-    def list_handoff_tickets(self, limit: int = 200) -> list[HandoffTicket]:
-        with self._lock, self._connect() as conn:
+    @STORE_QUERY_SECONDS.timed("list_handoff_tickets")
+    def list_handoff_tickets(
+        self,
+        limit: int = 200,
+        status: TicketStatus = TicketStatus.OPEN,
+        after: tuple[int, str, str] | None = None,
+    ) -> list[HandoffTicket]:
+        """The queue for ``status``: most urgent first, oldest first within a priority.
+
+        Pass the ``queue_key`` of a page's last ticket as ``after`` to continue from it.
+        """
+        with self._pool.read() as conn:
             rows = conn.execute(
-                "SELECT ticket_id, conversation_id, reason, user_message, created_at FROM handoff_tickets ORDER BY created_at DESC LIMIT ?",
-                (limit,),
+                """
+                SELECT ticket_id, conversation_id, reason, user_message, urgency, priority, status, created_at, resolved_at
+                FROM handoff_tickets
+                WHERE status = ? AND (priority, created_at, ticket_id) > (?, ?, ?)
+                ORDER BY priority ASC, created_at ASC, ticket_id ASC
+                LIMIT ?
+                """,
+                (status.value, *(after or (-1, "", "")), limit),
             ).fetchall()
-        return [
-            HandoffTicket(
-                ticket_id=row["ticket_id"],
-                conversation_id=row["conversation_id"],
-                reason=row["reason"],
-                user_message=row["user_message"],
-                created_at=datetime.fromisoformat(row["created_at"]),
-            )
-            for row in rows
-        ]
+        return [self._row_to_ticket(row) for row in rows]
+
+    @staticmethod
+    def _row_to_ticket(row: sqlite3.Row) -> HandoffTicket:
+        return HandoffTicket(
+            ticket_id=row["ticket_id"],
+            conversation_id=row["conversation_id"],
+            reason=row["reason"],
+            user_message=row["user_message"],
+            urgency=row["urgency"],
+            priority=row["priority"],
+            status=TicketStatus(row["status"]),
+            created_at=datetime.fromisoformat(row["created_at"]),
+            resolved_at=datetime.fromisoformat(row["resolved_at"]) if row["resolved_at"] else None,
+        )
 
+    @STORE_QUERY_SECONDS.timed("count_handoff_tickets")
+    def count_handoff_tickets(self, status: TicketStatus = TicketStatus.OPEN) -> int:
+        with self._pool.read() as conn:
+            row = conn.execute("SELECT total FROM ticket_counts WHERE status = ?", (status.value,)).fetchone()
+        return int(row["total"]) if row else 0
+
+    @STORE_QUERY_SECONDS.timed("resolve_handoff_ticket")
     def resolve_handoff_ticket(self, ticket_id: str) -> int:
-        with self._lock, self._connect() as conn:
-            conn.execute("DELETE FROM handoff_tickets WHERE ticket_id = ?", (ticket_id,))
-            row = conn.execute("SELECT COUNT(*) AS total FROM handoff_tickets").fetchone()
+        """Mark a ticket resolved (it is kept for the record) and return the open-ticket count."""
+        with self._pool.write() as conn:
+            cursor = conn.execute(
+                "UPDATE handoff_tickets SET status = ?, resolved_at = ? WHERE ticket_id = ? AND status = ?",
+                (TicketStatus.RESOLVED.value, datetime.utcnow().isoformat(), ticket_id, TicketStatus.OPEN.value),
+            )
+            if cursor.rowcount == 1:
+                self._adjust_ticket_count(conn, TicketStatus.OPEN, -1)
+                self._adjust_ticket_count(conn, TicketStatus.RESOLVED, 1)
+            row = conn.execute("SELECT total FROM ticket_counts WHERE status = ?", (TicketStatus.OPEN.value,)).fetchone()
             return int(row["total"])
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from .models import HandoffTicket, UrgencyLevel
+
+# Queue order: lower is seen first; tickets of equal priority are served oldest first.
+PRIORITY_IMMEDIATE = 0
+PRIORITY_URGENT = 1
+PRIORITY_REVIEW = 2
+PRIORITY_ROUTINE = 3
+
+# Handoff reasons that outrank the session's urgency, as raised by the orchestrator.
+REASON_PRIORITIES = {
+    "Emergency red-flag/rules trigger": PRIORITY_IMMEDIATE,
+    "Failsafe default": PRIORITY_IMMEDIATE,
+    "High risk score uncertainty": PRIORITY_URGENT,
+    "Urgent triage recommendation": PRIORITY_URGENT,
+    "Low intent confidence": PRIORITY_REVIEW,
+}
+
+URGENCY_PRIORITIES = {
+    UrgencyLevel.EMERGENCY.value: PRIORITY_IMMEDIATE,
+    UrgencyLevel.URGENT.value: PRIORITY_URGENT,
+}
+
+
+def ticket_priority(urgency: str, reason: str) -> int:
+    return min(URGENCY_PRIORITIES.get(urgency, PRIORITY_ROUTINE), REASON_PRIORITIES.get(reason, PRIORITY_ROUTINE))
+
+
+def queue_key(ticket: HandoffTicket) -> tuple[int, str, str]:
+    """Position of a ticket in its queue; the keyset cursor for the page after it."""
+    return ticket.priority, ticket.created_at.isoformat(), ticket.ticket_id
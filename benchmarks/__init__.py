@@ -0,0 +1 @@
+"""Benchmarks for the triage pipeline. Run with ``python -m benchmarks.run``."""
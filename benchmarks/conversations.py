@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+
+# Scripts mirror the functional scenarios in tests/test_orchestrator.py.
+SCRIPTS: dict[str, list[str]] = {
+    "red_flag": ["I have chest pain and I can't breathe"],
+    "stroke": ["My mom has slurred speech and one-sided weakness"],
+    "routine_cold": [
+        "I have mild cough",
+        "32",
+        "male",
+        "mild cough and runny nose",
+        "2 days",
+        "3",
+        "sore throat",
+        "none",
+        "none",
+        "none",
+    ],
+    "pregnancy_abdominal_pain": [
+        "abdominal pain",
+        "29",
+        "female",
+        "yes pregnant",
+        "abdominal pain",
+        "1 day",
+        "7",
+        "nausea",
+        "none",
+        "prenatal vitamins",
+        "none",
+    ],
+    "greeting": ["hello", "what services do you offer", "whats the time"],
+}
+
+SAMPLE_MESSAGES: list[str] = sorted({turn for turns in SCRIPTS.values() for turn in turns})
+
+
+@dataclass(frozen=True)
+class Conversation:
+    conversation_id: str
+    script: str
+    turns: list[str]
+
+
+def generate_conversations(count: int, seed: int = 7, prefix: str = "bench") -> list[Conversation]:
+    """Deterministic mix of the scripted scenarios, weighted towards long intakes."""
+    rng = random.Random(seed)
+    names = list(SCRIPTS)
+    weights = [1, 1, 4, 3, 2]
+    return [
+        Conversation(f"{prefix}-{index}", name, list(SCRIPTS[name]))
+        for index, name in enumerate(rng.choices(names, weights=weights, k=count))
+    ]
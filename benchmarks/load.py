@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import asyncio
+import tempfile
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+from app.async_storage import AsyncSQLiteStore
+from app.orchestrator import AsyncDeterministicOrchestrator, DeterministicOrchestrator
+from app.storage import SQLiteStore
+
+from .conversations import Conversation, generate_conversations
+from .stats import summarize
+
+
+def run_load(conversations: int, threads: int, seed: int = 7) -> dict:
+    """Drive complete scripted conversations through the ``POST /chat`` pipeline.
+
+    The store and orchestrators are built here on a scratch database, wired as ``app.main``
+    wires them, and ``threads`` concurrent clients await the same async orchestrator the
+    endpoint awaits, on one event loop as under uvicorn.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteStore(db_path=str(Path(directory) / "load.db"), session_cache_size=1024)
+        orchestrator = DeterministicOrchestrator(store)
+        async_store = AsyncSQLiteStore(store)
+        chat = AsyncDeterministicOrchestrator(orchestrator, async_store)
+        workload = generate_conversations(conversations, seed=seed, prefix="load")
+        try:
+            started = time.perf_counter()
+            per_client = asyncio.run(_drive(chat, iter(workload), threads))
+            elapsed = time.perf_counter() - started
+        finally:
+            orchestrator.close()
+            async_store.close()
+            store.close()
+
+    samples = [sample for client_samples, _ in per_client for sample in client_samples]
+    return {
+        "conversations": conversations,
+        "threads": threads,
+        "turns": len(samples),
+        "errors": sum(errors for _, errors in per_client),
+        "elapsed_s": round(elapsed, 3),
+        "turns_per_s": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "chat_latency": summarize(samples),
+    }
+
+
+async def _drive(
+    chat: AsyncDeterministicOrchestrator, workload: Iterator[Conversation], clients: int
+) -> list[tuple[list[float], int]]:
+    async def client() -> tuple[list[float], int]:
+        # Each client keeps its own samples and error count; they are summed afterwards.
+        samples: list[float] = []
+        errors = 0
+        for conversation in workload:
+            for turn in conversation.turns:
+                started = time.perf_counter()
+                try:
+                    await chat.process(conversation.conversation_id, None, turn)
+                except Exception:
+                    errors += 1
+                samples.append(time.perf_counter() - started)
+        return samples, errors
+
+    return await asyncio.gather(*(client() for _ in range(clients)))
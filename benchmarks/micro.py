@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import json
+import tempfile
+from collections.abc import Callable
+from datetime import datetime, timezone
+from pathlib import Path
+
+from app.agents import ClinicalRulesEngine, IntentClassificationAgent, RedFlagEngine
+from app.models import TriageSession
+from app.orchestrator import DeterministicOrchestrator
+from app.storage import SQLiteStore
+
+from .conversations import SAMPLE_MESSAGES, SCRIPTS
+from .stats import summarize, time_calls
+
+RULES_PATH = Path(__file__).resolve().parent.parent / "app" / "config" / "clinical_rules.json"
+
+
+def _cycle(items: list) -> Callable[[], object]:
+    position = 0
+
+    def next_item():
+        nonlocal position
+        item = items[position % len(items)]
+        position += 1
+        return item
+
+    return next_item
+
+
+def bench_red_flags(iterations: int) -> dict:
+    engine = RedFlagEngine()
+    session = TriageSession(session_id="bench", patient_id="bench")
+    message = _cycle(SAMPLE_MESSAGES)
+    return summarize(time_calls(lambda: engine.detect(message(), session), iterations))
+
+
+def bench_intent(iterations: int) -> dict:
+    agent = IntentClassificationAgent()
+    message = _cycle(SAMPLE_MESSAGES)
+    return summarize(time_calls(lambda: agent.classify(message()), iterations))
+
+
+def bench_rules(iterations: int) -> dict:
+    engine = ClinicalRulesEngine(json.loads(RULES_PATH.read_text()))
+    profiles = [
+        ("mild cough and runny nose", ["sore throat"], "2 days", 3, 32),
+        ("abdominal pain", ["nausea"], "1 day", 7, 29),
+        ("chest pain", ["sweating"], "3 hours", 6, 58),
+    ]
+    sessions = []
+    for complaint, associated, onset, severity, age in profiles:
+        session = TriageSession(session_id=complaint, patient_id="bench", chief_complaint=complaint)
+        session.symptoms = [complaint]
+        session.associated_symptoms = associated
+        session.onset_time = onset
+        session.severity = severity
+        session.demographics.age = age
+        sessions.append(session)
+    session = _cycle(sessions)
+    return summarize(time_calls(lambda: engine.evaluate(session()), iterations))
+
+
+def bench_storage(iterations: int) -> dict[str, dict]:
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteStore(db_path=str(Path(directory) / "bench.db"), encryption_key="bench-key")
+        orchestrator = DeterministicOrchestrator(store, rules_path=str(RULES_PATH))
+        for turn in SCRIPTS["routine_cold"][:6]:
+            orchestrator.process("storage-bench", "p1", turn)
+        session = store.get_or_create_session("storage-bench", "p1")
+        now = datetime.now(timezone.utc)
+        results = {
+            "add_message": summarize(
+                time_calls(lambda: store.add_message("storage-bench", "user", "benchmark", now), iterations)
+            ),
+            "get_messages": summarize(time_calls(lambda: store.get_messages("storage-bench"), iterations)),
+            "get_or_create_session": summarize(
+                time_calls(lambda: store.get_or_create_session("storage-bench", "p1"), iterations)
+            ),
+            "save_session": summarize(time_calls(lambda: store.save_session(session), iterations)),
+        }
+        store.close()
+    return results
+
+
+def run_micro(iterations: int) -> dict[str, dict]:
+    results = {
+        "red_flag_detect": bench_red_flags(iterations),
+        "intent_classify": bench_intent(iterations),
+        "rules_evaluate": bench_rules(iterations),
+    }
+    results.update({f"store_{name}": stats for name, stats in bench_storage(iterations).items()})
+    return results
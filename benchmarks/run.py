@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+from datetime import datetime, timezone
+
+from .load import run_load
+from .micro import run_micro
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Celine triage pipeline benchmarks (JSON output).")
+    parser.add_argument("--iterations", type=int, default=2000, help="calls per micro-benchmark")
+    parser.add_argument("--conversations", type=int, default=200, help="conversations for the load driver")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent load-driver workers")
+    parser.add_argument("--skip-load", action="store_true", help="only run micro-benchmarks")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "micro": run_micro(args.iterations),
+    }
+    if not args.skip_load:
+        report["load"] = run_load(args.conversations, args.threads)
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(payload + "\n")
+    else:
+        sys.stdout.write(payload + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import math
+import time
+from collections.abc import Callable
+
+
+def percentile(sorted_samples: list[float], fraction: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    rank = max(0, math.ceil(fraction * len(sorted_samples)) - 1)
+    return sorted_samples[rank]
+
+
+def summarize(samples: list[float]) -> dict[str, float | int]:
+    """Latency summary in microseconds for a list of durations in seconds."""
+    ordered = sorted(samples)
+    scale = 1_000_000
+    return {
+        "count": len(ordered),
+        "mean_us": round(sum(ordered) / len(ordered) * scale, 2) if ordered else 0.0,
+        "p50_us": round(percentile(ordered, 0.50) * scale, 2),
+        "p95_us": round(percentile(ordered, 0.95) * scale, 2),
+        "p99_us": round(percentile(ordered, 0.99) * scale, 2),
+        "max_us": round(ordered[-1] * scale, 2) if ordered else 0.0,
+    }
+
+
+def time_calls(func: Callable[[], object], iterations: int, warmup: int = 10) -> list[float]:
+    for _ in range(min(warmup, iterations)):
+        func()
+    samples: list[float] = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return samples
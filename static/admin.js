@@ -0,0 +1,180 @@
+// Admin dashboard: every panel loads one page at a time from the /admin/api endpoints.
+const ticketList = document.getElementById('ticket-list');
+const ticketMore = document.getElementById('ticket-more');
+const conversation = document.getElementById('conversation');
+let ticketCursor = null;
+
+async function fetchPage(url, cursor) {
+  const target = cursor ? `${url}${url.includes('?') ? '&' : '?'}cursor=${encodeURIComponent(cursor)}` : url;
+  const response = await fetch(target);
+  if (!response.ok) {
+    throw new Error(`${target} returned ${response.status}`);
+  }
+  return response.json();
+}
+
+function field(label, value) {
+  const line = document.createElement('p');
+  const strong = document.createElement('strong');
+  strong.textContent = `${label}: `;
+  line.appendChild(strong);
+  line.appendChild(document.createTextNode(value));
+  return line;
+}
+
+function renderTicket(ticket) {
+  const article = document.createElement('article');
+  article.className = 'ticket';
+
+  const title = document.createElement('h3');
+  title.textContent = `Ticket ${ticket.ticket_id}`;
+  article.appendChild(title);
+  article.appendChild(field('Conversation', ticket.conversation_id));
+  article.appendChild(field('Reason', ticket.reason));
+  article.appendChild(field('Urgency', `${ticket.urgency || 'Unclassified'} (priority ${ticket.priority})`));
+  article.appendChild(field('User message', ticket.user_message));
+  article.appendChild(field('Created', ticket.created_at));
+
+  const open = document.createElement('a');
+  open.className = 'admin-link';
+  open.href = `/admin?conversation_id=${encodeURIComponent(ticket.conversation_id)}`;
+  open.textContent = 'Open Session';
+  const openLine = document.createElement('p');
+  openLine.appendChild(open);
+  article.appendChild(openLine);
+
+  const resolve = document.createElement('button');
+  resolve.type = 'button';
+  resolve.textContent = 'Mark Resolved';
+  resolve.addEventListener('click', async () => {
+    const response = await fetch('/admin/resolve', { method: 'POST', body: new URLSearchParams({ ticket_id: ticket.ticket_id }) });
+    if (response.ok) {
+      const payload = await response.json();
+      document.getElementById('open-ticket-count').textContent = payload.remaining;
+      article.remove();
+    }
+  });
+  article.appendChild(resolve);
+  ticketList.appendChild(article);
+}
+
+async function loadTickets() {
+  const page = await fetchPage('/admin/api/tickets', ticketCursor);
+  page.tickets.forEach(renderTicket);
+  document.getElementById('open-ticket-count').textContent = page.count;
+  document.getElementById('ticket-empty').hidden = ticketList.children.length > 0;
+  ticketCursor = page.next_cursor;
+  ticketMore.hidden = !ticketCursor;
+}
+
+ticketMore.addEventListener('click', loadTickets);
+loadTickets();
+
+if (conversation) {
+  const base = `/admin/api/conversations/${encodeURIComponent(conversation.dataset.conversationId)}`;
+  const messageList = document.getElementById('message-list');
+  const messageMore = document.getElementById('message-more');
+  const auditList = document.getElementById('audit-list');
+  const auditMore = document.getElementById('audit-more');
+  const seenMessageIds = new Set();
+  let newestMessageId = 0;
+  let messageCursor = null;
+  let auditCursor = null;
+  let auditStarted = false;
+  let sessionLoaded = false;
+
+  function messageNode(message) {
+    seenMessageIds.add(message.id);
+    newestMessageId = Math.max(newestMessageId, message.id);
+    const node = document.createElement('div');
+    node.className = `message ${message.role}`;
+    node.textContent = `${message.role.toUpperCase()}: ${message.content}`;
+    return node;
+  }
+
+  async function loadMessages() {
+    // Pages arrive newest first; each older page is prepended above what is shown.
+    const page = await fetchPage(`${base}/messages`, messageCursor);
+    const fragment = document.createDocumentFragment();
+    page.messages.forEach((message) => fragment.appendChild(messageNode(message)));
+    const firstLoad = messageCursor === null;
+    messageList.insertBefore(fragment, messageList.firstChild);
+    if (firstLoad) {
+      messageList.scrollTop = messageList.scrollHeight;
+    }
+    messageCursor = page.next_cursor;
+    messageMore.hidden = !messageCursor;
+  }
+
+  function appendLiveMessage(message) {
+    if (seenMessageIds.has(message.id)) return;
+    const pinned = messageList.scrollTop + messageList.clientHeight >= messageList.scrollHeight - 4;
+    messageList.appendChild(messageNode(message));
+    if (pinned) {
+      messageList.scrollTop = messageList.scrollHeight;
+    }
+  }
+
+  function connectSocket() {
+    // Patient turns and other clinicians' replies arrive as soon as they are stored.
+    const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    const socket = new WebSocket(
+      `${scheme}://${window.location.host}/chat/ws/${encodeURIComponent(conversation.dataset.conversationId)}?after_id=${newestMessageId}`,
+    );
+    let opened = false;
+    socket.addEventListener('open', () => { opened = true; });
+    socket.addEventListener('message', (event) => {
+      const payload = JSON.parse(event.data);
+      if (payload.type === 'message') appendLiveMessage(payload.message);
+    });
+    socket.addEventListener('close', () => {
+      if (opened) setTimeout(connectSocket, 1000);
+    });
+  }
+
+  // With live updates the reply is sent in place; without script the form posts and reloads.
+  const replyForm = document.getElementById('reply-form');
+  replyForm.addEventListener('submit', async (event) => {
+    event.preventDefault();
+    const response = await fetch(replyForm.action, {
+      method: 'POST',
+      headers: { Accept: 'application/json' },
+      body: new URLSearchParams(new FormData(replyForm)),
+    });
+    if (response.ok) {
+      const payload = await response.json();
+      if (payload.message) appendLiveMessage(payload.message);
+      replyForm.reset();
+    }
+  });
+
+  async function loadAudit() {
+    const page = await fetchPage(`${base}/audit`, auditCursor);
+    page.events.forEach((event) => {
+      const item = document.createElement('li');
+      const pre = document.createElement('pre');
+      pre.textContent = JSON.stringify(event, null, 2);
+      item.appendChild(pre);
+      auditList.appendChild(item);
+    });
+    auditCursor = page.next_cursor;
+    auditMore.hidden = !auditCursor;
+  }
+
+  // The snapshot and the audit trail are only fetched once their panel is opened.
+  document.getElementById('session-details').addEventListener('toggle', async (event) => {
+    if (!event.target.open || sessionLoaded) return;
+    sessionLoaded = true;
+    const payload = await fetchPage(`${base}/session`);
+    document.getElementById('session-snapshot').textContent = JSON.stringify(payload.session, null, 2);
+  });
+  document.getElementById('audit-details').addEventListener('toggle', (event) => {
+    if (!event.target.open || auditStarted) return;
+    auditStarted = true;
+    loadAudit();
+  });
+
+  messageMore.addEventListener('click', loadMessages);
+  auditMore.addEventListener('click', loadAudit);
+  loadMessages().then(connectSocket);
+}
@@ -5,7 +5,10 @@ const messageInput = document.getElementById('message');
 const STORAGE_KEY = 'celine.conversation_id';
 const conversationId = localStorage.getItem(STORAGE_KEY) || crypto.randomUUID();
 localStorage.setItem(STORAGE_KEY, conversationId);
-const seenMessages = new Set();
+const seenMessageIds = new Set();
+// User turns are shown immediately; their stored copy is skipped when it arrives.
+const pendingEchoes = [];
+let lastMessageId = 0;
 
 function appendMessage(role, text) {
   const wrapper = document.createElement('div');
@@ -34,34 +37,62 @@ function appendMessage(role, text) {
   chatWindow.scrollTop = chatWindow.scrollHeight;
 }
 
-function markSeen(role, text) {
-  const marker = `${role}|${text}`;
-  seenMessages.add(marker);
+function renderStoredMessage(message) {
+  if (seenMessageIds.has(message.id)) {
+    return;
+  }
+  seenMessageIds.add(message.id);
+  lastMessageId = Math.max(lastMessageId, message.id);
+  if (message.role === 'user' && pendingEchoes[0] === message.content) {
+    pendingEchoes.shift();
+    return;
+  }
+  appendMessage(message.role, message.content);
 }
 
-function rememberMessage(message) {
-  const marker = `${message.role}|${message.content}`;
-  if (seenMessages.has(marker)) {
-    return false;
-  }
-  seenMessages.add(marker);
-  return true;
+function dropPendingEcho(message) {
+  // A turn that failed may never be stored; a stale echo would swallow a later message.
+  const index = pendingEchoes.indexOf(message);
+  if (index !== -1) pendingEchoes.splice(index, 1);
 }
 
 const initialGreeting = 'Hi, I am Celine. This is a triage support tool and not a medical diagnosis.';
 appendMessage('assistant', initialGreeting);
-markSeen('assistant', initialGreeting);
 
 async function refreshConversation() {
-  const response = await fetch(`/chat/history/${conversationId}`);
+  // Only rows newer than the last rendered id; unchanged polls revalidate to a 304.
+  const response = await fetch(`/chat/history/${conversationId}?after_id=${lastMessageId}`);
   if (!response.ok) {
     return;
   }
 
   const payload = await response.json();
-  payload.messages.forEach((message) => {
-    if (rememberMessage(message)) {
-      appendMessage(message.role, message.content);
+  payload.messages.filter((message) => message.id > lastMessageId).forEach(renderStoredMessage);
+}
+
+function connectStream() {
+  // EventSource resumes from the last delivered id (Last-Event-ID) after a reconnect.
+  const stream = new EventSource(`/chat/stream/${conversationId}`);
+  stream.addEventListener('message', (event) => renderStoredMessage(JSON.parse(event.data)));
+}
+
+function connectSocket() {
+  // Clinician replies are pushed the moment they are stored; a reconnect resumes after
+  // the last rendered id. A socket that never opens falls back to the event stream.
+  const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+  const resume = lastMessageId ? `?after_id=${lastMessageId}` : '';
+  const socket = new WebSocket(`${scheme}://${window.location.host}/chat/ws/${conversationId}${resume}`);
+  let opened = false;
+  socket.addEventListener('open', () => { opened = true; });
+  socket.addEventListener('message', (event) => {
+    const payload = JSON.parse(event.data);
+    if (payload.type === 'message') renderStoredMessage(payload.message);
+  });
+  socket.addEventListener('close', () => {
+    if (opened) {
+      setTimeout(connectSocket, 1000);
+    } else {
+      connectStream();
     }
   });
 }
@@ -72,34 +103,42 @@ form.addEventListener('submit', async (event) => {
   if (!message) return;
 
   appendMessage('user', message);
-  markSeen('user', message);
+  pendingEchoes.push(message);
   messageInput.value = '';
 
-  const response = await fetch('/chat', {
-    method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({ conversation_id: conversationId, message }),
-  });
+  let response;
+  try {
+    response = await fetch('/chat', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ conversation_id: conversationId, message, idempotency_key: crypto.randomUUID() }),
+    });
+  } catch (error) {
+    response = null;
+  }
 
-  if (!response.ok) {
+  if (!response || !response.ok) {
+    dropPendingEcho(message);
     appendMessage('assistant', 'Sorry, something went wrong.');
     return;
   }
 
   const payload = await response.json();
-  if (payload.response) {
-    appendMessage('assistant', payload.response);
-    markSeen('assistant', payload.response);
+  // The stored reply itself arrives through the socket or stream (or the polling fallback).
+  if (!window.WebSocket && !window.EventSource) {
+    await refreshConversation();
   }
 
   if (payload.requires_handoff) {
-    const handoffMessage = `⚠️ Human handoff triggered: ${payload.handoff_reason}`;
-    appendMessage('assistant', handoffMessage);
-    markSeen('assistant', handoffMessage);
+    appendMessage('assistant', `⚠️ Human handoff triggered: ${payload.handoff_reason}`);
   }
-
-  await refreshConversation();
 });
 
-refreshConversation();
-setInterval(refreshConversation, 3000);
+if (window.WebSocket) {
+  connectSocket();
+} else if (window.EventSource) {
+  connectStream();
+} else {
+  refreshConversation();
+  setInterval(refreshConversation, 3000);
+}
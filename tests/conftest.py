@@ -0,0 +1,21 @@
+import importlib
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """A client for a fresh ``app.main`` whose database lives in the test's ``tmp_path``.
+
+    ``app.main`` builds its store at import time, so it is (re)imported once
+    ``CELINE_DB_PATH`` points at the scratch directory; the lifespan closes it again.
+    """
+    monkeypatch.setenv("CELINE_DB_PATH", str(tmp_path / "celine.db"))
+    if "app.main" in sys.modules:
+        main = importlib.reload(sys.modules["app.main"])
+    else:
+        main = importlib.import_module("app.main")
+    with TestClient(main.app) as test_client:
+        yield test_client
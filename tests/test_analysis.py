@@ -0,0 +1,55 @@
+import json
+from pathlib import Path
+
+from app.agents import ClinicalRulesEngine
+from app.analysis import OnsetWindow, TurnAnalysis, session_index
+from app.matching import PhraseMatcher
+from app.models import TriageSession
+
+RULES = json.loads(Path("app/config/clinical_rules.json").read_text())
+
+
+def test_turn_analysis_normalizes_once():
+    turn = TurnAnalysis.of("  Hello, I am 7 Months old and 2 days in  ")
+    assert turn.text == "Hello, I am 7 Months old and 2 days in"
+    assert turn.normalized == turn.text.lower()
+    assert {"hello", "months", "7"} <= turn.tokens
+    assert turn.leading_token == "hello"
+    assert turn.numbers == (7, 2)
+    assert TurnAnalysis.of(turn) is turn
+    assert TurnAnalysis.of(", hi").leading_token is None
+
+
+def test_session_index_tracks_appended_and_edited_answers():
+    session = TriageSession(session_id="s", patient_id="p", chief_complaint="Chest Pain", symptoms=["Chest Pain"])
+    index = session_index(session)
+    assert index.text == "chest pain chest pain"
+    matcher = PhraseMatcher(["chest pain", "nausea"])
+    found = index.phrases(matcher)
+    assert found == {"chest pain"}
+    assert session_index(session).phrases(matcher) is found
+
+    session.associated_symptoms = ["Nausea"]
+    assert session_index(session) is index
+    assert index.text == "chest pain chest pain nausea"
+    assert index.phrases(matcher) == {"chest pain", "nausea"}
+
+    session.symptoms[0] = "headache"
+    assert session_index(session).text == "chest pain headache nausea"
+
+
+def test_session_index_is_not_serialized_and_caches_onset():
+    session = TriageSession(session_id="s", patient_id="p", onset_time="3 days")
+    index = session_index(session)
+    assert index.onset(session.onset_time) == OnsetWindow(in_days=True, value=3)
+    assert index.onset("2 weeks") == OnsetWindow(in_days=False, value=2)
+    assert "_text_index" not in session.model_dump_json()
+    assert TriageSession.model_validate_json(session.model_dump_json())._text_index is None
+
+
+def test_rules_engine_reevaluates_after_session_edits():
+    engine = ClinicalRulesEngine(RULES)
+    session = TriageSession(session_id="s", patient_id="p", chief_complaint="fever", symptoms=["fever"])
+    assert "emergency_high_fever_stiff_neck" not in engine.evaluate(session).triggered_rules
+    session.associated_symptoms.append("stiff neck")
+    assert engine.evaluate(session).triggered_rules == ["emergency_high_fever_stiff_neck"]
@@ -0,0 +1,154 @@
+import json
+from datetime import datetime, timezone
+from uuid import uuid4
+
+
+def test_history_cursor_returns_only_new_messages(client):
+    conversation_id = f"api-{uuid4()}"
+    client.post("/chat", json={"conversation_id": conversation_id, "message": "hello"})
+
+    first = client.get(f"/chat/history/{conversation_id}").json()
+    assert [message["role"] for message in first["messages"]] == ["user", "assistant"]
+    assert all(message["id"] for message in first["messages"])
+
+    client.post("/chat", json={"conversation_id": conversation_id, "message": "hello"})
+    newer = client.get(f"/chat/history/{conversation_id}", params={"cursor": first["cursor"]}).json()
+    assert [message["content"] for message in newer["messages"]][0] == "hello"
+    assert len(newer["messages"]) == 2
+    assert newer["messages"][0]["id"] > first["messages"][-1]["id"]
+
+    after_id = newer["messages"][-1]["id"]
+    assert client.get(f"/chat/history/{conversation_id}", params={"after_id": after_id}).json()["messages"] == []
+    assert client.get(f"/chat/history/{conversation_id}", params={"cursor": "bogus"}).status_code == 400
+
+
+def test_history_etag_answers_unchanged_polls_with_304(client):
+    conversation_id = f"api-{uuid4()}"
+    client.post("/chat", json={"conversation_id": conversation_id, "message": "hello"})
+
+    first = client.get(f"/chat/history/{conversation_id}")
+    etag = first.headers["etag"]
+    assert etag.startswith("W/")
+    unchanged = client.get(f"/chat/history/{conversation_id}", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+
+    client.post("/chat", json={"conversation_id": conversation_id, "message": "what time is it"})
+    changed = client.get(f"/chat/history/{conversation_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_chat_retry_with_idempotency_header_is_not_reprocessed(client):
+    conversation_id = f"api-{uuid4()}"
+    payload = {"conversation_id": conversation_id, "message": "I have chest pain"}
+    first = client.post("/chat", json=payload, headers={"Idempotency-Key": "retry-1"})
+    retry = client.post("/chat", json=payload, headers={"Idempotency-Key": "retry-1"})
+    assert retry.json() == first.json()
+    history = client.get(f"/chat/history/{conversation_id}").json()["messages"]
+    assert len(history) == 2
+
+    reused = client.post(
+        "/chat", json={**payload, "message": "hello"}, headers={"Idempotency-Key": "retry-1"}
+    )
+    assert reused.status_code == 422
+
+
+def test_batch_endpoint_returns_results_in_input_order(client):
+    first, second = f"api-{uuid4()}", f"api-{uuid4()}"
+    turns = [
+        {"conversation_id": first, "message": "hello"},
+        {"conversation_id": second, "message": "I have chest pain"},
+        {"conversation_id": first, "message": "I have a headache"},
+    ]
+    response = client.post("/chat/batch", json={"turns": turns})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["conversation_id"] for result in results] == [first, second, first]
+    assert results[1]["urgency_level"] == "EMERGENCY"
+    assert response.json()["errors"] == []
+    assert results[2]["response"] == "How old is the patient?"
+
+
+def test_admin_api_pages_messages_and_audit_trail(client):
+    conversation_id = f"admin-{uuid4()}"
+    for message in ["hello", "what are your hours", "hello"]:
+        client.post("/chat", json={"conversation_id": conversation_id, "message": message})
+    base = f"/admin/api/conversations/{conversation_id}"
+
+    newest = client.get(f"{base}/messages", params={"limit": 4}).json()
+    assert len(newest["messages"]) == 4
+    older = client.get(f"{base}/messages", params={"limit": 4, "cursor": newest["next_cursor"]}).json()
+    assert [message["id"] for message in older["messages"] + newest["messages"]] == sorted(
+        message["id"] for message in older["messages"] + newest["messages"]
+    )
+    assert len(older["messages"]) == 2
+    assert older["next_cursor"] is None
+
+    first = client.get(f"{base}/audit", params={"limit": 2}).json()
+    rest = client.get(f"{base}/audit", params={"limit": 1000, "cursor": first["next_cursor"]}).json()
+    seqs = [event["seq"] for event in first["events"] + rest["events"]]
+    assert seqs == list(range(len(seqs)))
+    assert rest["next_cursor"] is None
+
+    assert "audit_log" not in client.get(f"{base}/session").json()["session"]
+    assert client.get("/admin/api/conversations/missing-conversation/session").status_code == 404
+    assert client.get(f"{base}/audit", params={"cursor": "bogus"}).status_code == 400
+
+
+def test_admin_ticket_queue_pages_without_repeats(client):
+    for _ in range(3):
+        client.post("/chat", json={"conversation_id": f"admin-{uuid4()}", "message": "I have chest pain"})
+
+    first = client.get("/admin/api/tickets", params={"limit": 2}).json()
+    second = client.get("/admin/api/tickets", params={"limit": 2, "cursor": first["next_cursor"]}).json()
+    assert first["count"] == 3 and second["next_cursor"] is None
+    queue = first["tickets"] + second["tickets"]
+    assert len({ticket["ticket_id"] for ticket in queue}) == 3
+    assert [ticket["priority"] for ticket in queue] == sorted(ticket["priority"] for ticket in queue)
+    assert client.get("/admin/api/tickets", params={"cursor": "bogus"}).status_code == 400
+    assert 'src="/static/admin.js"' in client.get("/admin").text
+
+
+def test_admin_export_streams_ndjson_from_the_store(client):
+    conversation_id = f"api-{uuid4()}"
+    since = datetime.now(timezone.utc).isoformat()
+    client.post("/chat", json={"conversation_id": conversation_id, "message": "I have chest pain"})
+
+    response = client.get("/admin/export", params={"since": since, "urgency": "EMERGENCY", "table": "messages"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert records[-1] == {"type": "end", "records": len(records) - 1}
+    assert {record["conversation_id"] for record in records[:-1]} == {conversation_id}
+    assert [record["content"] for record in records[:-1]][0] == "I have chest pain"
+
+    resumed = client.get(
+        "/admin/export",
+        params={"since": since, "urgency": "EMERGENCY", "table": "messages", "resume": records[0]["resume"]},
+    )
+    assert [json.loads(line) for line in resumed.text.splitlines()] == records[1:-1] + [
+        {"type": "end", "records": len(records) - 2}
+    ]
+    assert client.get("/admin/export", params={"resume": "bogus"}).status_code == 400
+    assert client.get("/admin/export", params={"table": "tickets"}).status_code == 400
+
+
+def test_clinician_replies_are_pushed_over_the_conversation_socket(client):
+    conversation_id = f"api-{uuid4()}"
+    client.post("/chat", json={"conversation_id": conversation_id, "message": "I have chest pain"})
+
+    with client.websocket_connect(f"/chat/ws/{conversation_id}") as socket:
+        backlog = [socket.receive_json() for _ in range(2)]
+        assert [event["message"]["role"] for event in backlog] == ["user", "assistant"]
+
+        reply = client.post(
+            "/admin/reply",
+            data={"conversation_id": conversation_id, "message": "A clinician is joining now"},
+            headers={"Accept": "application/json"},
+        ).json()
+        pushed = socket.receive_json()
+        assert pushed == {"type": "message", "message": reply["message"]}
+        assert pushed["message"]["role"] == "human"
+
+    after_id = backlog[-1]["message"]["id"]
+    with client.websocket_connect(f"/chat/ws/{conversation_id}?after_id={after_id}") as socket:
+        assert socket.receive_json()["message"]["content"] == "A clinician is joining now"
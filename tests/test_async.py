@@ -0,0 +1,105 @@
+import asyncio
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from app.async_storage import AsyncSQLiteStore
+from app.orchestrator import AsyncDeterministicOrchestrator, DeterministicOrchestrator
+from app.storage import SQLiteStore
+
+
+def build(tmp_path):
+    store = SQLiteStore(db_path=str(tmp_path / "async.db"), encryption_key="test-key")
+    async_store = AsyncSQLiteStore(store)
+    return store, async_store, AsyncDeterministicOrchestrator(DeterministicOrchestrator(store), async_store)
+
+
+def test_async_orchestrator_matches_sync_behaviour(tmp_path):
+    store, async_store, orchestrator = build(tmp_path)
+
+    async def scenario():
+        emergency, greeting = await asyncio.gather(
+            orchestrator.process("a1", "p1", "I have chest pain and I can't breathe"),
+            orchestrator.process("a2", "p2", "hello"),
+        )
+        follow_up = await orchestrator.process("a2", "p2", "I have a headache")
+        return emergency, greeting, follow_up
+
+    emergency, greeting, follow_up = asyncio.run(scenario())
+    async_store.close()
+    assert emergency.response.urgency_level == "EMERGENCY"
+    assert emergency.handoff_ticket is not None
+    assert greeting.response.state.value == "GREETING"
+    assert follow_up.response.response == "How old is the patient?"
+    assert [message.role for message in store.get_messages("a2")] == ["user", "assistant", "user", "assistant"]
+
+
+def test_writer_errors_propagate_and_writer_restarts_after_close(tmp_path):
+    _, async_store, _ = build(tmp_path)
+
+    async def failing_write():
+        def boom():
+            raise ValueError("disk on fire")
+
+        try:
+            await async_store._write(boom)
+        except ValueError as exc:
+            return str(exc)
+
+    assert asyncio.run(failing_write()) == "disk on fire"
+    async_store.close()
+
+    async def count_after_restart():
+        await async_store.add_message("a3", "user", "hi", datetime.now(timezone.utc))
+        return await async_store.get_messages("a3")
+
+    assert len(asyncio.run(count_after_restart())) == 1
+
+
+def test_new_sessions_are_created_on_the_writer_thread(tmp_path, monkeypatch):
+    store, async_store, _ = build(tmp_path)
+    threads = []
+    original_create = store.create_session
+
+    def recording_create(conversation_id, patient_id):
+        threads.append(threading.current_thread().name)
+        return original_create(conversation_id, patient_id)
+
+    monkeypatch.setattr(store, "create_session", recording_create)
+
+    async def scenario():
+        created = await async_store.get_or_create_session("a4", "p1")
+        loaded = await async_store.get_or_create_session("a4", "p1")
+        return created, loaded
+
+    created, loaded = asyncio.run(scenario())
+    async_store.close()
+    assert threads == ["celine-sqlite-writer"]
+    assert created.session_id == loaded.session_id == "a4"
+
+
+def test_failed_async_turn_leaves_the_shared_session_cache_untouched(tmp_path, monkeypatch):
+    store = SQLiteStore(db_path=str(tmp_path / "async.db"), encryption_key="test-key", session_cache_size=8, shared=True)
+    async_store = AsyncSQLiteStore(store)
+    orchestrator = AsyncDeterministicOrchestrator(DeterministicOrchestrator(store), async_store)
+    original_add_message = store.add_message
+
+    def failing_add_message(conversation_id, role, content, timestamp):
+        if role == "assistant" and content == "What sex was assigned at birth?":
+            raise sqlite3.OperationalError("disk I/O error")
+        return original_add_message(conversation_id, role, content, timestamp)
+
+    async def scenario():
+        await orchestrator.process("a5", "p1", "I have a headache")
+        monkeypatch.setattr(store, "add_message", failing_add_message)
+        try:
+            await orchestrator.process("a5", "p1", "40")
+        except sqlite3.OperationalError:
+            pass
+        monkeypatch.undo()
+        return await orchestrator.process("a5", "p1", "40")
+
+    retried = asyncio.run(scenario())
+    async_store.close()
+    assert retried.session.demographics.age == 40 and retried.session.demographics.sex is None
+    assert len(store.get_messages("a5")) == 4
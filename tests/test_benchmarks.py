@@ -0,0 +1,23 @@
+from benchmarks.conversations import SCRIPTS, generate_conversations
+from benchmarks.load import run_load
+from benchmarks.micro import run_micro
+
+
+def test_conversation_generator_is_deterministic():
+    first = generate_conversations(20, seed=3)
+    assert first == generate_conversations(20, seed=3)
+    assert {conversation.script for conversation in first} <= set(SCRIPTS)
+    assert len({conversation.conversation_id for conversation in first}) == 20
+
+
+def test_micro_benchmarks_report_percentiles():
+    report = run_micro(iterations=5)
+    assert {"red_flag_detect", "intent_classify", "rules_evaluate", "store_save_session"} <= set(report)
+    assert all(stats["count"] == 5 and stats["p50_us"] <= stats["p99_us"] for stats in report.values())
+
+
+def test_load_driver_runs_repeatedly_in_one_process():
+    for _ in range(2):
+        report = run_load(conversations=6, threads=3)
+        assert report["errors"] == 0
+        assert report["turns"] == report["chat_latency"]["count"] > 0
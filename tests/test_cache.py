@@ -0,0 +1,136 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from app.models import ChatRequest
+from app.orchestrator import DeterministicOrchestrator
+from app.storage import IdempotencyKeyReusedError, SQLiteStore
+
+
+def build_cached_store(tmp_path: Path, capacity: int = 8) -> SQLiteStore:
+    return SQLiteStore(
+        db_path=str(tmp_path / "cached.db"),
+        encryption_key="test-key",
+        session_cache_size=capacity,
+        session_flush_interval=0,
+    )
+
+
+def stored_state(tmp_path: Path, store: SQLiteStore, conversation_id: str) -> str | None:
+    with sqlite3.connect(tmp_path / "cached.db") as conn:
+        row = conn.execute("SELECT payload FROM sessions WHERE conversation_id = ?", (conversation_id,)).fetchone()
+    return store.decrypt(row[0])["state"] if row else None
+
+
+def test_hot_sessions_skip_decrypt(tmp_path, monkeypatch):
+    store = build_cached_store(tmp_path)
+    orchestrator = DeterministicOrchestrator(store)
+    orchestrator.process("k1", "p1", "I have a headache")
+
+    decrypts = []
+    original_decrypt = store.decrypt
+    monkeypatch.setattr(store, "decrypt", lambda token: decrypts.append(token) or original_decrypt(token))
+    orchestrator.process("k1", "p1", "40")
+    assert decrypts == []
+
+
+def test_saves_are_written_behind_until_flush(tmp_path):
+    store = build_cached_store(tmp_path)
+    orchestrator = DeterministicOrchestrator(store)
+    orchestrator.process("k2", "p1", "I have a headache")
+    assert stored_state(tmp_path, store, "k2") is None
+
+    assert store.flush_sessions() == 1
+    assert stored_state(tmp_path, store, "k2") == "TRIAGE"
+    assert store.flush_sessions() == 0
+
+
+def test_closed_and_escalated_sessions_are_written_through(tmp_path):
+    store = build_cached_store(tmp_path)
+    orchestrator = DeterministicOrchestrator(store)
+    orchestrator.process("k3", "p1", "I have chest pain")
+    assert stored_state(tmp_path, store, "k3") == "CLOSED"
+    assert len(store.get_audit_events("k3")) > 0
+
+
+def test_evicted_dirty_sessions_are_persisted(tmp_path):
+    store = build_cached_store(tmp_path)
+    orchestrator = DeterministicOrchestrator(store)
+    for index in range(store._session_cache.capacity + 1):
+        orchestrator.process(f"e{index}", "p1", "I have a headache")
+    assert stored_state(tmp_path, store, "e0") == "TRIAGE"
+    assert stored_state(tmp_path, store, "e1") is None
+
+    store.close()
+    assert stored_state(tmp_path, store, "e1") == "TRIAGE"
+
+
+def test_failed_turn_leaves_the_cached_session_untouched(tmp_path, monkeypatch):
+    store = build_cached_store(tmp_path)
+    orchestrator = DeterministicOrchestrator(store)
+    orchestrator.process("k4", "p1", "I have a headache")
+
+    original_add_message = store.add_message
+
+    def failing_add_message(conversation_id, role, content, timestamp):
+        if role == "assistant":
+            raise sqlite3.OperationalError("disk I/O error")
+        return original_add_message(conversation_id, role, content, timestamp)
+
+    monkeypatch.setattr(store, "add_message", failing_add_message)
+    with pytest.raises(sqlite3.OperationalError):
+        orchestrator.process("k4", "p1", "40")
+    monkeypatch.undo()
+    assert store.get_or_create_session("k4", "p1").demographics.age is None
+
+    orchestrator.process("k4", "p1", "40")
+    store.flush_sessions()
+    demographics = store.get_or_create_session("k4", "p1").demographics
+    assert (demographics.age, demographics.sex) == (40, None)
+    assert len(store.get_messages("k4")) == 4
+
+
+def test_eviction_inside_a_failed_batch_still_persists_the_evicted_session(tmp_path):
+    store = build_cached_store(tmp_path, capacity=1)
+    orchestrator = DeterministicOrchestrator(store)
+    orchestrator.process("b", "p1", "I have a headache")
+    orchestrator.process("a", "p1", "I have a headache")
+    orchestrator.process("a", "p1", "40")
+    assert stored_state(tmp_path, store, "a") is None
+
+    # Loading "b" inside the batch evicts the dirty "a"; the batch is then discarded.
+    outcome = orchestrator.process_many(
+        [
+            ChatRequest(conversation_id="b", message="40", idempotency_key="k"),
+            ChatRequest(conversation_id="b", message="41", idempotency_key="k"),
+        ]
+    )
+    assert isinstance(outcome.failures["b"].error, IdempotencyKeyReusedError)
+
+    assert stored_state(tmp_path, store, "a") == "TRIAGE"
+    assert len(store.get_audit_events("a")) > 0
+    assert store.get_or_create_session("a", "p1").demographics.age == 40
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_cached_sessions_drop_audit_events_once_stored(tmp_path, shared):
+    store = SQLiteStore(
+        db_path=str(tmp_path / "cached.db"),
+        encryption_key="test-key",
+        session_cache_size=8,
+        session_flush_interval=0,
+        shared=shared,
+    )
+    orchestrator = DeterministicOrchestrator(store)
+    uncached = DeterministicOrchestrator(SQLiteStore(db_path=str(tmp_path / "plain.db"), encryption_key="test-key"))
+    for turn in ["I have mild cough", "32", "male", "mild cough", "2 days", "3", "no", "no"]:
+        orchestrator.process("t1", "p1", turn)
+        uncached.process("t1", "p1", turn)
+        store.flush_sessions()
+        assert store._session_cache.get("t1").audit_log == []
+        assert store.get_or_create_session("t1", "p1").audit_log == []
+
+    expected = [event["action"] for event in uncached.store.get_audit_events("t1")]
+    assert [event["action"] for event in store.get_audit_events("t1")] == expected
+    assert [event["seq"] for event in store.get_audit_page("t1")] == list(range(len(expected)))
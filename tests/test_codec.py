@@ -0,0 +1,89 @@
+import base64
+import json
+import sqlite3
+import zlib
+from datetime import datetime
+
+import pytest
+
+from app.codec import CODECS, FLAG_ZLIB, MAGIC, PayloadCodec, decode_payload
+from app.models import AuditEvent, TriageSession
+from app.storage import SQLiteStore
+
+
+def test_codec_round_trips_and_only_compresses_when_it_pays():
+    codec = PayloadCodec(min_size=64)
+    small = {"state": "IDLE"}
+    large = {"audit_log": [{"agent": "orchestrator", "action": "state_transition", "n": i} for i in range(50)]}
+
+    encoded_small = codec.encode(small)
+    assert encoded_small[:2] == bytes((MAGIC, PayloadCodec.version))
+    assert not encoded_small[2] & FLAG_ZLIB
+    assert decode_payload(encoded_small) == small
+
+    encoded_large = codec.encode(large)
+    assert encoded_large[2] & FLAG_ZLIB
+    assert len(encoded_large) < len(json.dumps(large)) / 4
+    assert decode_payload(encoded_large) == large
+    assert decode_payload(PayloadCodec(compress=False).encode(large)) == large
+
+
+def test_decode_accepts_legacy_json_and_rejects_unknown_versions():
+    assert decode_payload(b'{"state": "IDLE"}') == {"state": "IDLE"}
+    with pytest.raises(ValueError):
+        decode_payload(bytes((MAGIC, 99, 0)) + b"{}")
+
+
+def test_store_reads_sessions_written_before_the_codec(tmp_path):
+    store = SQLiteStore(db_path=str(tmp_path / "codec.db"), encryption_key="test-key")
+    session = TriageSession(session_id="old", patient_id="p1", chief_complaint="rash")
+    session.audit_log = [AuditEvent(agent="orchestrator", action="message_received")]
+    legacy_token = store.cipher._fernet.encrypt(json.dumps(session.model_dump(mode="json")).encode()).decode()
+    now = datetime.utcnow().isoformat()
+    with sqlite3.connect(tmp_path / "codec.db") as conn:
+        conn.execute(
+            "INSERT INTO sessions (conversation_id, payload, created_at, updated_at) VALUES (?, ?, ?, ?)",
+            ("old", legacy_token, now, now),
+        )
+
+    loaded = store.get_or_create_session("old", "p1")
+    assert loaded.chief_complaint == "rash"
+    loaded.audit_log.append(AuditEvent(agent="orchestrator", action="resaved"))
+    store.save_session(loaded)
+
+    with sqlite3.connect(tmp_path / "codec.db") as conn:
+        payload = conn.execute("SELECT payload FROM sessions WHERE conversation_id = 'old'").fetchone()[0]
+    assert isinstance(payload, bytes)
+    assert len(payload) < len(legacy_token)
+    assert store.get_session_snapshot("old", include_audit=True)["audit_log"][-1]["action"] == "resaved"
+
+
+class AlwaysCompressedCodec(PayloadCodec):
+    """A second format: zlib-compressed JSON without a flags bit, unreadable as format 1."""
+
+    version = 2
+
+    def encode(self, payload):
+        return bytes((MAGIC, self.version, 0)) + zlib.compress(json.dumps(payload).encode())
+
+    def decode(self, data):
+        return json.loads(zlib.decompress(data[3:]))
+
+
+def test_stores_read_every_registered_format_version(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "versions.db")
+    old = SQLiteStore(db_path=db_path, encryption_key="test-key")
+    old.save_session(TriageSession(session_id="v1", patient_id="p1", chief_complaint="rash"))
+
+    new = SQLiteStore(db_path=db_path, encryption_key="test-key", payload_codec=AlwaysCompressedCodec())
+    assert new.get_session_snapshot("v1")["chief_complaint"] == "rash"
+    new.save_session(TriageSession(session_id="v2", patient_id="p2", chief_complaint="cough"))
+    with sqlite3.connect(db_path) as conn:
+        payload = conn.execute("SELECT payload FROM sessions WHERE conversation_id = 'v2'").fetchone()[0]
+    assert new.cipher._fernet.decrypt(base64.urlsafe_b64encode(payload))[:2] == bytes((MAGIC, 2))
+    assert new.get_session_snapshot("v2")["chief_complaint"] == "cough"
+
+    with pytest.raises(ValueError):
+        old.get_session_snapshot("v2")
+    monkeypatch.setitem(CODECS, AlwaysCompressedCodec.version, AlwaysCompressedCodec())
+    assert old.get_session_snapshot("v2")["chief_complaint"] == "cough"
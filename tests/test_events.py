@@ -0,0 +1,73 @@
+import asyncio
+import threading
+from datetime import datetime, timezone
+
+from app.broadcast import SQLiteBroadcastBackend
+from app.events import MessageBus, stream_conversation
+from app.models import ChatMessage
+from app.storage import SQLiteStore
+
+
+def test_messages_published_from_other_threads_reach_subscribers(tmp_path):
+    store = SQLiteStore(db_path=str(tmp_path / "events.db"), encryption_key="test-key")
+
+    async def scenario():
+        subscription = store.message_bus.subscribe("s1")
+        writer = threading.Thread(
+            target=store.add_message, args=("s1", "human", "clinician here", datetime.now(timezone.utc))
+        )
+        writer.start()
+        message = await asyncio.wait_for(subscription.queue.get(), timeout=2)
+        writer.join()
+        store.message_bus.unsubscribe(subscription)
+        return message
+
+    message = asyncio.run(scenario())
+    assert message.role == "human"
+    assert message.id == store.get_messages("s1")[-1].id
+
+
+def test_stream_resumes_after_backlog_without_duplicates():
+    bus = MessageBus()
+    backlog = [ChatMessage(id=1, role="user", content="hi"), ChatMessage(id=2, role="assistant", content="hello")]
+
+    async def scenario():
+        async def load_backlog():
+            return backlog
+
+        async def connected():
+            return False
+
+        stream = stream_conversation(bus, "s2", load_backlog, connected)
+        chunks = [await stream.__anext__() for _ in range(3)]
+        bus.publish("s2", backlog[1])
+        bus.publish("s2", ChatMessage(id=3, role="human", content="on my way"))
+        chunks.append(await asyncio.wait_for(stream.__anext__(), timeout=2))
+        await stream.aclose()
+        return chunks
+
+    chunks = asyncio.run(scenario())
+    assert chunks[0].startswith("retry:")
+    assert chunks[1].startswith("id: 1\n") and chunks[2].startswith("id: 2\n")
+    assert chunks[3].startswith("id: 3\n") and "on my way" in chunks[3]
+    assert bus._subscribers == {}
+
+
+def test_sqlite_backend_delivers_messages_stored_by_another_worker(tmp_path):
+    db_path = str(tmp_path / "shared.db")
+    buses = [MessageBus(backend=SQLiteBroadcastBackend(db_path)) for _ in range(2)]
+    workers = [SQLiteStore(db_path=db_path, encryption_key="test-key", message_bus=bus) for bus in buses]
+
+    async def scenario():
+        subscription = workers[1].message_bus.subscribe("s3")
+        for store, content in ((workers[0], "from worker 0"), (workers[1], "from worker 1"), (workers[0], "again")):
+            await asyncio.to_thread(store.add_message, "s3", "human", content, datetime.now(timezone.utc))
+        received = [await asyncio.wait_for(subscription.queue.get(), timeout=2) for _ in range(3)]
+        workers[1].message_bus.unsubscribe(subscription)
+        return received
+
+    received = asyncio.run(scenario())
+    for store in workers:
+        store.message_bus.close()
+    assert [message.content for message in received] == ["from worker 0", "from worker 1", "again"]
+    assert [message.id for message in received] == [message.id for message in workers[0].get_messages("s3")]
@@ -0,0 +1,90 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.export import ExportError, ExportFilter, export_ndjson, iter_export, main
+from app.orchestrator import DeterministicOrchestrator
+from app.storage import SQLiteStore
+
+
+def record_history(tmp_path) -> SQLiteStore:
+    store = SQLiteStore(db_path=str(tmp_path / "export.db"), encryption_key="test-key")
+    orchestrator = DeterministicOrchestrator(store)
+    for conversation_id in ("a", "b", "c"):
+        orchestrator.process(conversation_id, "p1", "hello")
+    orchestrator.process("emergency", "p2", "I have chest pain")
+    for message in ("hello", "I have mild cough"):
+        orchestrator.process("cold", "p3", message)
+    return store
+
+
+def test_export_walks_every_table_in_key_order(tmp_path):
+    store = record_history(tmp_path)
+    records = list(iter_export(store, batch_size=2))
+    kinds = [record["type"] for record in records]
+    assert kinds == sorted(kinds, key=["session", "message", "audit_event"].index)
+
+    sessions = [record for record in records if record["type"] == "session"]
+    assert [record["conversation_id"] for record in sessions] == ["a", "b", "c", "cold", "emergency"]
+    assert sessions[-1]["urgency_level"] == sessions[-1]["session"]["urgency_level"] == "EMERGENCY"
+    assert "audit_log" not in sessions[0]["session"] and "payload" not in sessions[0]
+
+    messages = [record for record in records if record["type"] == "message"]
+    assert [record["id"] for record in messages] == sorted(record["id"] for record in messages)
+    assert len(messages) == len(store.get_messages("cold")) + 8
+
+    events = [record for record in records if record["type"] == "audit_event"]
+    assert [record["event"] for record in events if record["conversation_id"] == "cold"] == store.get_audit_events("cold")
+
+
+def test_export_filters_by_urgency_and_time(tmp_path):
+    store = record_history(tmp_path)
+    emergency = list(iter_export(store, ExportFilter(urgency=("EMERGENCY",))))
+    assert {record["conversation_id"] for record in emergency} == {"emergency"}
+    assert {record["type"] for record in emergency} == {"session", "message", "audit_event"}
+
+    future = datetime.now(timezone.utc) + timedelta(days=1)
+    assert list(iter_export(store, ExportFilter(since=future))) == []
+    everything = list(iter_export(store, ExportFilter(until=future, tables=("messages",))))
+    assert len(everything) == 12 and {record["type"] for record in everything} == {"message"}
+
+
+def test_resume_token_continues_after_the_last_record(tmp_path):
+    store = record_history(tmp_path)
+    records = list(iter_export(store, batch_size=3))
+    for cut in (0, 4, len(records) // 2, len(records) - 1):
+        rest = list(iter_export(store, resume=records[cut]["resume"], batch_size=3))
+        assert rest == records[cut + 1 :]
+    with pytest.raises(ExportError):
+        export_ndjson(store, resume="bogus")
+    with pytest.raises(ExportError):
+        export_ndjson(store, ExportFilter(tables=("messages",)), resume=records[0]["resume"])
+
+
+def test_worker_pool_matches_in_process_export(tmp_path):
+    store = record_history(tmp_path)
+    assert list(iter_export(store, workers=2, batch_size=2, window=2)) == list(iter_export(store, batch_size=2))
+
+
+def test_ndjson_ends_with_a_record_count(tmp_path, capsys, monkeypatch):
+    store = record_history(tmp_path)
+    lines = [json.loads(line) for chunk in export_ndjson(store, batch_size=4) for line in chunk.splitlines()]
+    assert lines[-1] == {"type": "end", "records": len(lines) - 1}
+
+    store.close()
+    monkeypatch.setenv("CELINE_ENCRYPTION_KEY", "test-key")
+    assert main(["--db", str(tmp_path / "export.db"), "--table", "sessions", "--urgency", "EMERGENCY"]) == 0
+    output = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [record["type"] for record in output] == ["session", "end"]
+
+
+def test_urgency_column_is_backfilled_from_existing_payloads(tmp_path):
+    store = record_history(tmp_path)
+    with store._pool.write() as conn:
+        conn.execute("UPDATE sessions SET urgency_level = ''")
+        conn.execute("DELETE FROM schema_migrations WHERE name = 'migrate_session_urgency'")
+    store.close()
+    reopened = SQLiteStore(db_path=str(tmp_path / "export.db"), encryption_key="test-key")
+    sessions = iter_export(reopened, ExportFilter(urgency=("EMERGENCY",), tables=("sessions",)))
+    assert [record["conversation_id"] for record in sessions] == ["emergency"]
@@ -0,0 +1,98 @@
+import re
+
+import pytest
+
+from app.agents import IntentClassificationAgent
+from app.analysis import fold_case
+from benchmarks.conversations import SAMPLE_MESSAGES
+
+# The original ordered checks, kept as the reference the single-pass classifier must reproduce.
+REFERENCE = [
+    (re.compile(r"^\s*(hi|hello|hey|good\s+(morning|afternoon|evening))\b", re.IGNORECASE), "greeting", 0.98),
+    (re.compile(r"\b(time|date|today)\b", re.IGNORECASE), "time_question", 0.9),
+    (re.compile(r"\b(service|services|offer|help with|what can you do)\b", re.IGNORECASE), "services_question", 0.9),
+    (re.compile(r"\b(robotic|bot|human|too scripted)\b", re.IGNORECASE), "style_feedback", 0.89),
+    (
+        re.compile(
+            r"\b(pain|fever|cough|rash|vomit|nausea|headache|dizzy|bleeding|pregnan|symptom|breath)\b", re.IGNORECASE
+        ),
+        "medical_symptom",
+        0.88,
+    ),
+    (re.compile(r"\b(book|schedule|appointment|follow[- ]?up)\b", re.IGNORECASE), "appointment_request", 0.85),
+    (re.compile(r"\b(billing|insurance|hours|location|records)\b", re.IGNORECASE), "admin_question", 0.84),
+]
+
+
+def reference_classify(message: str) -> tuple[str, float]:
+    text = message.strip()
+    for pattern, intent, confidence in REFERENCE:
+        if pattern.search(text):
+            return intent, confidence
+    return "unclear", 0.4
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        *SAMPLE_MESSAGES,
+        "  Hello there, I have a fever",
+        "I said hello and then got a headache",
+        "good   evening",
+        "goodbye",
+        "I need a follow-up for my rash",
+        "can I book a follow up appointment about billing",
+        "are you a bot or a human?",
+        "what can you do about my insurance records",
+        "I am pregnant",
+        "pregnan",
+        "short of breath today",
+        "hours",
+        "HEY what time is it",
+        "Good morning, I need help with billing",
+        "say good morning to the bot",
+        "what can you do, this is too scripted",
+        "please schedule a follow-up, my cough is back",
+        "I_have a fever",
+        "\u017fervice",
+        "T\u0130ME",
+        "what t\u0131me is it",
+        "\u212aEEP ME posted, book it",
+        "\u0130 have a fever",
+        "nothing relevant here",
+        "",
+    ],
+)
+def test_single_pass_classifier_matches_ordered_checks(message):
+    result = IntentClassificationAgent().classify(message)
+    assert (result.intent, result.confidence) == reference_classify(message)
+
+
+def test_intent_vocabularies_load_from_config():
+    agent = IntentClassificationAgent(
+        {
+            "intents": [
+                {"intent": "pharmacy", "confidence": 0.9, "patterns": ["refill", "prescription", "pick\\s+up"]},
+                {"intent": "greeting", "confidence": 0.8, "anchored": True, "patterns": ["hi"]},
+            ],
+            "fallback": {"intent": "other", "confidence": 0.1},
+        }
+    )
+    assert agent.classify("hi, I need a refill").intent == "pharmacy"
+    assert agent.classify("hi there").intent == "greeting"
+    assert agent.classify("hi, can I PICK  UP my pills").intent == "pharmacy"
+    assert agent.classify("say hi").intent == "other"
+
+
+def test_tokens_fold_case_like_ignorecase_regexes():
+    for code in range(0x10000):
+        if 0xD800 <= code < 0xE000:
+            continue
+        char = chr(code)
+        assert re.fullmatch(re.escape(fold_case(char)), char, re.IGNORECASE), hex(code)
+
+    agent = IntentClassificationAgent(
+        {"intents": [{"intent": "pain", "confidence": 0.9, "patterns": ["\u03c0\u03cc\u03bd\u03bf\u03c2"]}]}
+    )
+    # A word-final capital sigma lowercases to the final form; the regex treats both alike.
+    assert agent.classify("\u03a0\u038c\u039d\u039f\u03a3").intent == "pain"
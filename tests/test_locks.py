@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.async_storage import AsyncSQLiteStore
+from app.locks import KeyedLocks, LeaseLocks, LeaseTimeout
+from app.orchestrator import AsyncDeterministicOrchestrator, DeterministicOrchestrator
+from app.storage import SQLiteStore
+
+
+def test_same_key_is_exclusive_and_different_keys_are_not():
+    locks = KeyedLocks()
+    entered = {"a": threading.Event(), "b": threading.Event()}
+
+    def enter(key):
+        with locks.hold(key):
+            entered[key].set()
+
+    with locks.hold("a"):
+        workers = [threading.Thread(target=enter, args=(key,)) for key in ("a", "b")]
+        for worker in workers:
+            worker.start()
+        assert entered["b"].wait(timeout=1)
+        time.sleep(0.05)
+        assert not entered["a"].is_set()
+    assert entered["a"].wait(timeout=1)
+    for worker in workers:
+        worker.join()
+    assert len(locks) == 0
+
+
+def test_async_waiters_do_not_block_the_loop_and_locks_are_dropped():
+    locks = KeyedLocks()
+    order = []
+
+    async def turn(name, delay):
+        async with locks.hold_async("c1"):
+            order.append(f"{name}-start")
+            await asyncio.sleep(delay)
+            order.append(f"{name}-end")
+
+    async def scenario():
+        await asyncio.gather(turn("first", 0.05), turn("second", 0))
+
+    asyncio.run(scenario())
+    assert order == ["first-start", "first-end", "second-start", "second-end"]
+    assert len(locks) == 0
+
+
+def test_async_waiters_outnumbering_executor_threads_do_not_starve_the_holder(tmp_path):
+    store = SQLiteStore(db_path=str(tmp_path / "starve.db"), encryption_key="test-key")
+    async_store = AsyncSQLiteStore(store)
+    orchestrator = AsyncDeterministicOrchestrator(DeterministicOrchestrator(store), async_store)
+
+    async def scenario():
+        # The holder's reads need this executor; ten waiters must not use up its four threads.
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=4))
+        turns = [orchestrator.process("s1", "p1", "hello") for _ in range(10)]
+        return await asyncio.wait_for(asyncio.gather(*turns), timeout=10)
+
+    results = asyncio.run(scenario())
+    async_store.close()
+    assert len(results) == 10
+    assert len(store.get_messages("s1", limit=100)) == 20
+
+
+def test_concurrent_turns_of_one_conversation_are_linearized(tmp_path):
+    store = SQLiteStore(db_path=str(tmp_path / "locks.db"), encryption_key="test-key")
+    orchestrator = DeterministicOrchestrator(store)
+    orchestrator.process("l1", "p1", "I have a headache")
+    answers = ["40", "male", "headache", "2 days", "4", "none", "none", "none"]
+    workers = [threading.Thread(target=orchestrator.process, args=("l1", "p1", answer)) for answer in answers]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    roles = [message.role for message in store.get_messages("l1", limit=100)]
+    assert roles == ["user", "assistant"] * (len(answers) + 1)
+    events = store.get_audit_events("l1")
+    assert sum(event["action"] == "message_received" for event in events) == len(answers) + 1
+
+
+def test_leases_exclude_other_workers_until_released_or_expired(tmp_path):
+    db_path = str(tmp_path / "leases.db")
+    here, there = (LeaseLocks(SQLiteStore(db_path=db_path, encryption_key="test-key"), timeout=0.05) for _ in range(2))
+
+    with here.hold("c1"):
+        with there.hold("c2"):
+            pass
+        with pytest.raises(LeaseTimeout):
+            with there.hold("c1"):
+                pass
+    with there.hold("c1"):
+        pass
+
+    here.ttl = 0.01
+    here._acquire_lease("c3")
+    time.sleep(0.02)
+    with there.hold("c3"):
+        assert not here.store.acquire_lease("c3", here.owner, 30)
+    assert len(here) == len(there) == 0
+
+
+def test_async_lease_waiters_poll_on_the_loop_without_holding_executor_threads(tmp_path):
+    db_path = str(tmp_path / "lease-wait.db")
+    here, there = (LeaseLocks(SQLiteStore(db_path=db_path, encryption_key="test-key")) for _ in range(2))
+    keys = [f"w{index}" for index in range(6)]
+    for key in keys:
+        there._acquire_lease(key)
+
+    async def wait_for(key):
+        async with here.hold_async(key):
+            return key
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=2))
+        waiters = [asyncio.ensure_future(wait_for(key)) for key in keys]
+        await asyncio.sleep(0.05)
+        # Six conversations are waiting on their leases; the executor is still free.
+        assert await asyncio.wait_for(loop.run_in_executor(None, lambda: "free"), timeout=1) == "free"
+        for key in keys:
+            await loop.run_in_executor(None, there.store.release_lease, key, there.owner)
+        return await asyncio.wait_for(asyncio.gather(*waiters), timeout=5)
+
+    assert asyncio.run(scenario()) == keys
+    assert len(here) == 0
+
+
+def test_orchestrator_keeps_an_idle_lease_lock_table(tmp_path):
+    store = SQLiteStore(db_path=str(tmp_path / "idle.db"), encryption_key="test-key")
+    locks = LeaseLocks(store)
+    assert len(locks) == 0
+    assert DeterministicOrchestrator(store, locks=locks).locks is locks
@@ -0,0 +1,35 @@
+from app.agents import RedFlagEngine
+from app.matching import PhraseMatcher
+from app.models import TriageSession
+
+
+def naive_red_flags(message: str) -> list[str]:
+    msg = message.lower()
+    return sorted({key for key, phrases in RedFlagEngine.RED_FLAG_RULES.items() if any(p in msg for p in phrases)})
+
+
+def test_matcher_reports_overlapping_and_nested_phrases():
+    matcher = PhraseMatcher(["he collapsed", "she collapsed", "collapsed", "pse"])
+    assert matcher.find("then she collapsed") == {"he collapsed", "she collapsed", "collapsed", "pse"}
+    assert matcher.find("nothing here") == set()
+
+
+def test_matcher_whole_words_rejects_embedded_hits():
+    matcher = PhraseMatcher(["stroke", "in shock"], whole_words=True)
+    assert matcher.find("had a stroke.") == {"stroke"}
+    assert matcher.find("heatstrokes within shock") == set()
+
+
+def test_red_flag_engine_matches_substring_semantics():
+    engine = RedFlagEngine()
+    session = TriageSession(session_id="s", patient_id="p")
+    messages = [
+        "I have chest pain and I can't breathe",
+        "My mom has slurred speech and one-sided weakness",
+        "he collapsed after a seizure, cold clammy skin",
+        "heatstroke symptoms within shock range",
+        "I'm DYING of boredom",
+        "mild cough",
+    ]
+    for message in messages:
+        assert engine.detect(message, session) == naive_red_flags(message)
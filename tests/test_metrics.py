@@ -0,0 +1,105 @@
+import sqlite3
+from threading import Thread
+from uuid import uuid4
+
+import pytest
+
+from app.metrics import HANDOFF_TICKETS, STATE_TRANSITIONS, URGENCY_OUTCOMES, MetricsRegistry
+from app.orchestrator import DeterministicOrchestrator
+from app.storage import SQLiteStore
+
+
+def test_counter_sums_per_thread_shards():
+    registry = MetricsRegistry()
+    counter = registry.counter("test_events_total", "Events.", ("kind",))
+
+    def work() -> None:
+        for _ in range(1000):
+            counter.inc("a")
+
+    threads = [Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.value("a") == 8000
+    assert 'test_events_total{kind="a"} 8000' in registry.render()
+
+
+def test_shards_of_exited_threads_are_folded_into_retired_totals():
+    registry = MetricsRegistry()
+    counter = registry.counter("test_retired_total", "Events.")
+    histogram = registry.histogram("test_retired_seconds", "Latency.")
+
+    def work() -> None:
+        counter.inc()
+        histogram.observe(0.001)
+
+    for _ in range(50):
+        thread = Thread(target=work)
+        thread.start()
+        thread.join()
+
+    assert len(counter._shards) == len(histogram._shards) == 0
+    assert counter.value() == 50
+    assert histogram.count() == 50
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("test_seconds", "Latency.", ("stage",))
+    histogram.observe(0.0002, "parse")
+    histogram.observe(0.3, "parse")
+    with histogram.time("parse"):
+        pass
+
+    text = registry.render()
+    assert "# TYPE test_seconds histogram" in text
+    assert 'test_seconds_bucket{stage="parse",le="0.00025"} 2' in text
+    assert 'test_seconds_bucket{stage="parse",le="+Inf"} 3' in text
+    assert 'test_seconds_count{stage="parse"} 3' in text
+    assert histogram.count("parse") == 3
+
+
+def test_metrics_endpoint_reports_pipeline_and_store_timings(client):
+    client.post("/chat", json={"conversation_id": f"metrics-{uuid4()}", "message": "I have chest pain"})
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'celine_pipeline_stage_seconds_count{stage="red_flag_detection"}' in response.text
+    assert 'celine_store_query_seconds_count{operation="add_message"}' in response.text
+    assert 'celine_state_transitions_total{from_state="IDLE",to_state="EMERGENCY"}' in response.text
+    assert 'celine_handoff_tickets_total{reason=' in response.text
+
+
+def test_outcome_counters_only_count_committed_turns(tmp_path, monkeypatch):
+    store = SQLiteStore(db_path=str(tmp_path / "metrics.db"), encryption_key="test-key")
+    orchestrator = DeterministicOrchestrator(store)
+    reason = "Emergency red-flag/rules trigger"
+
+    def counts():
+        return (
+            HANDOFF_TICKETS.value(reason),
+            URGENCY_OUTCOMES.value("EMERGENCY"),
+            STATE_TRANSITIONS.value("IDLE", "EMERGENCY"),
+        )
+
+    before = counts()
+    original_add_message = store.add_message
+
+    def failing_add_message(conversation_id, role, content, timestamp):
+        if role == "assistant":
+            raise sqlite3.OperationalError("disk I/O error")
+        return original_add_message(conversation_id, role, content, timestamp)
+
+    monkeypatch.setattr(store, "add_message", failing_add_message)
+    with pytest.raises(sqlite3.OperationalError):
+        orchestrator.process("m1", "p1", "I have chest pain")
+    assert counts() == before
+
+    monkeypatch.undo()
+    result = orchestrator.process("m1", "p1", "I have chest pain")
+    assert result.handoff_ticket["reason"] == reason
+    assert counts() == tuple(value + 1 for value in before)
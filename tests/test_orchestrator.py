@@ -1,9 +1,12 @@
+import multiprocessing
+import sqlite3
 from pathlib import Path
 
-from fastapi.testclient import TestClient
+import pytest
 
+from app.locks import LeaseLocks
 from app.orchestrator import DeterministicOrchestrator
-from app.storage import SQLiteStore
+from app.storage import IdempotencyKeyReusedError, SQLiteStore
 
 
 def build_orchestrator(tmp_path: Path) -> DeterministicOrchestrator:
@@ -155,9 +158,163 @@ def test_logging_integrity_and_export(tmp_path):
     assert all("agent" in event and "action" in event for event in events)
 
 
-def test_api_health_and_session_endpoint():
-    from app.main import app
-    client = TestClient(app)
+def test_api_health_and_session_endpoint(client):
     health = client.get("/health")
     assert health.status_code == 200
     assert health.json()["safe_mode"] == "deterministic"
+
+
+def test_repeated_idempotency_key_replays_stored_response(tmp_path):
+    store = SQLiteStore(db_path=str(tmp_path / "idem.db"), encryption_key="test-key")
+    orchestrator = DeterministicOrchestrator(store)
+    orchestrator.process("c10", "p10", "I have a headache")
+    first = orchestrator.process("c10", "p10", "40", idempotency_key="turn-2")
+    retry = orchestrator.process("c10", "p10", "40", idempotency_key="turn-2")
+    assert retry.replayed is True
+    assert retry.response == first.response
+    assert len(store.get_messages("c10")) == 4
+    assert store.get_or_create_session("c10", "p10").intake_progress["sex"] is False
+
+
+def test_reused_idempotency_key_with_a_different_message_is_rejected(tmp_path):
+    orchestrator = build_orchestrator(tmp_path)
+    orchestrator.process("c12", "p12", "I have a headache", idempotency_key="turn-1")
+    with pytest.raises(IdempotencyKeyReusedError):
+        orchestrator.process("c12", "p12", "I have chest pain", idempotency_key="turn-1")
+    assert len(orchestrator.store.get_messages("c12")) == 2
+
+
+def test_handoff_ticket_commits_with_its_turn(tmp_path, monkeypatch):
+    orchestrator = build_orchestrator(tmp_path)
+    store = orchestrator.store
+
+    def failing_add_handoff_ticket(ticket):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(store, "add_handoff_ticket", failing_add_handoff_ticket)
+    with pytest.raises(sqlite3.OperationalError):
+        orchestrator.process("c13", "p13", "I have chest pain", idempotency_key="turn-1")
+    monkeypatch.undo()
+    assert store.get_messages("c13") == []
+
+    # The client's retry runs the turn again instead of replaying a reply whose ticket was lost.
+    retry = orchestrator.process("c13", "p13", "I have chest pain", idempotency_key="turn-1")
+    assert retry.replayed is False
+    assert [ticket.conversation_id for ticket in store.list_handoff_tickets()] == ["c13"]
+
+
+def test_idempotent_responses_are_bounded(tmp_path):
+    store = SQLiteStore(db_path=str(tmp_path / "idem.db"), encryption_key="test-key", idempotency_capacity=2)
+    orchestrator = DeterministicOrchestrator(store)
+    for key in ("k1", "k2", "k3"):
+        orchestrator.process("c11", "p11", "hello", idempotency_key=key)
+    assert store.get_idempotent_response("c11", "k1") is None
+    assert store.get_idempotent_response("c11", "k3") is not None
+
+
+def test_process_many_keeps_order_within_conversations(tmp_path):
+    from app.models import ChatRequest
+
+    store = SQLiteStore(db_path=str(tmp_path / "batch.db"), encryption_key="test-key")
+    orchestrator = DeterministicOrchestrator(store)
+    cold = ["I have mild cough", "32", "male", "mild cough and runny nose", "2 days", "3", "sore throat", "none", "none", "none"]
+    turns = []
+    for index, message in enumerate(cold):
+        turns.append(ChatRequest(conversation_id="b1", message=message))
+        if index < 2:
+            turns.append(ChatRequest(conversation_id="b2", message=["hello", "what services do you offer"][index]))
+    turns.append(ChatRequest(conversation_id="b3", message="I have chest pain", idempotency_key="once"))
+    turns.append(ChatRequest(conversation_id="b3", message="I have chest pain", idempotency_key="once"))
+
+    outcome = orchestrator.process_many(turns, commit_every=4)
+    assert outcome.failures == {}
+    results = outcome.results
+    assert [result.response.conversation_id for result in results] == [turn.conversation_id for turn in turns]
+    b1 = [result for result, turn in zip(results, turns) if turn.conversation_id == "b1"]
+    assert b1[-1].response.urgency_level == "ROUTINE"
+    assert results[-1].replayed is True and results[-1].response == results[-2].response
+    assert len(store.get_messages("b1", limit=100)) == 2 * len(cold)
+    assert len(store.get_messages("b3")) == 2
+    assert store.get_or_create_session("b1", "p1").state.value == "CLOSED"
+
+
+def test_process_many_reports_a_failed_conversation_without_losing_the_others(tmp_path, monkeypatch):
+    from app.models import ChatRequest
+
+    orchestrator = build_orchestrator(tmp_path)
+    store = orchestrator.store
+    run_turn = orchestrator.run_turn
+
+    def failing_run_turn(session, user_message):
+        if user_message == "boom":
+            raise RuntimeError("agent crashed")
+        return run_turn(session, user_message)
+
+    monkeypatch.setattr(orchestrator, "run_turn", failing_run_turn)
+    turns = [
+        ChatRequest(conversation_id="f1", message="I have chest pain"),
+        ChatRequest(conversation_id="f2", message="hello"),
+        ChatRequest(conversation_id="f2", message="boom"),
+        ChatRequest(conversation_id="f2", message="hello"),
+    ]
+    outcome = orchestrator.process_many(turns, commit_every=1)
+
+    assert outcome.results[0].response.urgency_level == "EMERGENCY"
+    assert outcome.results[1] is not None and outcome.results[2:] == [None, None]
+    assert list(outcome.failures) == ["f2"] and outcome.failures["f2"].positions == [2, 3]
+    assert [ticket.conversation_id for ticket in store.list_handoff_tickets()] == ["f1"]
+    assert len(store.get_messages("f2")) == 2
+
+
+def test_turn_is_retried_when_another_worker_updates_the_session(tmp_path):
+    db_path = str(tmp_path / "shared.db")
+    mine, theirs = (
+        DeterministicOrchestrator(SQLiteStore(db_path=db_path, encryption_key="test-key", shared=True, session_cache_size=8))
+        for _ in range(2)
+    )
+    mine.process("r1", "p1", "I have a headache")
+    run_turn = mine.run_turn
+    interleaved = []
+
+    def racing_run_turn(session, user_message):
+        if not interleaved:
+            # Another worker completes a turn between our load and our write.
+            interleaved.append(theirs.process("r1", "p1", "40"))
+        return run_turn(session, user_message)
+
+    mine.run_turn = racing_run_turn
+    result = mine.process("r1", "p1", "male")
+    assert result.session.demographics.age == 40 and result.session.demographics.sex == "male"
+
+    contents = [message.content for message in mine.store.get_messages("r1") if message.role == "user"]
+    assert contents == ["I have a headache", "40", "male"]
+    events = mine.store.get_audit_events("r1")
+    assert [event["details"]["message"] for event in events if event["action"] == "message_received"] == contents
+
+
+def run_worker_turns(db_path: str, worker: int, turns: int) -> None:
+    store = SQLiteStore(db_path=db_path, encryption_key="test-key", session_cache_size=8, shared=True)
+    orchestrator = DeterministicOrchestrator(store, locks=LeaseLocks(store))
+    for turn in range(turns):
+        orchestrator.process("mp", "p1", f"hello from {worker}-{turn}")
+    store.close()
+
+
+def test_worker_processes_do_not_lose_updates_to_one_conversation(tmp_path):
+    db_path = str(tmp_path / "workers.db")
+    SQLiteStore(db_path=db_path, encryption_key="test-key").close()
+    workers = [multiprocessing.Process(target=run_worker_turns, args=(db_path, worker, 10)) for worker in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+    assert [worker.exitcode for worker in workers] == [0, 0, 0]
+
+    store = SQLiteStore(db_path=db_path, encryption_key="test-key")
+    roles = [message.role for message in store.get_messages("mp", limit=-1)]
+    assert roles == ["user", "assistant"] * 30
+    received = [event for event in store.get_audit_events("mp") if event["action"] == "message_received"]
+    assert len(received) == 30
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT version FROM sessions WHERE conversation_id = 'mp'").fetchone()[0] == 31
+        assert conn.execute("SELECT COUNT(*) FROM conversation_leases").fetchone()[0] == 0
@@ -0,0 +1,56 @@
+import json
+import tempfile
+from pathlib import Path
+
+from app.orchestrator import DeterministicOrchestrator
+from app.replay import iter_recorded_conversations, replay_conversations
+from app.storage import SQLiteStore
+
+COLD = ["I have mild cough", "32", "male", "mild cough and runny nose", "2 days", "3", "sore throat", "none", "none", "none"]
+
+
+def record_history(tmp_path) -> SQLiteStore:
+    store = SQLiteStore(db_path=str(tmp_path / "history.db"), encryption_key="test-key")
+    orchestrator = DeterministicOrchestrator(store)
+    for message in COLD:
+        orchestrator.process("cold", "p1", message)
+    orchestrator.process("emergency", "p2", "I have chest pain")
+    orchestrator.process("greeting", "p3", "hello")
+    return store
+
+
+def write_candidate_rules(tmp_path) -> str:
+    rules = json.loads(open("app/config/clinical_rules.json").read())
+    for rule in rules["rules"]:
+        if rule["id"] == "routine_mild_cold_short_duration":
+            rule["urgency"] = "URGENT"
+    path = tmp_path / "candidate.json"
+    path.write_text(json.dumps(rules))
+    return str(path)
+
+
+def test_recorded_conversations_carry_received_messages_and_outcomes(tmp_path):
+    store = record_history(tmp_path)
+    recorded = {conversation.conversation_id: conversation for conversation in iter_recorded_conversations(store)}
+    assert recorded["cold"].messages == COLD
+    assert recorded["cold"].outcome.urgency_level == "ROUTINE"
+    assert recorded["emergency"].outcome.handoff is True
+    assert recorded["greeting"].outcome.state == "GREETING"
+
+
+def test_replay_reports_changed_decisions_in_and_out_of_process(tmp_path):
+    store = record_history(tmp_path)
+    rules_path = write_candidate_rules(tmp_path)
+    scratch_before = set(Path(tempfile.gettempdir()).glob("celine-replay-*"))
+    for workers in (0, 2):
+        results = {
+            result.conversation_id: result
+            for result in replay_conversations(iter_recorded_conversations(store), rules_path, workers=workers)
+        }
+        assert results["cold"].changed
+        assert results["cold"].candidate.urgency_level == "URGENT"
+        assert results["cold"].candidate.handoff is True
+        assert not results["emergency"].changed
+        assert not results["greeting"].changed
+    # The replayed conversations were never written to a scratch database on disk.
+    assert set(Path(tempfile.gettempdir()).glob("celine-replay-*")) == scratch_before
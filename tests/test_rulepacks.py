@@ -0,0 +1,111 @@
+import json
+import time
+
+import pytest
+
+from app.orchestrator import DeterministicOrchestrator
+from app.rulepacks import RulePackError, RulePackManager, compile_rule_pack
+from app.storage import SQLiteStore
+
+COLD = ["I have mild cough", "32", "male", "mild cough and runny nose", "2 days", "3", "sore throat", "none", "none", "none"]
+RULES = json.loads(open("app/config/clinical_rules.json").read())
+
+
+def write_rules(path, version: str | None = None, cold_urgency: str = "ROUTINE") -> None:
+    rules = json.loads(json.dumps(RULES))
+    if version:
+        rules["version"] = version
+    for rule in rules["rules"]:
+        if rule["id"] == "routine_mild_cold_short_duration":
+            rule["urgency"] = cold_urgency
+    path.write_text(json.dumps(rules))
+
+
+def test_compile_versions_packs_and_rejects_invalid_ones():
+    assert compile_rule_pack(json.dumps({"version": "2024.1", "rules": []})).version == "2024.1"
+    assert compile_rule_pack(json.dumps({"rules": []})).version.startswith("sha256:")
+    with pytest.raises(RulePackError):
+        compile_rule_pack("{not json")
+    with pytest.raises(RulePackError):
+        compile_rule_pack(json.dumps({"rules": [{"id": "x", "urgency": "SOMETIME"}]}))
+
+
+def test_reload_swaps_valid_packs_and_keeps_serving_on_errors(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, version="v1")
+    manager = RulePackManager(path)
+    assert manager.current.version == "v1"
+    assert manager.reload() is False
+
+    write_rules(path, version="v2", cold_urgency="URGENT")
+    assert manager.reload() is True
+    assert manager.current.version == "v2"
+
+    path.write_text('{"rules": [{"id": "broken"}]}')
+    assert manager.reload() is False
+    assert manager.current.version == "v2"
+    assert manager.last_error
+
+
+@pytest.mark.parametrize(
+    "rule",
+    [
+        {"id": "string_phrases", "urgency": "URGENT", "phrases_any": "chest pain"},
+        {"id": "string_threshold", "urgency": "URGENT", "phrases_any": ["chest pain"], "min_age": "41"},
+        {"id": "bool_threshold", "urgency": "URGENT", "phrases_any": ["chest pain"], "severity_min": True},
+        {"id": "misspelt_condition", "urgency": "URGENT", "phrase_any": ["chest pain"]},
+        {"id": "", "urgency": "URGENT", "phrases_any": ["chest pain"]},
+        {"id": "lowercase_urgency", "urgency": "urgent", "phrases_any": ["chest pain"]},
+        "not a rule",
+    ],
+)
+def test_malformed_packs_are_rejected_and_the_previous_pack_keeps_serving(tmp_path, rule):
+    path = tmp_path / "rules.json"
+    write_rules(path, version="v1")
+    manager = RulePackManager(path)
+
+    path.write_text(json.dumps({"version": "v2", "rules": [*RULES["rules"], rule]}))
+    assert manager.reload() is False
+    assert manager.current.version == "v1"
+    assert manager.last_error
+
+
+def test_duplicate_rule_ids_are_rejected():
+    with pytest.raises(RulePackError):
+        compile_rule_pack(json.dumps({"rules": [RULES["rules"][0], RULES["rules"][0]]}))
+
+
+def test_turns_record_the_rule_pack_version_they_ran_against(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, version="v1")
+    manager = RulePackManager(path)
+    store = SQLiteStore(db_path=str(tmp_path / "triage.db"), encryption_key="test-key")
+    orchestrator = DeterministicOrchestrator(store, rule_packs=manager)
+    for message in COLD[:-1]:
+        orchestrator.process("cold", "p1", message)
+
+    write_rules(path, version="v2", cold_urgency="URGENT")
+    manager.reload()
+    result = orchestrator.process("cold", "p1", COLD[-1])
+    assert result.response.urgency_level == "URGENT"
+
+    events = store.get_audit_events("cold")
+    last_turn = max(i for i, event in enumerate(events) if event["action"] == "message_received")
+    assert {event["rule_pack_version"] for event in events[:last_turn]} == {"v1"}
+    assert {event["rule_pack_version"] for event in events[last_turn:]} == {"v2"}
+    classified = next(event for event in events if event["action"] == "urgency_classified")
+    assert classified["details"]["rule_pack_version"] == "v2"
+
+
+def test_watcher_picks_up_file_changes(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, version="v1")
+    manager = RulePackManager(path, poll_interval=0.02)
+    try:
+        write_rules(path, version="v2-watched")
+        deadline = time.monotonic() + 5
+        while manager.current.version != "v2-watched" and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert manager.current.version == "v2-watched"
+    finally:
+        manager.close()
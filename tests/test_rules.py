@@ -0,0 +1,50 @@
+import json
+from pathlib import Path
+
+from app.agents import ClinicalRulesEngine
+from app.models import TriageSession
+
+RULES = json.loads(Path("app/config/clinical_rules.json").read_text())
+
+
+def build_session(complaint: str, **fields) -> TriageSession:
+    session = TriageSession(session_id="r", patient_id="p", chief_complaint=complaint, symptoms=[complaint])
+    for name, value in fields.items():
+        if name == "age":
+            session.demographics.age = value
+        else:
+            setattr(session, name, value)
+    return session
+
+
+def test_emergency_rule_short_circuits_later_matches():
+    engine = ClinicalRulesEngine(RULES)
+    session = build_session("fever and stiff neck", associated_symptoms=["chest pain"], age=60, severity=8)
+    result = engine.evaluate(session)
+    assert result.urgency_level == "EMERGENCY"
+    assert result.triggered_rules == ["emergency_high_fever_stiff_neck"]
+
+
+def test_numeric_predicates_are_preparsed_from_onset():
+    engine = ClinicalRulesEngine(RULES)
+    short = engine.evaluate(build_session("sore throat", onset_time="2 days", severity=2))
+    long = engine.evaluate(build_session("sore throat", onset_time="5 days", severity=2))
+    weeks = engine.evaluate(build_session("sore throat", onset_time="2 weeks", severity=2))
+    assert short.triggered_rules == ["routine_mild_cold_short_duration"]
+    assert long.triggered_rules == []
+    assert weeks.triggered_rules == []
+
+
+def test_only_rules_with_present_phrases_are_evaluated(monkeypatch):
+    rules = {"rules": [{"id": f"rule_{i}", "urgency": "URGENT", "phrases_any": [f"symptom #{i}#"]} for i in range(500)]}
+    engine = ClinicalRulesEngine(rules)
+    visited = []
+    original = ClinicalRulesEngine._rule_matches
+    monkeypatch.setattr(
+        ClinicalRulesEngine,
+        "_rule_matches",
+        staticmethod(lambda rule, *args: visited.append(rule.rule_id) or original(rule, *args)),
+    )
+    result = engine.evaluate(build_session("symptom #42#"))
+    assert result.triggered_rules == ["rule_42"]
+    assert visited == ["rule_42"]
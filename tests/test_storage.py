@@ -0,0 +1,200 @@
+import sqlite3
+import threading
+from pathlib import Path
+
+import pytest
+
+from app.models import AuditEvent, TriageSession
+from app.orchestrator import DeterministicOrchestrator
+from app.storage import SessionConflictError, SQLiteStore
+
+
+def build_store(tmp_path: Path, name: str = "store.db") -> SQLiteStore:
+    return SQLiteStore(db_path=str(tmp_path / name), encryption_key="test-key")
+
+
+def count_rows(db_path: Path, table: str) -> int:
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_audit_events_are_appended_once_per_event(tmp_path):
+    store = build_store(tmp_path)
+    orchestrator = DeterministicOrchestrator(store)
+    recorded = []
+    for turn in ["I have mild cough", "32", "male", "mild cough"]:
+        result = orchestrator.process("a1", "p1", turn)
+        # A reloaded session only carries the events recorded since it was loaded.
+        recorded.extend(event.action for event in result.session.audit_log)
+
+    events = store.get_audit_events("a1")
+    assert [event["action"] for event in events] == recorded
+    assert count_rows(tmp_path / "store.db", "audit_events") == len(recorded)
+
+
+def test_legacy_duplicate_audit_rows_are_deduplicated_on_open(tmp_path):
+    cipher = build_store(tmp_path, "cipher.db")
+    session = TriageSession(session_id="legacy", patient_id="p1")
+    session.audit_log = [AuditEvent(agent="orchestrator", action=f"step_{i}") for i in range(3)]
+    db_path = tmp_path / "legacy.db"
+    with sqlite3.connect(db_path) as conn:
+        SQLiteStore._migrate_base_schema(conn)
+        # Simulate three saves that each re-inserted the whole log so far.
+        for upto in (1, 2, 3):
+            for event in session.audit_log[:upto]:
+                conn.execute(
+                    "INSERT INTO audit_events (conversation_id, event_time, payload) VALUES (?, ?, ?)",
+                    ("legacy", event.timestamp.isoformat(), cipher.encrypt(event.model_dump(mode="json"))),
+                )
+
+    upgraded = build_store(tmp_path, "legacy.db")
+    assert [event["action"] for event in upgraded.get_audit_events("legacy")] == ["step_0", "step_1", "step_2"]
+    assert count_rows(db_path, "audit_events") == 3
+
+
+def test_legacy_audit_migration_pages_through_interleaved_conversations(tmp_path):
+    cipher = build_store(tmp_path, "cipher.db")
+    events = {
+        "c1": [AuditEvent(agent="orchestrator", action=f"step_{i}") for i in range(300)],
+        "c2": [AuditEvent(agent="orchestrator", action=f"other_{i}") for i in range(3)],
+    }
+    db_path = tmp_path / "legacy.db"
+    with sqlite3.connect(db_path) as conn:
+        SQLiteStore._migrate_base_schema(conn)
+        for conversation_id in events:
+            conn.execute("INSERT INTO sessions VALUES (?, 'payload', '', '')", (conversation_id,))
+        # Every event of both conversations is stored twice, interleaved: more than a page.
+        for _ in range(2):
+            for index in range(300):
+                for conversation_id, log in events.items():
+                    if index < len(log):
+                        event = log[index]
+                        conn.execute(
+                            "INSERT INTO audit_events (conversation_id, event_time, payload) VALUES (?, ?, ?)",
+                            (conversation_id, event.timestamp.isoformat(), cipher.encrypt(event.model_dump(mode="json"))),
+                        )
+
+    upgraded = build_store(tmp_path, "legacy.db")
+    for conversation_id, log in events.items():
+        page = upgraded.get_audit_page(conversation_id, limit=1000)
+        assert [event["action"] for event in page] == [event.action for event in log]
+        assert [event["seq"] for event in page] == list(range(len(log)))
+    with sqlite3.connect(db_path) as conn:
+        assert dict(conn.execute("SELECT conversation_id, audit_seq FROM sessions")) == {"c1": 300, "c2": 3}
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_audit_events_migration" not in indexes
+
+
+def test_migrations_record_schema_version_and_create_indexes(tmp_path):
+    store = build_store(tmp_path)
+    assert store.schema_version() == len(store._migrations())
+    with sqlite3.connect(tmp_path / "store.db") as conn:
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT role FROM messages WHERE conversation_id = ? ORDER BY id DESC LIMIT 50", ("c1",)
+        ).fetchall()
+    assert any("idx_messages_conversation_id" in row[-1] for row in plan)
+
+    reopened = build_store(tmp_path)
+    assert reopened.schema_version() == store.schema_version()
+
+
+def test_connections_are_reused_per_thread_and_use_wal(tmp_path):
+    store = build_store(tmp_path)
+    conn = store._pool.connection()
+    assert store._pool.connection() is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    seen = []
+    worker = threading.Thread(target=lambda: seen.append(store._pool.connection()))
+    worker.start()
+    worker.join()
+    assert seen and seen[0] is not conn
+
+
+def test_reads_do_not_wait_for_the_write_lock(tmp_path):
+    store = build_store(tmp_path)
+    orchestrator = DeterministicOrchestrator(store)
+    orchestrator.process("r1", "p1", "hello")
+
+    results = []
+    with store._pool.write_lock:
+        reader = threading.Thread(target=lambda: results.append(store.get_messages("r1")))
+        reader.start()
+        reader.join(timeout=2)
+    assert not reader.is_alive()
+    assert [message.role for message in results[0]] == ["user", "assistant"]
+
+
+def test_session_payload_excludes_the_audit_trail(tmp_path):
+    store = build_store(tmp_path)
+    orchestrator = DeterministicOrchestrator(store)
+    sizes = []
+    for turn in ["I have mild cough", "32", "male", "mild cough", "2 days", "3"]:
+        orchestrator.process("lean", "p1", turn)
+        with sqlite3.connect(tmp_path / "store.db") as conn:
+            sizes.append(len(conn.execute("SELECT payload FROM sessions WHERE conversation_id = 'lean'").fetchone()[0]))
+
+    assert max(sizes) - min(sizes) < 200
+    reloaded = store.get_or_create_session("lean", "p1")
+    assert reloaded.audit_log == []
+    total = count_rows(tmp_path / "store.db", "audit_events")
+    assert reloaded._audit_offset == total
+    assert "audit_log" not in store.get_session_snapshot("lean")
+    assert len(store.get_session_snapshot("lean", include_audit=True)["audit_log"]) == total
+
+    orchestrator.process("lean", "p1", "sore throat")
+    assert len(store.get_audit_events("lean")) > total
+
+
+def test_cached_sessions_append_to_the_audit_stream_in_order(tmp_path):
+    store = SQLiteStore(db_path=str(tmp_path / "cached.db"), encryption_key="test-key", session_cache_size=8)
+    orchestrator = DeterministicOrchestrator(store)
+    for turn in ["I have mild cough", "32", "male"]:
+        orchestrator.process("c1", "p1", turn)
+    store.flush_sessions()
+    for turn in ["mild cough", "2 days"]:
+        orchestrator.process("c1", "p1", turn)
+
+    events = store.get_audit_events("c1")
+    assert [event["action"] for event in events].count("message_received") == 5
+    with sqlite3.connect(tmp_path / "cached.db") as conn:
+        seqs = [row[0] for row in conn.execute("SELECT seq FROM audit_events WHERE conversation_id = 'c1' ORDER BY id")]
+    assert seqs == list(range(len(events)))
+
+
+def test_stale_session_copies_are_rejected_instead_of_overwriting(tmp_path):
+    first, second = build_store(tmp_path), build_store(tmp_path)
+    created = first.get_or_create_session("v1", "p1")
+    stale = second.get_or_create_session("v1", "p1")
+    assert created._version == stale._version == 1
+
+    created.chief_complaint = "rash"
+    first.save_session(created)
+    stale.chief_complaint = "cough"
+    with pytest.raises(SessionConflictError):
+        second.save_session(stale)
+    assert first.get_session_snapshot("v1")["chief_complaint"] == "rash"
+    with pytest.raises(SessionConflictError):
+        second.save_session(TriageSession(session_id="v1", patient_id="p1"))
+
+
+def test_shared_cache_revalidates_sessions_written_by_other_processes(tmp_path):
+    workers = [
+        SQLiteStore(db_path=str(tmp_path / "shared.db"), encryption_key="test-key", session_cache_size=8, shared=True)
+        for _ in range(2)
+    ]
+    workers[0].get_or_create_session("v2", "p1")
+    cached = workers[0]._session_cache.get("v2")
+    workers[0].get_or_create_session("v2", "p1")
+    assert workers[0]._session_cache.get("v2") is cached
+
+    other = workers[1].get_or_create_session("v2", "p1")
+    other.chief_complaint = "fever"
+    workers[1].save_session(other)
+    assert count_rows(tmp_path / "shared.db", "sessions") == 1
+
+    fresh = workers[0].get_or_create_session("v2", "p1")
+    assert workers[0]._session_cache.get("v2") is not cached and fresh.chief_complaint == "fever"
+    assert workers[0].get_session_snapshot("v2")["chief_complaint"] == "fever"
+    for store in workers:
+        store.close()
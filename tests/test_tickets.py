@@ -0,0 +1,123 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from app.models import HandoffTicket, TicketStatus
+from app.orchestrator import DeterministicOrchestrator
+from app.storage import SQLiteStore
+from app.tickets import (
+    PRIORITY_IMMEDIATE,
+    PRIORITY_REVIEW,
+    PRIORITY_ROUTINE,
+    PRIORITY_URGENT,
+    queue_key,
+    ticket_priority,
+)
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def build_store(tmp_path, name: str = "tickets.db") -> SQLiteStore:
+    return SQLiteStore(db_path=str(tmp_path / name), encryption_key="test-key")
+
+
+def ticket(ticket_id: str, minutes: int, urgency: str = "", reason: str = "Low intent confidence") -> HandoffTicket:
+    return HandoffTicket(
+        ticket_id=ticket_id,
+        conversation_id=f"c-{ticket_id}",
+        reason=reason,
+        user_message="",
+        urgency=urgency,
+        priority=ticket_priority(urgency, reason),
+        created_at=START + timedelta(minutes=minutes),
+    )
+
+
+def test_priority_combines_urgency_and_reason():
+    assert ticket_priority("EMERGENCY", "Emergency red-flag/rules trigger") == PRIORITY_IMMEDIATE
+    assert ticket_priority("ROUTINE", "Failsafe default") == PRIORITY_IMMEDIATE
+    assert ticket_priority("ROUTINE", "High risk score uncertainty") == PRIORITY_URGENT
+    assert ticket_priority("", "Low intent confidence") == PRIORITY_REVIEW
+    assert ticket_priority("ROUTINE", "Something else") == PRIORITY_ROUTINE
+
+
+def test_queue_serves_urgent_tickets_first_and_oldest_first(tmp_path):
+    store = build_store(tmp_path)
+    store.add_handoff_ticket(ticket("review-old", 0))
+    store.add_handoff_ticket(ticket("review-new", 5))
+    store.add_handoff_ticket(ticket("emergency", 10, "EMERGENCY", "Emergency red-flag/rules trigger"))
+    store.add_handoff_ticket(ticket("urgent", 3, "URGENT", "Urgent triage recommendation"))
+
+    queue = [item.ticket_id for item in store.list_handoff_tickets()]
+    assert queue == ["emergency", "urgent", "review-old", "review-new"]
+
+    with sqlite3.connect(tmp_path / "tickets.db") as conn:
+        plan = " ".join(
+            str(row)
+            for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM handoff_tickets "
+                "WHERE status = 'open' AND (priority, created_at, ticket_id) > (0, '', '') "
+                "ORDER BY priority ASC, created_at ASC, ticket_id ASC LIMIT 50"
+            )
+        )
+    assert "idx_handoff_tickets_queue" in plan
+    # Only ties on (priority, created_at) are sorted; the queue itself is read in index order.
+    assert "TEMP B-TREE FOR ORDER BY" not in plan
+
+
+def test_queue_pages_continue_after_the_last_ticket(tmp_path):
+    store = build_store(tmp_path)
+    for index in range(7):
+        store.add_handoff_ticket(ticket(f"t{index}", index // 3))
+
+    pages, after = [], None
+    while True:
+        page = store.list_handoff_tickets(limit=2, after=after)
+        if not page:
+            break
+        pages.append([item.ticket_id for item in page])
+        after = queue_key(page[-1])
+    assert pages == [["t0", "t1"], ["t2", "t3"], ["t4", "t5"], ["t6"]]
+
+
+def test_resolve_keeps_the_ticket_and_maintains_counts(tmp_path):
+    store = build_store(tmp_path)
+    store.add_handoff_ticket(ticket("a", 0))
+    store.add_handoff_ticket(ticket("b", 1))
+    store.add_handoff_ticket(ticket("b", 1))
+    assert store.count_handoff_tickets() == 2
+
+    assert store.resolve_handoff_ticket("a") == 1
+    assert store.resolve_handoff_ticket("a") == 1
+    assert store.resolve_handoff_ticket("missing") == 1
+    assert [item.ticket_id for item in store.list_handoff_tickets()] == ["b"]
+    resolved = store.list_handoff_tickets(status=TicketStatus.RESOLVED)
+    assert [item.ticket_id for item in resolved] == ["a"]
+    assert resolved[0].resolved_at is not None
+    assert store.count_handoff_tickets(TicketStatus.RESOLVED) == 1
+
+
+def test_existing_tickets_are_migrated_into_the_queue(tmp_path):
+    db_path = tmp_path / "legacy.db"
+    with sqlite3.connect(db_path) as conn:
+        SQLiteStore._migrate_base_schema(conn)
+        conn.executemany(
+            "INSERT INTO handoff_tickets (ticket_id, conversation_id, reason, user_message, created_at) VALUES (?, ?, ?, ?, ?)",
+            [
+                ("t1", "c1", "Low intent confidence", "", START.isoformat()),
+                ("t2", "c2", "Emergency red-flag/rules trigger", "", (START + timedelta(minutes=1)).isoformat()),
+            ],
+        )
+
+    store = build_store(tmp_path, "legacy.db")
+    assert store.count_handoff_tickets() == 2
+    assert [(item.ticket_id, item.priority) for item in store.list_handoff_tickets()] == [
+        ("t2", PRIORITY_IMMEDIATE),
+        ("t1", PRIORITY_REVIEW),
+    ]
+
+
+def test_emergency_handoff_tickets_carry_urgency_and_priority(tmp_path):
+    orchestrator = DeterministicOrchestrator(build_store(tmp_path))
+    result = orchestrator.process("e1", "p1", "I have chest pain")
+    assert result.handoff_ticket["urgency"] == "EMERGENCY"
+    assert result.handoff_ticket["priority"] == PRIORITY_IMMEDIATE